@@ -5,6 +5,18 @@ import numpy as np
 # Use '/dev/ttyACM0' for a real vehicle
 CONNECTION_STRING = 'tcp:127.0.0.1:5762'
 BAUDRATE = 57600
+# Attributes startup waits for; parameters keep downloading in the background
+READY_ATTRIBUTES = ('gps_0', 'armed', 'mode', 'attitude', 'location')
+
+# Telemetry the mission reads, requested at these rates (Hz) with SET_MESSAGE_INTERVAL on
+# connect; 0 leaves the autopilot's default. Autopilot stream defaults are often 2-4 Hz.
+TELEMETRY_RATES = {
+    'GLOBAL_POSITION_INT': 20,  # location, velocity: waypoint arrival and alignment altitude
+    'ATTITUDE': 30,             # roll/pitch/yaw: geolocation and alignment tilt compensation
+    'GPS_RAW_INT': 2,           # gps_0: pre-arm checks
+    'SYS_STATUS': 2,
+    'MISSION_CURRENT': 4,       # AUTO mission progress
+}
 
 # --- Mission Parameters ---
 TARGET_ALTITUDE = 10.0  # meters
@@ -12,6 +24,9 @@ DEFAULT_AIRSPEED = 12   # m/s
 SLOW_AIRSPEED = 3       # m/s
 ALIGN_AIRSPEED = 0.35   # m/s
 FINAL_ALIGN_AIRSPEED = 0.15 # m/s
+WAYPOINT_RADIUS = 2.0   # Acceptance radius of mission waypoints (m), set as WPNAV_RADIUS before each upload
+MISSION_UPLOAD_TIMEOUT = 10.0 # seconds
+MISSION_LEG_TIMEOUT = 120.0   # Longest wait for a waypoint before the mission is abandoned (s)
 
 # --- Mission 2 Waypoints & Locations ---
 PRE_MISSION_POINT = (40.2302201, 29.0096884, 14)
@@ -21,18 +36,108 @@ POOL_APPROACH_POINT = (40.2305677, 29.0094598, 14)
 POOL_LOCATION = (40.2303995, 29.0095540, 10)
 LANDING_ZONE = (40.2302395, 29.0098007, 12)
 
+# --- Target Search ---
+# Coverage pattern flown while searching: 'lawnmower' (parallel tracks over the area)
+# or 'expanding_square' (a square spiral out from the area's centroid). Track spacing
+# and speed are sized from the camera field of view, altitude and detection rate.
+SEARCH_PATTERN = 'lawnmower'
+SEARCH_AREA = None                # Search polygon as (lat, lon) vertices; None: a corridor between the posts
+SEARCH_CORRIDOR_WIDTH = 20.0      # Width of the corridor from FIRST_POST_POINT to SECOND_POST_POINT (m)
+SEARCH_ALTITUDE = 14.0            # Relative altitude of the search (m)
+SEARCH_TARGET_DIAMETER = 2.5      # Target disc diameter (m)
+SEARCH_SIDELAP = 0.2              # Extra overlap between adjacent tracks (fraction of the gap-free spacing)
+SEARCH_MIN_DETECTIONS = 3         # Frames the whole target must be in view for on a pass
+SEARCH_MAX_SPEED = 3.0            # Highest safe search ground speed (m/s)
+SEARCH_FRAME_RATE = None          # Detection rate assumed for the speed (Hz); None uses the 'search' mode's rate_hz
+SEARCH_CONFIRM_SIGHTINGS = 5      # Fused sightings that end the search early
+SEARCH_TIMEOUT_MARGIN = 30.0      # Time allowed beyond the planned search duration before it is cut short (s)
+
 # --- Vision / Target Detection ---
 CAMERA_INDEX = 0
+DISPLAY_FEED_ENABLED = True  # Set False on headless computers; the live feed is then never shown
+DETECTOR_BACKEND = 'thread'  # 'thread' or 'process' (capture and detection in a worker process)
+# Detector operating modes. 'scale' is the processing resolution as a fraction of the
+# camera's (frames are downscaled in the pipeline; the camera is never reopened),
+# 'rate_hz' the maximum processing rate (0 pauses processing, None processes every
+# frame). Any other upper-case key overrides that pipeline setting in the mode;
+# pixel sizes (MIN_CONTOUR_AREA, ROI_MIN_SIZE, ROI_EDGE_MARGIN) are scaled automatically.
+DETECTOR_MODES = {
+    'idle': {'scale': 0.5, 'rate_hz': 0},                  # Climb, transit, pool: nothing reads detections
+    'search': {'scale': 0.5, 'rate_hz': 15},               # Pass over the target area at SEARCH_ALTITUDE
+    'align_coarse': {'scale': 0.5, 'rate_hz': None},       # First alignment, 40 px tolerance
+    'align_fine': {'scale': 1.0, 'rate_hz': None},         # Final alignment at full resolution
+}
+DETECTOR_INITIAL_MODE = 'idle'
+# Camera intrinsics and mount: the camera looks straight down with the top of the
+# image towards the nose; mount angles (degrees) describe any deviation from that.
+CAMERA_HFOV = 62.2  # Horizontal field of view (degrees)
+CAMERA_VFOV = 48.8  # Vertical field of view (degrees)
+CAMERA_MOUNT_ROLL = 0.0
+CAMERA_MOUNT_PITCH = 0.0
+CAMERA_MOUNT_YAW = 0.0
 # HSV color range for the red target
 LOWER_HSV_BOUND = np.array([140, 50, 50])
 UPPER_HSV_BOUND = np.array([179, 255, 255])
+# Further target colour ranges as (lower, upper) HSV triples. A range whose lower hue
+# exceeds its upper hue wraps through 0, e.g. ((170, 50, 50), (10, 255, 255)) for red.
+EXTRA_HSV_RANGES = []
+COLOR_CLASSIFIER = 'hsv'  # 'hsv' (cvtColor + inRange per frame) or 'lut' (BGR lookup table built at startup; faster with several ranges)
 MIN_CONTOUR_AREA = 1400  # Minimum pixel area to be considered a target
+MIN_SHAPE_SCORE = 0.8    # Minimum disc-likeness (0-1, bounding-box aspect x fill ratio); 0 accepts any blob
+BLOB_METHOD = 'contours'  # 'contours' (outer borders, fastest on sparse masks) or 'components' (connectedComponentsWithStats)
+FRAME_BUFFER_SIZE = 3    # Capture ring buffer slots (newest frame wins, stale ones are dropped)
+DETECTION_MAX_AGE = 0.3  # Detections older than this (seconds since capture) are not acted upon
+
+# ROI tracking: once found, only a window around the last centroid is searched
+ROI_TRACKING = True
+ROI_MIN_SIZE = 160       # Smallest tracking window side (pixels)
+ROI_SCALE = 2.5          # Window side as a multiple of the target's bounding box
+ROI_EDGE_MARGIN = 16     # Grow the window when the target gets this close to its edge (pixels)
+ROI_GROWTH = 1.5         # Window growth factor near the edge or after a miss
+ROI_MAX_MISSES = 3       # Consecutive misses before returning to a full-frame search
+
+# Target tracker: constant-velocity Kalman filter on the centroid during alignment
+TRACKER_COAST_TIME = 0.5          # Seconds a missed target is predicted before it is reported lost
+TRACKER_PROCESS_NOISE = 300.0     # Centroid acceleration noise (pixels/s^2, 1-sigma)
+TRACKER_MEASUREMENT_NOISE = 3.0   # Centroid measurement noise (pixels, 1-sigma)
+TRACKER_GATE = 13.8               # Squared Mahalanobis distance that rejects a detection (chi-square, 2 dof, 99.9%)
+TRACKER_MAX_REJECTS = 3           # Consecutive rejected detections before the track restarts on them
 
 # --- Alignment Parameters ---
 # Tolerance for considering the target centered (in pixels)
 FIRST_ALIGN_TOLERANCE = 40
 FINAL_ALIGN_TOLERANCE = 25
 ALIGN_DESCEND_ALTITUDE = 5.0
+ALIGN_CONTROLLER = 'pid'        # 'pid' (metric error, see below) or 'proportional' (original pixel law; does not settle in the final stage)
+ALIGN_GAIN_SCHEDULE = ((5.0, 0.8), (10.0, 1.0))  # (altitude m, proportional gain 1/s), interpolated
+ALIGN_KI = 0.1                  # Integral gain (1/s^2)
+ALIGN_KD = 0.1                  # Derivative gain (s)
+ALIGN_INTEGRAL_LIMIT = 1.0      # Anti-windup clamp on the integrated error (m*s)
+ALIGN_FEEDFORWARD = 1.0         # Fraction of the estimated target velocity fed forward
+ALIGN_VELOCITY_FILTER = 0.2     # Low-pass weight of each new target velocity sample
+SETPOINT_RATE_HZ = 50           # Velocity setpoint streaming rate during alignment
+SETPOINT_WATCHDOG_TIMEOUT = 0.5 # Zero the velocity if no new command arrives within this time (s)
+
+# --- Target Geolocation ---
+GEOLOCATION_PIXEL_SIGMA = 5.0     # Centroid noise (pixels)
+GEOLOCATION_ATTITUDE_SIGMA = 1.0  # Attitude noise (degrees)
+GEOLOCATION_GPS_SIGMA = 1.0       # GPS position error common to all sightings (m)
+GEOLOCATION_GATE = 3.0            # Reject sightings this many sigmas away from the estimate
+GEOLOCATION_SEED = 3              # Sightings that must agree before the estimate is trusted
+GEOLOCATION_POSE_HISTORY = 2.0    # Seconds of attitude/position kept to project frames at their capture time
+
+# --- Flight Recorder ---
+# Binary log of telemetry, commands and detections (None disables recording).
+# Load after the flight with src.utils.flight_recorder.load_flight_log().
+FLIGHT_RECORDER_DIR = 'flight_logs'
+
+# --- Metrics ---
+# Timers, counters and histograms from vision, control and the link, written to
+# METRICS_FILE every METRICS_INTERVAL seconds for a ground-side dashboard to scrape.
+# None disables them; the instrumented code then only calls no-op stand-ins.
+METRICS_FILE = None               # e.g. 'metrics/uav.prom' or 'metrics/uav.json'
+METRICS_FORMAT = 'prometheus'     # 'prometheus' (text exposition format) or 'json'
+METRICS_INTERVAL = 1.0            # Export period (s)
 
 # --- Servo / Payload ---
 SERVO_CHANNEL = 6
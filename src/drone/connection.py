@@ -1,19 +1,30 @@
 import logging
 from dronekit import connect, Vehicle
+from src.utils.mavlink_helpers import start_link_manager
 
-def connect_vehicle(connection_string: str, baud: int) -> Vehicle:
+def connect_vehicle(connection_string: str, baud: int, telemetry_rates: dict = None,
+                    ready_attributes=None) -> Vehicle:
     """
     Connects to the vehicle and waits for it to be ready.
+    `telemetry_rates`: optional {message name: Hz} to request; also starts the
+    link manager that measures the link (see `mavlink_helpers.LinkManager`).
+    `ready_attributes`: vehicle attributes to wait for; by default dronekit's
+    full set, including the complete parameter download.
     Returns the vehicle object.
     """
     logging.info(f"Connecting to vehicle on: {connection_string}")
     try:
         vehicle = connect(connection_string, baud=baud, wait_ready=False)
-        vehicle.wait_ready(True, timeout=60)
+        if ready_attributes:
+            vehicle.wait_ready(*ready_attributes, timeout=60)
+        else:
+            vehicle.wait_ready(True, timeout=60)
+            logging.info(f"Firmware: {vehicle.version}")
         logging.info("Vehicle connected and ready.")
-        logging.info(f"Firmware: {vehicle.version}")
         logging.info(f"GPS: {vehicle.gps_0}")
         logging.info(f"Attitude: {vehicle.attitude}")
+        if telemetry_rates:
+            start_link_manager(vehicle, telemetry_rates)
         return vehicle
     except Exception as e:
         logging.error(f"Failed to connect to vehicle: {e}")
@@ -0,0 +1,113 @@
+import logging
+from threading import Condition, Event
+from dronekit import Vehicle
+from src.utils import clock
+
+# Upper bound on a single condition wait, so cancellation and missed
+# notifications are noticed even if no telemetry arrives.
+MAX_WAIT_SLICE = 0.5
+
+
+def wait_until(vehicle: Vehicle, attributes, predicate, timeout: float = None,
+               cancel: Event = None, progress=None, progress_interval: float = 1.0) -> bool:
+    """
+    Blocks until `predicate()` holds, re-evaluating it whenever one of the
+    vehicle `attributes` (e.g. 'location.global_relative_frame', 'mode',
+    'armed') is updated by dronekit.
+    `timeout`: seconds to wait, None waits forever.
+    `cancel`: optional Event that aborts the wait when set.
+    `progress`: optional callable invoked at most every `progress_interval` seconds.
+    Returns True once the predicate holds, False on timeout or cancellation.
+    """
+    updated = Condition()
+
+    def on_update(_vehicle, _attr_name, _value):
+        with updated:
+            updated.notify_all()
+
+    for attr_name in attributes:
+        vehicle.add_attribute_listener(attr_name, on_update)
+
+    try:
+        deadline = None if timeout is None else clock.monotonic() + timeout
+        last_progress = clock.monotonic()
+        with updated:
+            while True:
+                if predicate():
+                    return True
+                if cancel is not None and cancel.is_set():
+                    logging.warning("Wait cancelled.")
+                    return False
+
+                now = clock.monotonic()
+                if deadline is not None and now >= deadline:
+                    return False
+                if progress is not None and now - last_progress >= progress_interval:
+                    progress()
+                    last_progress = now
+
+                wait_time = MAX_WAIT_SLICE
+                if deadline is not None:
+                    wait_time = min(wait_time, deadline - now)
+                updated.wait(clock.to_real(wait_time))
+    finally:
+        for attr_name in attributes:
+            vehicle.remove_attribute_listener(attr_name, on_update)
+
+
+def wait_for_altitude(vehicle: Vehicle, altitude: float, above: bool = True, timeout: float = None,
+                      cancel: Event = None, label: str = "Altitude") -> bool:
+    """
+    Waits until the relative altitude is at or above (`above=True`) or at or below `altitude`.
+    """
+    def current_altitude():
+        return vehicle.location.global_relative_frame.alt
+
+    def reached():
+        alt = current_altitude()
+        if alt is None:
+            return False
+        return alt >= altitude if above else alt <= altitude
+
+    def progress():
+        logging.info(f"{label}: {current_altitude():.2f}m")
+
+    return wait_until(vehicle, ['location.global_relative_frame'], reached, timeout=timeout,
+                      cancel=cancel, progress=progress)
+
+
+def wait_for_mode(vehicle: Vehicle, mode_name: str, timeout: float = None, cancel: Event = None) -> bool:
+    """
+    Waits until the flight controller reports `mode_name`.
+    """
+    return wait_until(vehicle, ['mode'], lambda: vehicle.mode.name == mode_name,
+                      timeout=timeout, cancel=cancel)
+
+
+def wait_for_armed(vehicle: Vehicle, armed: bool = True, timeout: float = None, cancel: Event = None) -> bool:
+    """
+    Waits until the vehicle's armed state equals `armed`.
+    """
+    return wait_until(vehicle, ['armed'], lambda: vehicle.armed == armed, timeout=timeout, cancel=cancel,
+                      progress=lambda: logging.info("Waiting for arming..."))
+
+
+def wait_for_armable(vehicle: Vehicle, timeout: float = None, cancel: Event = None) -> bool:
+    """
+    Waits until the vehicle passes its pre-arm checks (mode, GPS fix and EKF).
+    """
+    return wait_until(vehicle, ['system_status', 'gps_0', 'ekf_ok', 'mode'], lambda: vehicle.is_armable,
+                      timeout=timeout, cancel=cancel,
+                      progress=lambda: logging.info("Waiting for vehicle to become armable..."))
+
+
+def wait_for_distance(vehicle: Vehicle, distance_fn, tolerance: float, timeout: float = None,
+                      cancel: Event = None, label: str = "target") -> bool:
+    """
+    Waits until `distance_fn()` (metres to the target) is within `tolerance`.
+    """
+    def progress():
+        logging.info(f"Moving to {label}... Distance: {distance_fn():.2f}m")
+
+    return wait_until(vehicle, ['location.global_frame'], lambda: distance_fn() <= tolerance,
+                      timeout=timeout, cancel=cancel, progress=progress)
@@ -1,12 +1,13 @@
 import argparse
 import logging
+import os
 import time
 from threading import Event
 
-from src.drone.connection import connect_vehicle
-from src.drone.actions import arm_and_takeoff, land
-from src.vision.target_detector import TargetDetector
-from src.missions.mission_control import run_mission_2
+# dronekit, OpenCV and the mission modules are imported by the startup
+# phases that need them, so their import time overlaps with connecting.
+from src.startup import Startup
+from src.utils import flight_recorder, metrics
 import src.config as config
 
 def main():
@@ -20,18 +21,34 @@ def main():
 
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     
-    vehicle = connect_vehicle(args.connect, config.BAUDRATE)
+    # Started first, so the detector and link manager get live metric handles
+    if config.METRICS_FILE:
+        metrics.start_metrics(config.METRICS_FILE, config.METRICS_FORMAT, config.METRICS_INTERVAL)
+
+    stop_event = Event()
+    startup = Startup(config, stop_event)
+    vehicle = startup.run(args.connect)
     if not vehicle:
+        stop_event.set()
+        metrics.stop_metrics()
         return
 
-    stop_event = Event()
+    from src.drone.actions import arm_and_takeoff, land
+    from src.utils.mavlink_helpers import stop_link_manager
+
+    if config.FLIGHT_RECORDER_DIR:
+        os.makedirs(config.FLIGHT_RECORDER_DIR, exist_ok=True)
+        log_path = os.path.join(config.FLIGHT_RECORDER_DIR, time.strftime("flight_%Y%m%d_%H%M%S.bin"))
+        flight_recorder.start_recording(log_path, vehicle=vehicle)
 
     try:
-        detector = TargetDetector(config, stop_event)
+        detector = startup.detector()
+        startup.timer.log_report()
         detector.start()
         
         arm_and_takeoff(vehicle, config.TARGET_ALTITUDE)
         
+        from src.missions.mission_control import run_mission_2
         run_mission_2(vehicle, detector, config)
 
         land(vehicle)
@@ -45,6 +62,9 @@ def main():
     finally:
         logging.info("Shutting down...")
         stop_event.set()
+        flight_recorder.stop_recording()
+        stop_link_manager()
+        metrics.stop_metrics()
         if vehicle:
             vehicle.close()
         logging.info("Vehicle disconnected. Program finished.")
@@ -1,2 +1,3 @@
 from .mission_control import run_mission_2
-from .mission_2_align import align_and_drop_payload
\ No newline at end of file
+from .mission_2_align import align_and_drop_payload
+from .mission_builder import MissionBuilder, MissionProgress
\ No newline at end of file
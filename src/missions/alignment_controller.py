@@ -0,0 +1,153 @@
+import numpy as np
+from src.vision.geolocation import TargetGeolocator
+
+
+class PID:
+    """
+    Single-axis PID controller.
+
+    The derivative is low-pass filtered with `derivative_filter` (0-1, the
+    weight of each new sample). Anti-windup: the integral is clamped to
+    `integral_limit` and stops accumulating while the output is saturated
+    in the direction of the error.
+    """
+    def __init__(self, kp: float, ki: float, kd: float, output_limit: float,
+                 integral_limit: float, derivative_filter: float = 0.5):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self.derivative_filter = derivative_filter
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.derivative = 0.0
+        self._last_error = None
+
+    def update(self, error: float, dt: float, kp: float = None) -> float:
+        """
+        Returns the clamped output for `error` measured `dt` seconds after the
+        previous one. `kp` overrides the proportional gain for this step.
+        """
+        kp = self.kp if kp is None else kp
+        if self._last_error is not None and dt > 0:
+            raw = (error - self._last_error) / dt
+            self.derivative += self.derivative_filter * (raw - self.derivative)
+        self._last_error = error
+
+        output = kp * error + self.ki * self.integral + self.kd * self.derivative
+        saturated = abs(output) >= self.output_limit and np.sign(output) == np.sign(error)
+        if dt > 0 and not saturated:
+            self.integral = float(np.clip(self.integral + error * dt, -self.integral_limit, self.integral_limit))
+            output = kp * error + self.ki * self.integral + self.kd * self.derivative
+        return float(np.clip(output, -self.output_limit, self.output_limit))
+
+
+class ProportionalAlignmentController:
+    """
+    The original alignment law: velocity proportional to the pixel error as
+    a fraction of the half-frame, reaching `max_speed` at the frame edge.
+    Kept unchanged for comparison; with the slow final-stage speed it does
+    not settle (see `src.sim.step_response`), so 'pid' is the default.
+    """
+    def __init__(self, config, frame_width: int, frame_height: int, max_speed: float):
+        self.center_x = frame_width / 2
+        self.center_y = frame_height / 2
+        self.max_speed = max_speed
+
+    def reset(self):
+        pass
+
+    def update(self, cx: float, cy: float, roll: float, pitch: float, altitude: float,
+               timestamp: float, velocity=(0.0, 0.0)):
+        vel_y = ((cx - self.center_x) / self.center_x) * self.max_speed
+        vel_x = -((cy - self.center_y) / self.center_y) * self.max_speed
+        return vel_x, vel_y
+
+
+class PIDAlignmentController:
+    """
+    Aligns over the target in metres rather than pixels.
+
+    The pixel centroid is projected onto the ground with the camera model,
+    the vehicle's roll/pitch and its altitude, which gives the forward/right
+    error in metres with tilt compensated. Each axis runs a `PID` whose
+    proportional gain follows `ALIGN_GAIN_SCHEDULE` by altitude, plus a
+    feed-forward of the target's estimated ground velocity (the rate of
+    change of the error plus the vehicle's own velocity), so a drifting
+    target is tracked without a standing error.
+    """
+    def __init__(self, config, frame_width: int, frame_height: int, max_speed: float):
+        self.camera = TargetGeolocator(config, frame_width, frame_height)
+        self.max_speed = max_speed
+        self.schedule_altitudes, self.schedule_gains = (np.array(v, dtype=float) for v in zip(*config.ALIGN_GAIN_SCHEDULE))
+        self.feedforward = config.ALIGN_FEEDFORWARD
+        self.velocity_filter = config.ALIGN_VELOCITY_FILTER
+        self.axes = [PID(self.schedule_gains[-1], config.ALIGN_KI, config.ALIGN_KD, max_speed,
+                         config.ALIGN_INTEGRAL_LIMIT) for _ in range(2)]
+        self.reset()
+
+    def reset(self):
+        for axis in self.axes:
+            axis.reset()
+        self.target_velocity = np.zeros(2)
+        self._last_error = None
+        self._last_timestamp = None
+
+    def metric_error(self, cx: float, cy: float, roll: float, pitch: float, altitude: float):
+        """
+        Returns the `(forward, right)` ground offset in metres from the vehicle to
+        the target seen at pixel `(cx, cy)`, or None if it cannot be projected.
+        """
+        offset = self.camera.ground_offset(cx, cy, roll, pitch, 0.0, altitude)
+        if offset is None:
+            return None
+        return np.array(offset[:2])
+
+    def gain(self, altitude: float) -> float:
+        return float(np.interp(altitude, self.schedule_altitudes, self.schedule_gains))
+
+    def update(self, cx: float, cy: float, roll: float, pitch: float, altitude: float,
+               timestamp: float, velocity=(0.0, 0.0)):
+        """
+        Returns the body-frame `(forward, right)` velocity command in m/s.
+        `timestamp` is the capture time of the detection and `velocity` the
+        vehicle's current body-frame `(forward, right)` velocity.
+        """
+        error = self.metric_error(cx, cy, roll, pitch, altitude)
+        if error is None:
+            return 0.0, 0.0
+
+        dt = 0.0 if self._last_timestamp is None else timestamp - self._last_timestamp
+        if self._last_error is not None and dt > 0:
+            observed = (error - self._last_error) / dt + np.asarray(velocity, dtype=float)
+            self.target_velocity += self.velocity_filter * (observed - self.target_velocity)
+        self._last_error = error
+        self._last_timestamp = timestamp
+
+        kp = self.gain(altitude)
+        command = np.array([axis.update(e, dt, kp) for axis, e in zip(self.axes, error)])
+        command += self.feedforward * self.target_velocity
+
+        speed = float(np.hypot(*command))
+        if speed > self.max_speed:
+            command *= self.max_speed / speed
+        return float(command[0]), float(command[1])
+
+
+ALIGNMENT_CONTROLLERS = {
+    'proportional': ProportionalAlignmentController,
+    'pid': PIDAlignmentController,
+}
+
+
+def create_alignment_controller(config, frame_width: int, frame_height: int, max_speed: float, name: str = None):
+    """
+    Builds the alignment controller selected by `name` or `config.ALIGN_CONTROLLER`.
+    """
+    name = name or config.ALIGN_CONTROLLER
+    if name not in ALIGNMENT_CONTROLLERS:
+        raise ValueError(f"Unknown alignment controller: {name}")
+    return ALIGNMENT_CONTROLLERS[name](config, frame_width, frame_height, max_speed)
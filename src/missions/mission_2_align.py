@@ -1,15 +1,22 @@
-import time
+import math
 import logging
 from dronekit import Vehicle, LocationGlobalRelative, VehicleMode
+from src.utils import clock, metrics
 from src.vision.target_detector import TargetDetector
-from src.utils.mavlink_helpers import condition_yaw, send_local_velocity, set_servo
+from src.vision.target_tracker import TargetTracker
+from src.utils.mavlink_helpers import condition_yaw, set_servo, sample_age
+from src.utils.setpoint_streamer import SetpointStreamer
+from src.missions.alignment_controller import create_alignment_controller
+from src.drone.waits import wait_for_altitude, wait_for_mode
 
 def align_and_drop_payload(vehicle: Vehicle, detector: TargetDetector, config):
     logging.info("Starting final alignment and payload drop sequence.")
 
     logging.info("Performing first alignment...")
+    detector.set_mode('align_coarse')
     if not perform_alignment(vehicle, detector, config.FIRST_ALIGN_TOLERANCE, config.ALIGN_AIRSPEED):
         logging.error("First alignment failed. Aborting drop.")
+        detector.set_mode('idle')
         return
 
     logging.info("First alignment successful. Descending for final alignment.")
@@ -17,69 +24,119 @@ def align_and_drop_payload(vehicle: Vehicle, detector: TargetDetector, config):
     current_loc = vehicle.location.global_relative_frame
     descend_point = LocationGlobalRelative(current_loc.lat, current_loc.lon, config.ALIGN_DESCEND_ALTITUDE)
     vehicle.simple_goto(descend_point, groundspeed=config.SLOW_AIRSPEED)
-    
-    while True:
-        alt = vehicle.location.global_relative_frame.alt
-        if alt <= config.ALIGN_DESCEND_ALTITUDE + 0.5:
-            break
-        time.sleep(1)
+    wait_for_altitude(vehicle, config.ALIGN_DESCEND_ALTITUDE + 0.5, above=False)
     
     logging.info(f"Reached final alignment altitude of {config.ALIGN_DESCEND_ALTITUDE}m.")
 
     logging.info("Performing final, high-precision alignment...")
+    detector.set_mode('align_fine')
     if not perform_alignment(vehicle, detector, config.FINAL_ALIGN_TOLERANCE, config.FINAL_ALIGN_AIRSPEED):
         logging.error("Final alignment failed. Aborting drop.")
+        detector.set_mode('idle')
         return
 
     logging.info("Final alignment successful. Switching to LOITER and dropping payload.")
+    detector.set_mode('idle')
 
     vehicle.mode = VehicleMode("LOITER")
-    while vehicle.mode.name != "LOITER":
-        time.sleep(0.5)
+    wait_for_mode(vehicle, "LOITER")
 
     logging.info("Mode switched to LOITER. Dropping payload now.")
     set_servo(vehicle, config.SERVO_CHANNEL, config.SERVO_OPEN_PWM)
-    time.sleep(3)
+    clock.sleep(3)
     set_servo(vehicle, config.SERVO_CHANNEL, config.SERVO_CLOSE_PWM)
     logging.info("Payload dropped. Servo closed.")
 
     vehicle.mode = VehicleMode("GUIDED")
-    while vehicle.mode.name != "GUIDED":
-        time.sleep(0.5)
+    wait_for_mode(vehicle, "GUIDED")
 
 def perform_alignment(vehicle: Vehicle, detector: TargetDetector, tolerance: int, speed: float) -> bool:
     timeout_seconds = 180
-    start_time = time.time()
+    start_time = clock.time()
+    config = detector.config
+    max_age = config.DETECTION_MAX_AGE
+    last_seq = 0
+    iterations = 0
+    controller = create_alignment_controller(config, detector.frame_width, detector.frame_height, speed)
+    tracker = TargetTracker(config)
+    coasted = 0
+    latency_metric = metrics.histogram('alignment_command_latency_seconds')
+    stale_metric = metrics.counter('alignment_stale_detections_total')
+    predicted_metric = metrics.counter('alignment_predicted_commands_total')
 
     logging.info("Aligning vehicle to North (0 degrees).")
     condition_yaw(vehicle, 0)
-    time.sleep(2)
-    
-    while time.time() - start_time < timeout_seconds:
-        detection = detector.latest_detection
-            
-        if not detection['found']:
-            logging.warning("Target lost during alignment.")
-            send_local_velocity(vehicle, 0, 0, 0, 0.5)
-            time.sleep(0.1)
-            continue
-        
-        cx, cy = detection['cx'], detection['cy']
-        center_x, center_y = detector.center_x, detector.center_y
-
-        if abs(cx - center_x) < tolerance and abs(cy - center_y) < tolerance:
-            logging.info(f"Alignment successful within tolerance of {tolerance}px.")
-            send_local_velocity(vehicle, 0, 0, 0, 1)
-            return True
-
-        error_x = cx - center_x
-        error_y = cy - center_y
-
-        vel_y = (error_x / center_x) * speed
-        vel_x = -(error_y / center_y) * speed
-
-        logging.info(f"Aligning... Pos:({cx},{cy}), Err:({error_x},{error_y}), Vel:({vel_x:.2f},{vel_y:.2f})")
-        send_local_velocity(vehicle, vel_x, vel_y, 0, 0.2)
+    clock.sleep(2)
+    align_start = clock.monotonic()
+
+    # The streamer keeps sending the latest velocity command in the background,
+    # so the loop can react to every new detection instead of sleeping through
+    # the previous command.
+    with SetpointStreamer(vehicle, config.SETPOINT_RATE_HZ, config.SETPOINT_WATCHDOG_TIMEOUT) as streamer:
+        while clock.time() - start_time < timeout_seconds:
+            detection = detector.wait_for_detection(last_seq, timeout=0.5)
+            if detection is None:
+                logging.warning("No fresh detection from vision system.")
+                continue
+            last_seq = detection['seq']
+
+            if clock.monotonic() - detection['timestamp'] > max_age:
+                logging.warning("Discarding stale detection.")
+                stale_metric.inc()
+                continue
+                
+            # Short dropouts and outliers are bridged by the tracker's prediction;
+            # the vehicle only stops once the track itself is lost.
+            was_tracking = tracker.active
+            track = tracker.update(detection)
+            if not track['found']:
+                if was_tracking:
+                    logging.warning("Target lost during alignment.")
+                    streamer.update(0, 0, 0)
+                    controller.reset()
+                continue
+            if track['predicted']:
+                coasted += 1
+                predicted_metric.inc()
+
+            cx, cy = track['cx'], track['cy']
+            center_x, center_y = detector.center_x, detector.center_y
+            iterations += 1
+
+            # Only a measured position may confirm the alignment
+            if not track['predicted'] and abs(cx - center_x) < tolerance and abs(cy - center_y) < tolerance:
+                logging.info(f"Alignment successful within tolerance of {tolerance}px after "
+                             f"{iterations} detections ({coasted} predicted) in {clock.monotonic() - align_start:.1f}s.")
+                logging.info(f"Detector stats: {detector.stats}")
+                streamer.update(0, 0, 0)
+                clock.sleep(1)
+                return True
+
+            # Ages feed the link manager's read-age statistics
+            sample_age('ATTITUDE')
+            sample_age('GLOBAL_POSITION_INT')
+            attitude = vehicle.attitude
+            altitude = vehicle.location.global_relative_frame.alt
+            vel_x, vel_y = controller.update(cx, cy, attitude.roll, attitude.pitch, altitude,
+                                             track['timestamp'], body_velocity(vehicle))
+
+            logging.debug(f"Aligning... Pos:({cx:.1f},{cy:.1f}), Err:({cx - center_x:.1f},{cy - center_y:.1f}), "
+                          f"Conf:{track['confidence']:.2f}, Vel:({vel_x:.2f},{vel_y:.2f})")
+            streamer.update(vel_x, vel_y, 0)
+            # Capture of the frame the command is based on to the command itself
+            latency_metric.observe(clock.monotonic() - detection['timestamp'])
 
     logging.error("Alignment timed out.")
-    return False
\ No newline at end of file
+    return False
+
+def body_velocity(vehicle: Vehicle):
+    """
+    Returns the vehicle's horizontal velocity as `(forward, right)` in m/s.
+    """
+    velocity = vehicle.velocity
+    yaw = vehicle.attitude.yaw
+    if not velocity or velocity[0] is None or yaw is None:
+        return 0.0, 0.0
+    north, east = velocity[0], velocity[1]
+    return (north * math.cos(yaw) + east * math.sin(yaw),
+            -north * math.sin(yaw) + east * math.cos(yaw))
\ No newline at end of file
@@ -0,0 +1,183 @@
+import logging
+from threading import Condition, Event
+from dronekit import Vehicle, VehicleMode, Command, LocationGlobalRelative
+from pymavlink import mavutil
+from src.utils import clock, metrics
+from src.drone.waits import wait_for_mode, MAX_WAIT_SLICE
+
+
+class MissionBuilder:
+    """
+    Collects navigation legs into a single AUTO mission that is uploaded in
+    one batch through `vehicle.commands`.
+
+    Intermediate waypoints are flown through without stopping: the autopilot
+    switches to the next leg as soon as the vehicle is inside the acceptance
+    radius. Only the last waypoint of a mission is a full stop.
+    Sequence numbers start at 1, since item 0 of an ArduPilot mission is home.
+
+    ArduCopter ignores the per-item acceptance radius and uses `WPNAV_RADIUS`
+    for every waypoint, so `acceptance_radius` (m) is set there before the
+    upload; None keeps the vehicle's setting.
+    """
+    def __init__(self, acceptance_radius: float = None):
+        self.acceptance_radius = acceptance_radius
+        self.commands = []
+        self.names = {}
+
+    @property
+    def last_seq(self) -> int:
+        return len(self.commands)
+
+    def waypoint(self, location: LocationGlobalRelative, name: str, hold_time: float = 0.0) -> int:
+        """
+        Appends a NAV_WAYPOINT and returns its sequence number.
+        `hold_time`: seconds to hold at the waypoint before continuing.
+        """
+        self.commands.append(Command(
+            0, 0, 0,
+            mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
+            mavutil.mavlink.MAV_CMD_NAV_WAYPOINT,
+            0, 0,               # current, autocontinue (set by dronekit)
+            hold_time,          # param 1, hold time (s)
+            0,                  # param 2, acceptance radius (unused by ArduCopter, see WPNAV_RADIUS)
+            0,                  # param 3, pass radius (0 passes through the waypoint)
+            0,                  # param 4, yaw (0 keeps the autopilot's default)
+            location.lat, location.lon, location.alt))
+        self.names[self.last_seq] = name
+        return self.last_seq
+
+    def speed(self, groundspeed: float) -> int:
+        """
+        Appends a DO_CHANGE_SPEED that applies to the following legs.
+        """
+        self.commands.append(Command(
+            0, 0, 0,
+            mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
+            mavutil.mavlink.MAV_CMD_DO_CHANGE_SPEED,
+            0, 0,
+            1,            # param 1, speed type (1 = ground speed)
+            groundspeed,  # param 2, speed (m/s)
+            -1,           # param 3, throttle (-1 = no change)
+            0, 0, 0, 0))
+        return self.last_seq
+
+    def upload(self, vehicle: Vehicle, timeout: float = None):
+        """
+        Replaces the vehicle's mission with these commands in one upload, after
+        setting `WPNAV_RADIUS` (cm) to the acceptance radius.
+        """
+        if self.acceptance_radius is not None:
+            vehicle.parameters['WPNAV_RADIUS'] = round(self.acceptance_radius * 100)
+            logging.info(f"Waypoint acceptance radius set to {self.acceptance_radius}m (WPNAV_RADIUS).")
+        commands = vehicle.commands
+        commands.clear()
+        # dronekit uploads the first command added as item 0, which ArduPilot
+        # keeps as home and never flies; a placeholder there puts every command
+        # on the sequence number `waypoint()` and `speed()` returned.
+        home = getattr(vehicle, 'home_location', None) or vehicle.location.global_frame
+        commands.add(Command(
+            0, 0, 0,
+            mavutil.mavlink.MAV_FRAME_GLOBAL,
+            mavutil.mavlink.MAV_CMD_NAV_WAYPOINT,
+            0, 0, 0, 0, 0, 0,
+            home.lat, home.lon, home.alt or 0))
+        for command in self.commands:
+            commands.add(command)
+        commands.upload(timeout=timeout)
+        logging.info(f"Uploaded mission with {len(self.commands)} items: {', '.join(self.names.values())}.")
+
+
+class MissionProgress:
+    """
+    Follows an AUTO mission through the MISSION_CURRENT and
+    MISSION_ITEM_REACHED messages, so callers can block until a waypoint is
+    reached or poll whether it has been. Use as a context manager to
+    register and remove the message listeners.
+    """
+    def __init__(self, vehicle: Vehicle, mission: MissionBuilder):
+        self.vehicle = vehicle
+        self.mission = mission
+        self.current = 0
+        self.last_reached = 0
+        self._updated = Condition()
+        self._leg_start = None
+
+    def __enter__(self):
+        self._leg_start = clock.monotonic()
+        self.vehicle.add_message_listener('MISSION_CURRENT', self._on_current)
+        self.vehicle.add_message_listener('MISSION_ITEM_REACHED', self._on_reached)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.vehicle.remove_message_listener('MISSION_CURRENT', self._on_current)
+        self.vehicle.remove_message_listener('MISSION_ITEM_REACHED', self._on_reached)
+
+    def _on_current(self, _vehicle, _name, message):
+        with self._updated:
+            if message.seq != self.current:
+                self.current = message.seq
+                self._updated.notify_all()
+
+    def _on_reached(self, _vehicle, _name, message):
+        with self._updated:
+            if message.seq > self.last_reached:
+                self.last_reached = message.seq
+                name = self.mission.names.get(message.seq)
+                if name:
+                    logging.info(f"Passed {name} (mission item {message.seq}).")
+                    # Time from the previous waypoint (or the mission start) to this one
+                    now = clock.monotonic()
+                    metrics.gauge('mission_leg_seconds', leg=name, result='arrived').set(now - self._leg_start)
+                    self._leg_start = now
+                self._updated.notify_all()
+
+    def reached(self, seq: int) -> bool:
+        """
+        True once mission item `seq` has been reached or the mission has moved past it.
+        """
+        return self.last_reached >= seq or self.current > seq
+
+    def wait_for(self, seq: int, timeout: float = None, cancel: Event = None) -> bool:
+        """
+        Blocks until mission item `seq` is reached; returns False on timeout or cancellation.
+        """
+        deadline = None if timeout is None else clock.monotonic() + timeout
+        with self._updated:
+            while not self.reached(seq):
+                if cancel is not None and cancel.is_set():
+                    logging.warning("Mission wait cancelled.")
+                    return False
+                now = clock.monotonic()
+                if deadline is not None and now >= deadline:
+                    logging.warning(f"Timed out waiting for {self.mission.names.get(seq, seq)}.")
+                    return False
+                wait_time = MAX_WAIT_SLICE if deadline is None else min(MAX_WAIT_SLICE, deadline - now)
+                self._updated.wait(clock.to_real(wait_time))
+        return True
+
+
+def start_mission(vehicle: Vehicle, first_seq: int = 1):
+    """
+    Starts the uploaded mission at item `first_seq` in AUTO mode.
+    """
+    vehicle.commands.next = first_seq
+    vehicle.mode = VehicleMode("AUTO")
+    wait_for_mode(vehicle, "AUTO")
+    logging.info("Mission started in AUTO mode.")
+
+
+def skip_to(vehicle: Vehicle, seq: int):
+    """
+    Makes mission item `seq` the current one, skipping the items before it.
+    """
+    vehicle.commands.next = seq
+    logging.info(f"Skipping ahead to mission item {seq}.")
+
+
+def resume_guided(vehicle: Vehicle):
+    """
+    Leaves AUTO for GUIDED, where the vehicle holds position until the next command.
+    """
+    vehicle.mode = VehicleMode("GUIDED")
+    wait_for_mode(vehicle, "GUIDED")
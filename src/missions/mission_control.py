@@ -1,22 +1,35 @@
-import time
 import logging
 from dronekit import Vehicle, LocationGlobalRelative
-from src.vision.target_detector import TargetDetector
+from src.utils import clock, metrics
+from src.utils.mavlink_helpers import sample_age
+from src.vision.target_detector import TargetDetector, log_mode_stats
+from src.vision.geolocation import PoseHistory, TargetGeolocator, TargetEstimate
 from src.missions.mission_2_align import align_and_drop_payload
+from src.missions.mission_builder import MissionBuilder, MissionProgress, start_mission, resume_guided, skip_to
+from src.missions.search_planner import plan_search
 from src.utils.transformations import get_distance_metres
+from src.drone.waits import wait_for_distance, wait_for_altitude
 
 
-def wait_for_arrival(vehicle: Vehicle, target_location: LocationGlobalRelative, location_name: str, tolerance: float = 1.0):
+def wait_for_arrival(vehicle: Vehicle, target_location: LocationGlobalRelative, location_name: str,
+                     tolerance: float = 1.0, timeout: float = None, cancel=None) -> bool:
     """
     Waits until the vehicle reaches a target location within a given tolerance.
-    """    
-    while True:
-        distance = get_distance_metres(vehicle.location.global_frame, target_location)
-        logging.info(f"Moving to {location_name}... Distance: {distance:.2f}m")
-        if distance <= tolerance:
-            logging.info(f"Arrived at {location_name} (within {tolerance}m).")
-            break
-        time.sleep(1)
+    Returns as soon as a position update satisfies the tolerance; returns False
+    on timeout or cancellation.
+    """
+    start = clock.monotonic()
+    arrived = wait_for_distance(vehicle, lambda: get_distance_metres(vehicle.location.global_frame, target_location),
+                                tolerance, timeout=timeout, cancel=cancel, label=location_name)
+    leg_time = metrics.gauge('mission_leg_seconds', leg=location_name, result='arrived' if arrived else 'missed')
+    leg_time.set(clock.monotonic() - start)
+    if arrived:
+        age = sample_age('GLOBAL_POSITION_INT')
+        age_note = f", position sample {age * 1000:.0f}ms old" if age is not None else ""
+        logging.info(f"Arrived at {location_name} (within {tolerance}m{age_note}).")
+    else:
+        logging.warning(f"Did not reach {location_name} (within {tolerance}m).")
+    return arrived
 
 def run_mission_2(vehicle: Vehicle, detector: TargetDetector, config):
     """
@@ -25,75 +38,119 @@ def run_mission_2(vehicle: Vehicle, detector: TargetDetector, config):
     logging.info("--- Starting Mission 2 ---")
     
     pre_mission_point = LocationGlobalRelative(*config.PRE_MISSION_POINT)
-    vehicle.simple_goto(pre_mission_point, groundspeed=config.DEFAULT_AIRSPEED)
-    wait_for_arrival(vehicle, pre_mission_point, "Staging Point", tolerance=1.0)
-
-    logging.info("Flying search pattern between posts to find target.")
-    first_post = LocationGlobalRelative(*config.FIRST_POST_POINT)
     second_post = LocationGlobalRelative(*config.SECOND_POST_POINT)
-    
-    vehicle.simple_goto(first_post, groundspeed=config.DEFAULT_AIRSPEED)
-    wait_for_arrival(vehicle, first_post, "First Post", tolerance=0.5)
+    pool_approach = LocationGlobalRelative(*config.POOL_APPROACH_POINT)
 
-    logging.info("Live camera feed enabled.")
-    detector.display_feed = True
-    
-    logging.info("Vision system is active. Starting target search pattern.")
-    
-    target_location = None
-    logging.info("Proceeding to Second Post, searching for target en route.")
-    vehicle.simple_goto(second_post, groundspeed=config.SLOW_AIRSPEED)
-    
-    while True:
-        distance_to_post2 = get_distance_metres(vehicle.location.global_frame, second_post)
-        if distance_to_post2 <= 0.5:
-            logging.info("Reached Second Post.")
-            break
-        
-        if target_location is None:
-            detection = detector.latest_detection
-            if detection['found']:
-                target_location = vehicle.location.global_relative_frame
-                logging.info(f"!!! TARGET SPOTTED (First Sighting) at Lat: {target_location.lat}, Lon: {target_location.lon} !!!")
-
-        time.sleep(0.1)
-
-    if not target_location:
-        logging.error("Failed to find target during search pattern. Mission aborted.")
-        return
+    # The search covers the area along a path sized from the camera footprint,
+    # instead of a single pass between the posts.
+    search = plan_search(config)
+    search.log_summary()
 
-    logging.info("Proceeding to pool location.")
-    pool_approach = LocationGlobalRelative(*config.POOL_APPROACH_POINT)
-    vehicle.simple_goto(pool_approach, groundspeed=config.DEFAULT_AIRSPEED)
-    wait_for_arrival(vehicle, pool_approach, "Pool Approach Point", tolerance=1.0)
+    # The legs up to the pool approach are uploaded as one AUTO mission, so the
+    # vehicle flies through the staging point and search path instead of stopping at each.
+    outbound = MissionBuilder(config.WAYPOINT_RADIUS)
+    outbound.speed(config.DEFAULT_AIRSPEED)
+    outbound.waypoint(pre_mission_point, "Staging Point")
+    search_start, search_end = search.add_to(outbound)
+    search_exit = outbound.speed(config.DEFAULT_AIRSPEED)
+    approach_seq = outbound.waypoint(pool_approach, "Pool Approach Point")
+    outbound.upload(vehicle, timeout=config.MISSION_UPLOAD_TIMEOUT)
+
+    # Every sighting on the pass is projected to the ground with the pose at its
+    # capture time and fused, instead of keeping the vehicle position at the first sighting.
+    poses = PoseHistory(vehicle, config.GEOLOCATION_POSE_HISTORY)
+    geolocator = TargetGeolocator(config, detector.frame_width, detector.frame_height, poses)
+    estimate = TargetEstimate(config.GEOLOCATION_GPS_SIGMA, config.GEOLOCATION_GATE, config.GEOLOCATION_SEED)
+    search_altitude = None
+    last_seq = 0
+
+    with MissionProgress(vehicle, outbound) as progress, poses:
+        start_mission(vehicle)
+        if not progress.wait_for(search_start, timeout=config.MISSION_LEG_TIMEOUT):
+            resume_guided(vehicle)
+            logging.error("Did not reach the search area. Mission aborted.")
+            return
+
+        logging.info("Live camera feed enabled.")
+        detector.display_feed = True
+        detector.set_mode('search')
+
+        logging.info(f"Vision system is active. Searching for target over {len(search)} waypoints.")
+        # The search ends at the planned time plus a margin even if the mission stalls
+        search_deadline = clock.monotonic() + search.duration + config.SEARCH_TIMEOUT_MARGIN
+        while not progress.reached(search_end):
+            if vehicle.mode.name != "AUTO":
+                logging.error(f"Search interrupted: vehicle left AUTO for {vehicle.mode.name}.")
+                break
+            if clock.monotonic() > search_deadline:
+                logging.error("Search did not finish in time; leaving the search path.")
+                skip_to(vehicle, search_exit)
+                break
+
+            # Wakes up as soon as a new frame is processed instead of polling
+            detection = detector.wait_for_detection(last_seq, timeout=0.1)
+            if detection is None:
+                continue
+            last_seq = detection['seq']
+
+            fresh = clock.monotonic() - detection['timestamp'] <= config.DETECTION_MAX_AGE
+            if not (detection['found'] and fresh):
+                continue
+
+            sighting = geolocator.locate(vehicle, detection['cx'], detection['cy'], detection['timestamp'])
+            if sighting is None:
+                continue
+
+            if search_altitude is None:
+                search_altitude = vehicle.location.global_relative_frame.alt
+                logging.info(f"!!! TARGET SPOTTED (First Sighting) at Lat: {sighting[0].lat}, Lon: {sighting[0].lon} !!!")
+            # Enough consistent sightings: skip the rest of the search path
+            if estimate.add(*sighting) and estimate.count >= config.SEARCH_CONFIRM_SIGHTINGS:
+                logging.info(f"Target confirmed by {estimate.count} sightings; ending the search early.")
+                skip_to(vehicle, search_exit)
+                break
+
+        detector.set_mode('idle')
+        # Fewer sightings than GEOLOCATION_SEED agreed: use the best group of them
+        estimate.settle()
+        if estimate.count == 0:
+            resume_guided(vehicle)
+            logging.error("Failed to find target during search pattern. Mission aborted.")
+            return
+
+        logging.info("Proceeding to pool location.")
+        if not progress.wait_for(approach_seq, timeout=config.MISSION_LEG_TIMEOUT):
+            resume_guided(vehicle)
+            logging.error("Did not reach the Pool Approach Point. Mission aborted.")
+            return
+    resume_guided(vehicle)
+
+    estimate.log_summary()
+    target_location = estimate.location(search_altitude)
+    logging.info(f"Fused target location: Lat: {target_location.lat}, Lon: {target_location.lon}")
 
     pool_loc = LocationGlobalRelative(*config.POOL_LOCATION)
     vehicle.simple_goto(pool_loc, groundspeed=config.SLOW_AIRSPEED)
-    wait_for_arrival(vehicle, pool_loc, "Pool Location", tolerance=0.35)
+    if not wait_for_arrival(vehicle, pool_loc, "Pool Location", tolerance=0.35, timeout=config.MISSION_LEG_TIMEOUT):
+        logging.error("Mission aborted.")
+        return
     
     descend_to_pool = LocationGlobalRelative(pool_loc.lat, pool_loc.lon, 2.0)
     vehicle.simple_goto(descend_to_pool)
-    while True:
-        alt = vehicle.location.global_relative_frame.alt
-        logging.info(f"Descending to pool... Current alt: {alt:.2f}m")
-        if alt <= 2.5:
-            break
-        time.sleep(1)
+    wait_for_altitude(vehicle, 2.5, above=False, label="Descending to pool... Current alt")
     logging.info("Water payload acquired.")
 
     ascend_from_pool = LocationGlobalRelative(pool_loc.lat, pool_loc.lon, config.TARGET_ALTITUDE)
     vehicle.simple_goto(ascend_from_pool)
-    while True:
-        alt = vehicle.location.global_relative_frame.alt
-        logging.info(f"Ascending from pool... Current alt: {alt:.2f}m")
-        if alt >= config.TARGET_ALTITUDE * 0.95:
-            break
-        time.sleep(1)
+    wait_for_altitude(vehicle, config.TARGET_ALTITUDE * 0.95, above=True, label="Ascending from pool... Current alt")
     logging.info("Ascended from pool.")
 
     logging.info("Proceeding to captured target location.")
     vehicle.simple_goto(target_location, groundspeed=config.SLOW_AIRSPEED)
-    wait_for_arrival(vehicle, target_location, "Captured Target Location", tolerance=0.3)
+    if not wait_for_arrival(vehicle, target_location, "Captured Target Location", tolerance=0.3,
+                            timeout=config.MISSION_LEG_TIMEOUT):
+        logging.error("Mission aborted.")
+        return
 
     align_and_drop_payload(vehicle, detector, config)
 
@@ -101,15 +158,21 @@ def run_mission_2(vehicle: Vehicle, detector: TargetDetector, config):
     current_loc = vehicle.location.global_relative_frame
     ascend_point = LocationGlobalRelative(current_loc.lat, current_loc.lon, config.TARGET_ALTITUDE)
     vehicle.simple_goto(ascend_point)
-    time.sleep(3)
-
-    logging.info("Payload sequence complete. Returning to Second Post.")
-    vehicle.simple_goto(second_post, groundspeed=config.DEFAULT_AIRSPEED)
-    wait_for_arrival(vehicle, second_post, "Second Post", tolerance=1.0)
+    clock.sleep(3)
 
-    logging.info("Proceeding to landing zone.")
+    logging.info("Payload sequence complete. Returning to landing zone via the Second Post.")
     landing_zone_loc = LocationGlobalRelative(*config.LANDING_ZONE)
-    vehicle.simple_goto(landing_zone_loc, groundspeed=config.DEFAULT_AIRSPEED)
-    wait_for_arrival(vehicle, landing_zone_loc, "Landing Zone", tolerance=1.0)
+    inbound = MissionBuilder(config.WAYPOINT_RADIUS)
+    inbound.speed(config.DEFAULT_AIRSPEED)
+    inbound.waypoint(second_post, "Second Post")
+    landing_seq = inbound.waypoint(landing_zone_loc, "Landing Zone")
+    inbound.upload(vehicle, timeout=config.MISSION_UPLOAD_TIMEOUT)
+
+    with MissionProgress(vehicle, inbound) as progress:
+        start_mission(vehicle)
+        if not progress.wait_for(landing_seq, timeout=config.MISSION_LEG_TIMEOUT):
+            logging.error("Did not reach the Landing Zone; landing where the vehicle is.")
+    resume_guided(vehicle)
+    log_mode_stats(detector.mode_stats)
     
     logging.info("--- Mission 2 Complete ---")
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Coverage search paths sized from the camera footprint.
+
+Track spacing and speed follow from the camera field of view, the search
+altitude and the detection rate: adjacent tracks are close enough that the
+whole target is in view from one of them wherever it lies, and the vehicle
+is slow enough that it stays fully in view for SEARCH_MIN_DETECTIONS
+processed frames on a pass. Paths are built with NumPy in a local
+East/North frame, so re-planning for a new field takes about a millisecond.
+
+Patterns (`SEARCH_PATTERN`):
+    lawnmower         parallel tracks across the area, along its narrowest direction
+    expanding_square  a square spiral outwards from the area's centroid
+"""
+import math
+import logging
+import numpy as np
+from dronekit import LocationGlobalRelative
+from src.utils.geodesy import LocalFrame
+
+# Expanding-square leg directions as East/North unit vectors: N, E, S, W
+SQUARE_DIRECTIONS = np.array([[0.0, 1.0], [1.0, 0.0], [0.0, -1.0], [-1.0, 0.0]])
+
+
+class SearchPlan:
+    """
+    A coverage path: waypoints as `lat`/`lon` arrays at `altitude` (relative,
+    m), flown at `speed` (m/s) with tracks `spacing` metres apart.
+    """
+    def __init__(self, pattern: str, lat, lon, altitude: float, spacing: float, speed: float, length: float):
+        self.pattern = pattern
+        self.lat = lat
+        self.lon = lon
+        self.altitude = altitude
+        self.spacing = spacing
+        self.speed = speed
+        self.length = length
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def duration(self) -> float:
+        return self.length / self.speed
+
+    def locations(self):
+        return [LocationGlobalRelative(float(lat), float(lon), self.altitude) for lat, lon in zip(self.lat, self.lon)]
+
+    def add_to(self, mission):
+        """
+        Appends the path to a `MissionBuilder`: the first waypoint at the
+        current speed, then the search speed for the rest. Returns the
+        sequence numbers of the first and last search waypoints.
+        """
+        locations = self.locations()
+        first = mission.waypoint(locations[0], "Search 1")
+        mission.speed(self.speed)
+        last = first
+        for i, location in enumerate(locations[1:], start=2):
+            last = mission.waypoint(location, f"Search {i}")
+        return first, last
+
+    def log_summary(self):
+        logging.info(f"Search plan: {self.pattern}, {len(self)} waypoints, tracks {self.spacing:.1f}m apart "
+                     f"at {self.speed:.1f}m/s, {self.length:.0f}m (~{self.duration:.0f}s).")
+
+
+def coverage_parameters(config, altitude: float, frame_rate: float):
+    """
+    Returns `(spacing, speed, extension)` for a camera at `altitude` processing
+    `frame_rate` frames per second. The camera looks straight down with the
+    top of the image towards the direction of travel, so the horizontal field
+    of view spans the track and the vertical one runs along it.
+
+    `spacing` is the track spacing at which the whole target fits in the
+    footprint of one track wherever it lies, less `SEARCH_SIDELAP`; `speed`
+    the highest speed, up to `SEARCH_MAX_SPEED`, at which the whole target
+    stays in view for `SEARCH_MIN_DETECTIONS` frames; `extension` how far a
+    track must run past a point for that point to get as many frames.
+    """
+    diameter = config.SEARCH_TARGET_DIAMETER
+    across = 2 * altitude * math.tan(math.radians(config.CAMERA_HFOV) / 2) - diameter
+    along = 2 * altitude * math.tan(math.radians(config.CAMERA_VFOV) / 2) - diameter
+    if across <= 0 or along <= 0:
+        raise ValueError(f"A {diameter}m target does not fit in the camera footprint at {altitude}m.")
+    spacing = across * (1 - config.SEARCH_SIDELAP)
+    speed = min(config.SEARCH_MAX_SPEED, frame_rate * along / config.SEARCH_MIN_DETECTIONS)
+    return spacing, speed, along / 2
+
+
+def search_frame_rate(config) -> float:
+    """
+    Detection rate assumed when sizing the search speed: `SEARCH_FRAME_RATE`,
+    or else the rate of the 'search' detector mode.
+    """
+    rate = config.SEARCH_FRAME_RATE or config.DETECTOR_MODES['search'].get('rate_hz')
+    if not rate:
+        raise ValueError("Set SEARCH_FRAME_RATE when the 'search' detector mode has no rate limit.")
+    return rate
+
+
+def corridor_polygon(start, end, width: float):
+    """
+    Returns the rectangle `width` metres wide centred on the segment from
+    `start` to `end` (East/North metres) as a `(4, 2)` array.
+    """
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    direction = (end - start) / np.linalg.norm(end - start)
+    side = np.array([-direction[1], direction[0]]) * width / 2
+    return np.array([start - side, end - side, end + side, start + side])
+
+
+def polygon_centroid(polygon):
+    """
+    Area centroid of a simple `(N, 2)` polygon (shoelace formula).
+    """
+    x, y = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y1 - x1 * y
+    area = cross.sum() / 2
+    if abs(area) < 1e-9:
+        return polygon.mean(axis=0)
+    return np.array([((x + x1) * cross).sum(), ((y + y1) * cross).sum()]) / (6 * area)
+
+
+def lawnmower_path(polygon, spacing: float, extension: float = 0.0):
+    """
+    Boustrophedon tracks `spacing` apart over an `(N, 2)` East/North polygon,
+    returned as a `(2 * tracks, 2)` array of track ends. Tracks run along the
+    polygon edge direction that gives the fewest of them, and each is
+    extended by `extension` past the polygon at both ends. A track spans its
+    outermost crossings with the polygon, so on concave areas it also flies
+    over the notches.
+    """
+    polygon = np.asarray(polygon, dtype=float)
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    directions = edges[lengths > 0] / lengths[lengths > 0, None]
+    normals = np.stack([-directions[:, 1], directions[:, 0]], axis=1)
+
+    # Polygon width across every candidate track direction at once
+    best = np.argmin(np.ptp(polygon @ normals.T, axis=0))
+    along, across = directions[best], normals[best]
+    u, w = polygon @ along, polygon @ across
+    width = w.max() - w.min()
+    count = max(1, math.ceil(width / spacing))
+    offsets = w.min() + (width - (count - 1) * spacing) / 2 + np.arange(count) * spacing
+
+    # Crossings of every track with every edge, (tracks, edges)
+    u0, u1, w0, w1 = u, np.roll(u, -1), w, np.roll(w, -1)
+    crosses = (w0 <= offsets[:, None]) != (w1 <= offsets[:, None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cross_u = u0 + (offsets[:, None] - w0) / (w1 - w0) * (u1 - u0)
+    start = np.where(crosses, cross_u, np.inf).min(axis=1)
+    end = np.where(crosses, cross_u, -np.inf).max(axis=1)
+    keep = np.isfinite(start)
+
+    ends = np.stack([start[keep] - extension, end[keep] + extension], axis=1)
+    ends[1::2] = ends[1::2, ::-1]
+    points = ends[..., None] * along + offsets[keep, None, None] * across
+    return points.reshape(-1, 2)
+
+
+def expanding_square_path(polygon, spacing: float, extension: float = 0.0):
+    """
+    Square spiral with legs `spacing` apart, from the centroid of an `(N, 2)`
+    East/North polygon outwards until the swaths of the last four legs lie
+    beyond the polygon on every side. The first leg starts `extension` south
+    of the centroid, so a target at the centroid gets a full pass.
+    """
+    polygon = np.asarray(polygon, dtype=float)
+    center = polygon_centroid(polygon)
+    radius = np.abs(polygon - center).max()
+    legs = np.arange(4 * math.ceil(radius / spacing) + 8)
+    directions = SQUARE_DIRECTIONS[legs % 4]
+    steps = ((legs // 2 + 1) * spacing)[:, None] * directions
+    points = center + np.vstack([np.zeros(2), np.cumsum(steps, axis=0)])
+
+    # A leg covers its side once its swath reaches past the polygon there
+    outward = np.stack([-directions[:, 1], directions[:, 0]], axis=1)
+    reach = (polygon @ outward.T).max(axis=0)
+    covered = np.einsum('ij,ij->i', points[1:], outward) + spacing / 2 >= reach
+    ring = covered[3:] & covered[2:-1] & covered[1:-2] & covered[:-3]
+    last_leg = int(np.argmax(ring)) + 3 if ring.any() else len(legs) - 1
+
+    points = points[:last_leg + 2]
+    points[0, 1] -= extension
+    return points
+
+
+SEARCH_PATTERNS = {
+    'lawnmower': lawnmower_path,
+    'expanding_square': expanding_square_path,
+}
+
+
+def plan_search(config, area=None, pattern: str = None, frame_rate: float = None) -> SearchPlan:
+    """
+    Plans the coverage search of `area` ((lat, lon) vertices; defaults to
+    `SEARCH_AREA`, or a corridor `SEARCH_CORRIDOR_WIDTH` wide from the first
+    to the second post) at `SEARCH_ALTITUDE` with `pattern` (defaults to
+    `SEARCH_PATTERN`).
+    """
+    pattern = pattern or config.SEARCH_PATTERN
+    if pattern not in SEARCH_PATTERNS:
+        logging.error(f"Unknown search pattern: {pattern}")
+        raise ValueError(f"Unknown search pattern: {pattern}")
+    altitude = config.SEARCH_ALTITUDE
+    spacing, speed, extension = coverage_parameters(config, altitude, frame_rate or search_frame_rate(config))
+
+    area = area if area is not None else config.SEARCH_AREA
+    if area is None:
+        frame = LocalFrame(*config.FIRST_POST_POINT[:2])
+        end = frame.to_enu(*config.SECOND_POST_POINT[:2])[:2]
+        polygon = corridor_polygon((0.0, 0.0), end, config.SEARCH_CORRIDOR_WIDTH)
+    else:
+        vertices = np.asarray(area, dtype=float)[:, :2]
+        if len(vertices) < 3:
+            raise ValueError("A search area needs at least 3 vertices.")
+        frame = LocalFrame(*vertices[0])
+        polygon = frame.to_enu(vertices[:, 0], vertices[:, 1])[:, :2]
+
+    path = SEARCH_PATTERNS[pattern](polygon, spacing, extension)
+    length = float(np.hypot(*np.diff(path, axis=0).T).sum())
+    lat, lon, _ = frame.from_enu(np.column_stack([path, np.zeros(len(path))]))
+    return SearchPlan(pattern, lat, lon, altitude, spacing, speed, length)
@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+from src.utils import clock
+from src.vision.frame_sources import _into
+from src.vision.geolocation import TargetGeolocator, rotation_matrix
+
+
+class SimCameraSource:
+    """
+    Renders what the downward camera of a `SimVehicle` sees: a red disc of
+    `target_radius` metres lying on the ground at `target` (lat, lon), on a
+    grey noisy background. The disc is projected with the same pinhole model
+    and mount as `TargetGeolocator`, so a perfect detection geolocates back
+    onto the target. Frames are paced at `fps` on the process clock; as with
+    `cv2.VideoCapture`, `grab` takes a frame and `retrieve` renders it.
+    `ground_truth` holds the disc centre `(cx, cy)` of the last frame, or None.
+    `dropout` is the probability that a frame misses the target altogether,
+    as with a glint or motion blur.
+    """
+    def __init__(self, vehicle, config, target, target_radius: float = 1.25,
+                 width: int = 640, height: int = 480, fps: float = 30.0,
+                 hsv_color=(170, 220, 220), seed: int = 0, dropout: float = 0.0):
+        self.vehicle = vehicle
+        self.width = width
+        self.height = height
+        self.target_radius = target_radius
+        self.frame_period = 1.0 / fps
+        self.has_ground_truth = True
+        self.ground_truth = None
+
+        self.model = TargetGeolocator(config, width, height)
+        self.target_ned = vehicle.frame.to_ned(target[0], target[1], vehicle.frame.home[2])
+        self.target_ned[2] = 0.0
+
+        hsv = np.uint8([[hsv_color]])
+        self.color = tuple(int(c) for c in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0])
+        self.dropout = dropout
+        self.rng = rng = np.random.default_rng(seed)
+        gray = rng.integers(40, 110, size=(height, width, 1), dtype=np.uint8)
+        self.background = np.repeat(gray, 3, axis=2)
+        self._frame = np.empty_like(self.background)
+        self._next_frame = None
+        self._pose = None
+        self._missed = False
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def project(self, pose=None):
+        """
+        Returns `(cx, cy, radius)` of the target in pixels, or None if it is
+        behind the camera. `pose`: `(position, attitude)`, defaults to the
+        vehicle's current one.
+        """
+        position, attitude = pose or (self.vehicle.position, self.vehicle.attitude)
+        offset = self.target_ned - position
+        body_to_ned = rotation_matrix(attitude.roll, attitude.pitch, attitude.yaw)
+        # Inverse of the geolocation ray: NED -> body -> camera (forward, right, down)
+        ray = self.model.mount.T @ (body_to_ned.T @ offset)
+        if ray[2] <= 1e-3:
+            return None
+
+        cx = self.model.cx + self.model.fx * ray[1] / ray[2]
+        cy = self.model.cy - self.model.fy * ray[0] / ray[2]
+        radius = self.model.fx * self.target_radius / float(np.linalg.norm(ray))
+        return cx, cy, radius
+
+    def grab(self):
+        """
+        Waits for the next frame period and fixes the pose the frame is taken
+        from, without rendering it, like `cv2.VideoCapture.grab`.
+        """
+        if not self._open:
+            return False
+
+        now = clock.monotonic()
+        if self._next_frame is None:
+            self._next_frame = now
+        clock.sleep(self._next_frame - now)
+        self._next_frame = max(self._next_frame + self.frame_period, clock.monotonic())
+
+        self._pose = (self.vehicle.position, self.vehicle.attitude)
+        self._missed = bool(self.dropout) and self.rng.random() < self.dropout
+        return True
+
+    def retrieve(self, image=None):
+        """
+        Renders the last grabbed frame.
+        """
+        if not self._open:
+            return False, None
+
+        np.copyto(self._frame, self.background)
+        projection = None if self._missed else self.project(self._pose)
+        self.ground_truth = None
+        if projection is not None:
+            cx, cy, radius = projection
+            limit = radius + max(self.width, self.height)
+            if abs(cx) < limit and abs(cy) < limit:
+                cv2.circle(self._frame, (int(round(cx)), int(round(cy))), max(1, int(round(radius))), self.color, -1)
+                if 0 <= cx < self.width and 0 <= cy < self.height:
+                    self.ground_truth = (int(round(cx)), int(round(cy)))
+        return _into(self._frame, image)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        self._open = False
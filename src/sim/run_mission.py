@@ -0,0 +1,123 @@
+"""
+Runs Mission 2 end to end against the in-process simulator, faster than real time.
+
+The real mission, action and alignment code flies a `SimVehicle` and sees
+through a `SimCameraSource`, while a `ScaledClock` makes every sleep and
+timeout run `--speedup` times faster. Vision processing still takes real
+time, which the scaled clock magnifies: if detections arrive too stale
+(see DETECTION_MAX_AGE), lower the speedup.
+
+Examples (run from the project root):
+    python -m src.sim.run_mission
+    python -m src.sim.run_mission --speedup 100 --resolution 320x240 --target-offset 2,-1 --verbose
+    python -m src.sim.run_mission --dropout 0.2
+    python -m src.sim.run_mission --metrics sim_metrics.prom
+"""
+import argparse
+import logging
+import time
+from threading import Event
+
+from src.utils import clock, metrics
+from src.utils.geodesy import offset_location, distance
+from src.drone.actions import arm_and_takeoff, land
+from src.missions.mission_control import run_mission_2
+from src.vision.target_detector import TargetDetector, register_detector_metrics
+from src.vision.benchmark import config_with
+from src.sim.vehicle import SimVehicle
+from src.sim.camera import SimCameraSource
+
+
+def default_target(cfg, north: float = 0.0, east: float = 0.0):
+    """
+    Places the target halfway between the two posts, shifted by `north`/`east` metres.
+    """
+    first, second = cfg.FIRST_POST_POINT, cfg.SECOND_POST_POINT
+    lat = (first[0] + second[0]) / 2
+    lon = (first[1] + second[1]) / 2
+    lat, lon, _ = offset_location(lat, lon, 0.0, north, east)
+    return float(lat), float(lon)
+
+
+def run_simulation(cfg, target, speedup: float, width: int, height: int, dropout: float = 0.0) -> dict:
+    """
+    Flies takeoff, Mission 2 and landing in simulation and returns a summary.
+    """
+    clock.set_clock(clock.ScaledClock(speedup))
+    home = cfg.LANDING_ZONE
+    vehicle = SimVehicle(home[0], home[1])
+    camera = SimCameraSource(vehicle, cfg, target, width=width, height=height, dropout=dropout)
+    stop_event = Event()
+    detector = TargetDetector(cfg, stop_event, source=camera)
+    register_detector_metrics(detector)
+
+    real_start = time.monotonic()
+    sim_start = clock.monotonic()
+    try:
+        detector.start()
+        arm_and_takeoff(vehicle, cfg.TARGET_ALTITUDE)
+        run_mission_2(vehicle, detector, cfg)
+        land(vehicle)
+    finally:
+        stop_event.set()
+        sim_elapsed = clock.monotonic() - sim_start
+        real_elapsed = time.monotonic() - real_start
+        detector.thread.join(timeout=2.0)
+        vehicle.close()
+        clock.set_clock(clock.SystemClock())
+
+    drops = [event for event in vehicle.events
+             if event[0] == 'servo' and event[2] == cfg.SERVO_CHANNEL and event[3] == cfg.SERVO_OPEN_PWM]
+    drop_error = None
+    if drops:
+        lat, lon, _ = vehicle.frame.from_ned(drops[0][4])
+        drop_error = float(distance(lat, lon, target[0], target[1]))
+
+    return {
+        'sim_seconds': sim_elapsed,
+        'real_seconds': real_elapsed,
+        'speedup': sim_elapsed / real_elapsed if real_elapsed > 0 else 0.0,
+        'drop_error': drop_error,
+        'detector': detector.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Mission 2 against the kinematic simulator.')
+    parser.add_argument('--speedup', type=float, default=50.0,
+                        help="Virtual seconds per real second.")
+    parser.add_argument('--target-offset', default='0,0',
+                        help="Target offset 'north,east' in metres from the midpoint between the posts.")
+    parser.add_argument('--resolution', default='640x480', help="Simulated camera resolution WxH.")
+    parser.add_argument('--dropout', type=float, default=0.0,
+                        help="Probability that a camera frame misses the target.")
+    parser.add_argument('--metrics', help="Export metrics to this file (.json for JSON, else Prometheus text).")
+    parser.add_argument('--verbose', action='store_true', help="Log the mission at INFO level.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    cfg = config_with(DISPLAY_FEED_ENABLED=False)
+    north, east = (float(v) for v in args.target_offset.split(','))
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    if args.metrics:
+        metrics.start_metrics(args.metrics, 'json' if args.metrics.endswith('.json') else 'prometheus')
+    try:
+        summary = run_simulation(cfg, default_target(cfg, north, east), args.speedup, width, height, args.dropout)
+    finally:
+        metrics.stop_metrics()
+
+    print(f"Simulated {summary['sim_seconds']:.1f}s of flight in {summary['real_seconds']:.1f}s "
+          f"({summary['speedup']:.1f}x real time)")
+    if summary['drop_error'] is None:
+        print("Payload was not dropped.")
+    else:
+        print(f"Payload dropped {summary['drop_error']:.2f}m from the target.")
+    stats = summary['detector']
+    print(f"Detector: {stats['processed']} frames processed, {stats['dropped']} dropped, "
+          f"avg latency {stats['avg_latency'] * 1000:.1f}ms (simulated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Offline step-response harness for the alignment controllers.
+
+Starts the vehicle hovering `--offset` metres from the target and closes the
+loop through a simple plant: detections at the camera rate with a fixed
+latency and pixel noise, and a vehicle whose velocity follows the command
+through a first-order lag and an acceleration limit. Reports, per
+controller and alignment stage, how many detections and seconds it takes
+until `perform_alignment` would accept the alignment, the settling time
+into the tolerance band, and the overshoot.
+
+Examples (run from the project root):
+    python -m src.sim.step_response
+    python -m src.sim.step_response --offset 2.0,-1.0 --target-velocity 0.1,0 --noise 2
+"""
+import argparse
+import math
+from collections import deque
+
+import numpy as np
+
+import src.config as config
+from src.missions.alignment_controller import create_alignment_controller, ALIGNMENT_CONTROLLERS
+
+
+def simulate_step(controller, cfg, altitude: float, offset, tolerance: float,
+                  frame_width: int = 640, frame_height: int = 480, rate_hz: float = 30.0,
+                  latency: float = 0.1, time_constant: float = 0.4, max_accel: float = 2.5,
+                  noise: float = 1.0, target_velocity=(0.0, 0.0), duration: float = 30.0, seed: int = 0) -> dict:
+    """
+    Runs one step response and returns its metrics. `offset` is the initial
+    `(forward, right)` position of the target relative to the vehicle in metres,
+    `tolerance` the pixel tolerance used by `perform_alignment`.
+    """
+    rng = np.random.default_rng(seed)
+    center_x, center_y = frame_width / 2, frame_height / 2
+    fx = center_x / math.tan(math.radians(cfg.CAMERA_HFOV) / 2)
+    fy = center_y / math.tan(math.radians(cfg.CAMERA_VFOV) / 2)
+
+    controller.reset()
+    dt = 0.005
+    period = 1.0 / rate_hz
+    steps_per_frame = max(1, int(round(period / dt)))
+    target = np.array(offset, dtype=float)
+    target_velocity = np.array(target_velocity, dtype=float)
+    position = np.zeros(2)
+    velocity = np.zeros(2)
+    command = np.zeros(2)
+    captures = deque()
+
+    initial = target.copy()
+    initial_norm = float(np.linalg.norm(initial))
+    direction = initial / initial_norm if initial_norm > 0 else np.zeros(2)
+    band = tolerance * altitude / fx
+    times, errors = [], []
+    accepted_at = None
+    detections = 0
+
+    t = 0.0
+    while t < duration:
+        error = target - position
+        captures.append((t, error.copy()))
+        times.append(t)
+        errors.append(error.copy())
+
+        # Act on the newest capture that has made it through the pipeline
+        latest = None
+        while captures and captures[0][0] <= t - latency:
+            latest = captures.popleft()
+        if latest is not None:
+            captured_at, seen = latest
+            cx = center_x + fx * seen[1] / altitude + rng.normal(0, noise)
+            cy = center_y - fy * seen[0] / altitude + rng.normal(0, noise)
+            detections += 1
+            if accepted_at is None and abs(cx - center_x) < tolerance and abs(cy - center_y) < tolerance:
+                accepted_at = (t, detections)
+            command = np.array(controller.update(cx, cy, 0.0, 0.0, altitude, captured_at, velocity))
+
+        for _ in range(steps_per_frame):
+            change = (command - velocity) * dt / time_constant
+            change_norm = float(np.linalg.norm(change))
+            if change_norm > max_accel * dt:
+                change *= max_accel * dt / change_norm
+            velocity = velocity + change
+            position = position + velocity * dt
+            target = target + target_velocity * dt
+        t += steps_per_frame * dt
+
+    errors = np.asarray(errors)
+    norms = np.linalg.norm(errors, axis=1)
+    outside = np.nonzero(norms > band)[0]
+    if len(outside) == 0:
+        settling_time = 0.0
+    elif outside[-1] == len(norms) - 1:
+        settling_time = None
+    else:
+        settling_time = times[outside[-1] + 1]
+    overshoot = max(0.0, -float((errors @ direction).min())) / initial_norm * 100 if initial_norm > 0 else 0.0
+
+    return {
+        'accepted_time': accepted_at[0] if accepted_at else None,
+        'accepted_detections': accepted_at[1] if accepted_at else None,
+        'settling_time': settling_time,
+        'overshoot': overshoot,
+        'final_error': float(norms[-1]),
+    }
+
+
+def _format(value, width: int) -> str:
+    if value is None:
+        return 'never'.rjust(width)
+    if isinstance(value, int):
+        return f"{value:{width}d}"
+    return f"{value:{width}.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Step response of the alignment controllers.')
+    parser.add_argument('--offset', default='1.5,1.0', help="Initial target offset 'forward,right' in metres.")
+    parser.add_argument('--target-velocity', default='0,0', help="Target drift 'forward,right' in m/s.")
+    parser.add_argument('--rate', type=float, default=30.0, help="Detection rate (Hz).")
+    parser.add_argument('--latency', type=float, default=0.1, help="Capture-to-command latency (s).")
+    parser.add_argument('--noise', type=float, default=1.0, help="Centroid noise (pixels, 1-sigma).")
+    parser.add_argument('--resolution', default='640x480', help="Camera resolution WxH.")
+    args = parser.parse_args()
+
+    offset = [float(v) for v in args.offset.split(',')]
+    drift = [float(v) for v in args.target_velocity.split(',')]
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    stages = [
+        ('first', config.TARGET_ALTITUDE, config.FIRST_ALIGN_TOLERANCE, config.ALIGN_AIRSPEED),
+        ('final', config.ALIGN_DESCEND_ALTITUDE, config.FINAL_ALIGN_TOLERANCE, config.FINAL_ALIGN_AIRSPEED),
+    ]
+
+    print(f"{'controller':<14}{'stage':<8}{'accepted (s)':>14}{'detections':>12}"
+          f"{'settling (s)':>14}{'overshoot %':>13}{'final err (m)':>15}")
+    for name in ALIGNMENT_CONTROLLERS:
+        for stage, altitude, tolerance, speed in stages:
+            controller = create_alignment_controller(config, width, height, speed, name=name)
+            result = simulate_step(controller, config, altitude, offset, tolerance, width, height,
+                                   rate_hz=args.rate, latency=args.latency, noise=args.noise,
+                                   target_velocity=drift)
+            print(f"{name:<14}{stage:<8}{_format(result['accepted_time'], 14)}"
+                  f"{_format(result['accepted_detections'], 12)}{_format(result['settling_time'], 14)}"
+                  f"{result['overshoot']:13.1f}{result['final_error']:15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+import math
+import logging
+import numpy as np
+from threading import Thread, Lock, Event
+from dronekit import (HasObservers, VehicleMode, LocationGlobal, LocationGlobalRelative,
+                      LocationLocal, Attitude, GPSInfo, SystemStatus)
+from pymavlink import mavutil
+from src.utils import clock
+from src.utils.geodesy import LocalFrame
+
+GRAVITY = 9.80665
+
+
+class _SimLocations:
+    """
+    Mirrors `vehicle.location` of dronekit for the simulated vehicle.
+    """
+    def __init__(self, vehicle):
+        self._vehicle = vehicle
+
+    @property
+    def local_frame(self):
+        north, east, down = self._vehicle.position
+        return LocationLocal(north, east, down)
+
+    @property
+    def global_frame(self):
+        lat, lon, alt = self._vehicle.frame.from_ned(self._vehicle.position)
+        return LocationGlobal(float(lat), float(lon), float(alt))
+
+    @property
+    def global_relative_frame(self):
+        north, east, down = self._vehicle.position
+        lat, lon, _ = self._vehicle.frame.from_ned((north, east, 0.0))
+        return LocationGlobalRelative(float(lat), float(lon), float(-down))
+
+
+class _SimCommands:
+    """
+    Mirrors `vehicle.commands` of dronekit: an editable mission that takes
+    effect on `upload()`. As in dronekit, `clear()` empties the whole list and
+    every added command is uploaded with its list position as sequence number,
+    so the first one added lands on item 0, which the autopilot treats as home
+    and never flies. `count` and indexing skip that item, like dronekit's.
+    """
+    def __init__(self, vehicle):
+        self._vehicle = vehicle
+        self._pending = []
+
+    def download(self):
+        pass
+
+    def wait_ready(self, **kwargs):
+        return True
+
+    def clear(self):
+        self._pending = []
+
+    def add(self, command):
+        self._pending.append(command)
+
+    def upload(self, timeout=None):
+        self._vehicle._load_mission(list(self._pending))
+
+    @property
+    def count(self):
+        return max(len(self._pending) - 1, 0)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self._pending[index + 1]
+
+    @property
+    def next(self):
+        return self._vehicle._mission_seq
+
+    @next.setter
+    def next(self, index):
+        self._vehicle._set_mission_seq(index)
+
+
+class SimVehicle(HasObservers):
+    """
+    An in-process kinematic stand-in for a dronekit `Vehicle` running ArduCopter.
+
+    Implements `location`, `attitude`, `velocity`, `mode`, `armed`,
+    `is_armable`, `simple_takeoff`, `simple_goto`, `send_mavlink`,
+    `commands`, `parameters` (only WPNAV_RADIUS is used) and the attribute
+    and message listeners used by the mission code. MAVLink messages are decoded by type: body/local velocity
+    setpoints, CONDITION_YAW and DO_SET_SERVO. AUTO mode flies uploaded
+    NAV_WAYPOINT / DO_CHANGE_SPEED missions and reports MISSION_CURRENT and
+    MISSION_ITEM_REACHED. The model integrates position with speed and acceleration
+    limits on the process clock (`src.utils.clock`), so it runs as fast as
+    the installed clock allows.
+    """
+    # ArduCopter-like limits
+    HORIZONTAL_ACCEL = 2.5      # m/s^2
+    VERTICAL_ACCEL = 2.5        # m/s^2
+    SPEED_UP = 2.5              # m/s
+    SPEED_DOWN = 1.5            # m/s
+    LAND_SPEED = 0.5            # m/s
+    YAW_RATE = math.radians(90) # rad/s
+    WAYPOINT_RADIUS = 2.0       # m, default acceptance radius (WPNAV_RADIUS)
+    POSITION_GAIN = 1.0         # 1/s, final approach speed per metre (PSC_POSXY_P)
+    VELOCITY_TIMEOUT = 3.0      # s, guided velocity commands expire after this
+
+    def __init__(self, home_lat: float, home_lon: float, home_alt: float = 0.0,
+                 rate_hz: float = 50.0, telemetry_hz: float = 10.0, groundspeed: float = 5.0):
+        super().__init__()
+        self.frame = LocalFrame(home_lat, home_lon, home_alt)
+        self.home_location = LocationGlobal(home_lat, home_lon, home_alt)
+        self.message_factory = mavutil.mavlink.MAVLink(None)
+        self.location = _SimLocations(self)
+        self.commands = _SimCommands(self)
+        self._message_listeners = {}
+
+        self.version = "SimVehicle"
+        self.parameters = {'WPNAV_RADIUS': self.WAYPOINT_RADIUS * 100}
+        self.gps_0 = GPSInfo(80, 120, 3, 12)
+        self.ekf_ok = True
+        self.system_status = SystemStatus('STANDBY')
+        self.groundspeed = groundspeed
+        self.servos = {}
+        self.events = []
+
+        self._lock = Lock()
+        self._position = np.zeros(3)
+        self._velocity = np.zeros(3)
+        self._accel = np.zeros(3)
+        self._yaw = 0.0
+        self._target_yaw = None
+        self._mode = 'STABILIZE'
+        self._armed = False
+        self._target_position = None
+        self._target_speed = groundspeed
+        self._velocity_command = None
+        self._velocity_command_time = 0.0
+        self._hold_position = np.zeros(3)
+        self._mission = []
+        self._mission_targets = []
+        self._mission_seq = 0
+        self._pending_messages = []
+
+        self._dt = 1.0 / rate_hz
+        self._telemetry_period = 1.0 / telemetry_hz
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- dronekit Vehicle interface ---
+
+    @property
+    def position(self):
+        with self._lock:
+            return self._position.copy()
+
+    @property
+    def velocity(self):
+        with self._lock:
+            return self._velocity.tolist()
+
+    @property
+    def attitude(self):
+        with self._lock:
+            accel = self._accel.copy()
+            yaw = self._yaw
+        # Tilt needed to produce the current horizontal acceleration
+        forward = accel[0] * math.cos(yaw) + accel[1] * math.sin(yaw)
+        right = -accel[0] * math.sin(yaw) + accel[1] * math.cos(yaw)
+        return Attitude(-math.atan2(forward, GRAVITY), yaw, math.atan2(right, GRAVITY))
+
+    @property
+    def heading(self):
+        return int(math.degrees(self._yaw) % 360)
+
+    @property
+    def mode(self):
+        return VehicleMode(self._mode)
+
+    @mode.setter
+    def mode(self, mode):
+        with self._lock:
+            self._mode = mode.name
+            self._velocity_command = None
+            self._hold_position = self._position.copy()
+            if mode.name != 'GUIDED':
+                self._target_position = None
+            if mode.name == 'AUTO':
+                self._mission_seq = max(self._mission_seq, 1)
+                self._queue_message(self.message_factory.mission_current_encode(self._mission_seq))
+        self.notify_attribute_listeners('mode', self.mode, cache=True)
+        self._flush_messages()
+
+    @property
+    def armed(self):
+        return self._armed
+
+    @armed.setter
+    def armed(self, value):
+        with self._lock:
+            self._armed = bool(value)
+            self._hold_position = self._position.copy()
+        self.system_status = SystemStatus('ACTIVE' if value else 'STANDBY')
+        self.notify_attribute_listeners('armed', self._armed, cache=True)
+
+    @property
+    def is_armable(self):
+        return self._mode != 'INITIALISING' and self.gps_0.fix_type > 1 and self.ekf_ok
+
+    def simple_takeoff(self, altitude: float):
+        with self._lock:
+            if not self._armed or self._mode != 'GUIDED':
+                logging.warning("SimVehicle: takeoff ignored, vehicle must be armed in GUIDED.")
+                return
+            self._target_position = np.array([self._position[0], self._position[1], -altitude])
+            self._velocity_command = None
+
+    def simple_goto(self, location, airspeed=None, groundspeed=None):
+        speed = groundspeed or airspeed
+        if speed:
+            self.groundspeed = speed
+        north, east, _ = self.frame.to_ned(location.lat, location.lon, self.frame.home[2])
+        with self._lock:
+            self._target_position = np.array([north, east, -location.alt])
+            self._target_speed = self.groundspeed
+            self._velocity_command = None
+
+    def send_mavlink(self, message):
+        msg_type = message.get_type()
+        if msg_type == 'SET_POSITION_TARGET_LOCAL_NED':
+            self._handle_position_target(message)
+        elif msg_type == 'COMMAND_LONG':
+            self._handle_command_long(message)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def add_message_listener(self, name, fn):
+        listeners = self._message_listeners.setdefault(str(name), [])
+        if fn not in listeners:
+            listeners.append(fn)
+
+    def remove_message_listener(self, name, fn):
+        listeners = self._message_listeners.get(str(name), [])
+        if fn in listeners:
+            listeners.remove(fn)
+
+    def notify_message_listeners(self, name, message):
+        for fn in self._message_listeners.get(name, []) + self._message_listeners.get('*', []):
+            try:
+                fn(self, name, message)
+            except Exception:
+                logging.exception(f"SimVehicle: error in message listener for {name}")
+
+    def _queue_message(self, message):
+        self._pending_messages.append(message)
+
+    def _flush_messages(self):
+        with self._lock:
+            messages, self._pending_messages = self._pending_messages, []
+        for message in messages:
+            self.notify_message_listeners(message.get_type(), message)
+
+    # --- MAVLink decoding ---
+
+    def _handle_position_target(self, message):
+        velocity = np.array([message.vx, message.vy, message.vz], dtype=float)
+        if message.coordinate_frame in (mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED,
+                                        mavutil.mavlink.MAV_FRAME_BODY_NED):
+            cos_yaw, sin_yaw = math.cos(self._yaw), math.sin(self._yaw)
+            velocity[:2] = (cos_yaw * velocity[0] - sin_yaw * velocity[1],
+                            sin_yaw * velocity[0] + cos_yaw * velocity[1])
+        with self._lock:
+            if self._mode == 'GUIDED':
+                self._velocity_command = velocity
+                self._velocity_command_time = clock.monotonic()
+
+    def _handle_command_long(self, message):
+        if message.command == mavutil.mavlink.MAV_CMD_CONDITION_YAW:
+            heading = math.radians(message.param1)
+            with self._lock:
+                self._target_yaw = (self._yaw + heading) if message.param4 else heading
+        elif message.command == mavutil.mavlink.MAV_CMD_DO_SET_SERVO:
+            channel, pwm = int(message.param1), int(message.param2)
+            self.servos[channel] = pwm
+            self.events.append(('servo', clock.monotonic(), channel, pwm, self.position))
+
+    # --- AUTO missions ---
+
+    def _load_mission(self, commands):
+        targets = []
+        for index, command in enumerate(commands):
+            if index > 0 and command.command == mavutil.mavlink.MAV_CMD_NAV_WAYPOINT:
+                north, east, _ = self.frame.to_ned(command.x, command.y, self.frame.home[2])
+                targets.append(np.array([north, east, -command.z]))
+            else:
+                targets.append(None)
+        with self._lock:
+            self._mission = commands
+            self._mission_targets = targets
+            self._mission_seq = 0
+
+    def _set_mission_seq(self, seq):
+        with self._lock:
+            self._mission_seq = seq
+            self._queue_message(self.message_factory.mission_current_encode(seq))
+        self._flush_messages()
+
+    def _next_waypoint(self, seq):
+        for target in self._mission_targets[seq:]:
+            if target is not None:
+                return target
+        return None
+
+    def _auto_velocity(self):
+        """
+        Advances the mission and returns the velocity towards the active waypoint.
+        Intermediate waypoints are passed through at a speed that still allows
+        the turn onto the next leg; the last one is approached to a stop.
+        """
+        # Item 0 is home; the mission proper runs from item 1
+        while 1 <= self._mission_seq < len(self._mission):
+            command = self._mission[self._mission_seq]
+            target = self._mission_targets[self._mission_seq]
+
+            if command.command == mavutil.mavlink.MAV_CMD_DO_CHANGE_SPEED:
+                if command.param2 > 0:
+                    self.groundspeed = command.param2
+            elif target is not None:
+                # Like ArduCopter, one radius for every waypoint
+                radius = self.parameters['WPNAV_RADIUS'] / 100
+                next_target = self._next_waypoint(self._mission_seq + 1)
+                if np.linalg.norm(target - self._position) > radius:
+                    if next_target is None:
+                        return self._approach(target, self.groundspeed)
+                    return self._approach(target, self.groundspeed,
+                                          exit_speed=self._corner_speed(target, next_target, radius))
+                self._hold_position = target.copy()
+                self._queue_message(self.message_factory.mission_item_reached_encode(self._mission_seq))
+
+            self._mission_seq += 1
+            if self._mission_seq < len(self._mission):
+                self._queue_message(self.message_factory.mission_current_encode(self._mission_seq))
+
+        return self._approach(self._hold_position, self.groundspeed)
+
+    def _corner_speed(self, target, next_target, radius):
+        """
+        Speed at which the turn from the current leg onto the next one can be
+        made within about the acceptance radius.
+        """
+        incoming = target[:2] - self._position[:2]
+        outgoing = next_target[:2] - target[:2]
+        norms = np.linalg.norm(incoming) * np.linalg.norm(outgoing)
+        if norms < 1e-6:
+            return 0.0
+        cos_turn = float(incoming @ outgoing) / norms
+        return max(math.sqrt(self.HORIZONTAL_ACCEL * radius), self.groundspeed * cos_turn)
+
+    # --- Kinematic model ---
+
+    def _desired_velocity(self, now):
+        """
+        Velocity the autopilot would command in the current mode (NED, m/s).
+        """
+        if not self._armed:
+            return np.zeros(3)
+
+        if self._mode == 'LAND':
+            return np.array([0.0, 0.0, self.LAND_SPEED])
+
+        if self._mode == 'AUTO':
+            return self._auto_velocity()
+
+        if self._mode == 'GUIDED':
+            if self._velocity_command is not None:
+                if now - self._velocity_command_time <= self.VELOCITY_TIMEOUT:
+                    return self._velocity_command
+                self._velocity_command = None
+                self._hold_position = self._position.copy()
+            if self._target_position is not None:
+                return self._approach(self._target_position, self._target_speed)
+
+        return self._approach(self._hold_position, self.groundspeed)
+
+    def _approach(self, target, speed, exit_speed=None):
+        """
+        Velocity towards `target` that respects speed limits and stops on it,
+        or passes it at no more than `exit_speed` when one is given.
+        """
+        delta = target - self._position
+        desired = np.zeros(3)
+
+        distance = math.hypot(delta[0], delta[1])
+        if distance > 1e-3:
+            if exit_speed is None:
+                limit = min(math.sqrt(2 * self.HORIZONTAL_ACCEL * distance), self.POSITION_GAIN * distance)
+            else:
+                limit = math.sqrt(exit_speed ** 2 + 2 * self.HORIZONTAL_ACCEL * distance)
+            desired[:2] = delta[:2] / distance * min(speed, limit)
+
+        vertical_limit = self.SPEED_DOWN if delta[2] > 0 else self.SPEED_UP
+        stopping_speed = math.sqrt(2 * self.VERTICAL_ACCEL * abs(delta[2]))
+        desired[2] = math.copysign(min(vertical_limit, stopping_speed, self.POSITION_GAIN * abs(delta[2])), delta[2])
+        return desired
+
+    def _step(self, dt, now):
+        with self._lock:
+            desired = self._desired_velocity(now)
+            change = desired - self._velocity
+
+            accel = np.zeros(3)
+            horizontal = math.hypot(change[0], change[1])
+            if horizontal > 0:
+                accel[:2] = change[:2] / horizontal * min(self.HORIZONTAL_ACCEL, horizontal / dt)
+            accel[2] = math.copysign(min(self.VERTICAL_ACCEL, abs(change[2]) / dt), change[2])
+
+            self._accel = accel
+            self._velocity += accel * dt
+            self._position += self._velocity * dt
+
+            if self._position[2] >= 0.0:
+                self._position[2] = 0.0
+                self._velocity[2] = min(self._velocity[2], 0.0)
+                if self._mode == 'LAND' and self._armed:
+                    self._velocity[:] = 0.0
+                    self._armed = False
+                    disarmed = True
+                else:
+                    disarmed = False
+            else:
+                disarmed = False
+
+            if self._target_yaw is not None:
+                error = (self._target_yaw - self._yaw + math.pi) % (2 * math.pi) - math.pi
+                step = max(-self.YAW_RATE * dt, min(self.YAW_RATE * dt, error))
+                self._yaw = (self._yaw + step) % (2 * math.pi)
+
+        if disarmed:
+            self.notify_attribute_listeners('armed', False, cache=True)
+        self._flush_messages()
+
+    def _publish_telemetry(self):
+        location = self.location
+        self.notify_attribute_listeners('location.global_frame', location.global_frame)
+        self.notify_attribute_listeners('location.global_relative_frame', location.global_relative_frame)
+        self.notify_attribute_listeners('location.local_frame', location.local_frame)
+        self.notify_attribute_listeners('location', location)
+        self.notify_attribute_listeners('attitude', self.attitude)
+        self.notify_attribute_listeners('velocity', self.velocity)
+
+    def _run(self):
+        last = clock.monotonic()
+        next_telemetry = last
+        while not self._stop.is_set():
+            clock.sleep(self._dt)
+            now = clock.monotonic()
+            elapsed = min(now - last, 0.5)
+            last = now
+
+            steps = max(1, int(math.ceil(elapsed / self._dt)))
+            for _ in range(steps):
+                self._step(elapsed / steps, now)
+
+            if now >= next_telemetry:
+                self._publish_telemetry()
+                next_telemetry += self._telemetry_period
+                if next_telemetry < now:
+                    next_telemetry = now + self._telemetry_period
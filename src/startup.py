@@ -0,0 +1,84 @@
+"""
+Startup orchestration: brings the vehicle link and the camera up concurrently.
+
+The camera is opened (and the vision stack imported) on a worker thread
+while the main thread imports dronekit, connects and waits for the vehicle
+attributes the mission needs (READY_ATTRIBUTES), rather than for the full
+parameter download, which dronekit keeps running in the background. The
+mission reads no vehicle parameters, so nothing waits for it. Every phase
+is timed for the startup report.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Lock
+
+
+class StartupTimer:
+    """
+    Records the wall-clock start and end of named startup phases, which may
+    overlap when they run on different threads.
+    """
+    def __init__(self):
+        self.origin = time.monotonic()
+        self.phases = []
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append((name, start - self.origin, time.monotonic() - self.origin))
+
+    def log_report(self):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        if not phases:
+            return
+        logging.info("Startup timing (s):      start      end  duration")
+        for name, start, end in phases:
+            logging.info(f"  {name:<20} {start:8.2f} {end:8.2f} {end - start:9.2f}")
+        total = max(end for _, _, end in phases)
+        serial = sum(end - start for _, start, end in phases)
+        logging.info(f"Ready after {total:.2f}s ({serial:.2f}s if run one after another).")
+
+
+class Startup:
+    """
+    Connects to the vehicle on the calling thread while the camera opens on
+    a worker thread. `run()` returns the vehicle (None if the connection
+    failed); `detector()` then waits for the camera and returns the detector,
+    re-raising any error from opening it.
+    """
+    def __init__(self, config, stop_event):
+        self.config = config
+        self.stop_event = stop_event
+        self.timer = StartupTimer()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='startup')
+        self._camera = None
+
+    def run(self, connection_string: str):
+        self._camera = self._pool.submit(self._open_camera)
+
+        with self.timer.phase('import dronekit'):
+            from src.drone.connection import connect_vehicle
+        with self.timer.phase('vehicle ready'):
+            vehicle = connect_vehicle(connection_string, self.config.BAUDRATE, self.config.TELEMETRY_RATES,
+                                      ready_attributes=self.config.READY_ATTRIBUTES)
+        return vehicle
+
+    def detector(self):
+        try:
+            return self._camera.result()
+        finally:
+            self._pool.shutdown(wait=False)
+
+    def _open_camera(self):
+        with self.timer.phase('import vision'):
+            from src.vision.target_detector import create_detector
+        with self.timer.phase('camera open'):
+            return create_detector(self.config, self.stop_event)
@@ -0,0 +1,79 @@
+"""
+Process-wide clock used by the mission, action and control code for all
+sleeps, timeouts and timestamps.
+
+In flight this is the system clock. The simulator installs a `ScaledClock`
+so that missions run many times faster than real time while every sleep,
+timeout and timestamp stays consistent.
+"""
+import time as _time
+
+
+class SystemClock:
+    speedup = 1.0
+
+    def time(self):
+        return _time.time()
+
+    def monotonic(self):
+        return _time.monotonic()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            _time.sleep(seconds)
+
+
+class ScaledClock:
+    """
+    A virtual clock running `speedup` times faster than the system clock.
+    Its epoch is part of its state, so a copy pickled into another process
+    (such as the process detector's worker) reads the same virtual time.
+    """
+    def __init__(self, speedup: float):
+        self.speedup = speedup
+        self._real_start = _time.monotonic()
+        self._wall_start = _time.time()
+
+    def monotonic(self):
+        return self._real_start + (_time.monotonic() - self._real_start) * self.speedup
+
+    def time(self):
+        return self._wall_start + (_time.monotonic() - self._real_start) * self.speedup
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            _time.sleep(seconds / self.speedup)
+
+
+_clock = SystemClock()
+
+
+def set_clock(clock):
+    global _clock
+    _clock = clock
+
+
+def get_clock():
+    return _clock
+
+
+def time():
+    return _clock.time()
+
+
+def monotonic():
+    return _clock.monotonic()
+
+
+def sleep(seconds: float):
+    _clock.sleep(seconds)
+
+
+def to_real(seconds):
+    """
+    Converts a duration on this clock to real seconds, for blocking calls
+    such as `Condition.wait` or `Event.wait`. None stays None.
+    """
+    if seconds is None:
+        return None
+    return seconds / _clock.speedup
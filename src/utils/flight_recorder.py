@@ -0,0 +1,197 @@
+"""
+Low-overhead binary flight recorder.
+
+Telemetry, every command sent through `mavlink_helpers` and every detector
+result are written as fixed-schema records into one of two preallocated
+NumPy structured-array buffers. A background thread swaps the buffers and
+copies the full one in bulk into a memory-mapped file, which
+`load_flight_log` opens again without copying. Record times are
+`clock.monotonic()` seconds, the time base of detection timestamps.
+
+Record layout (`values` columns by kind):
+    TELEMETRY  lat, lon, relative alt, roll, pitch, yaw, vx, vy
+    VELOCITY   vx, vy, vz (body NED, m/s)
+    YAW        heading (deg), relative flag
+    SERVO      channel, pwm
+    DETECTION  found, cx, cy, capture timestamp (monotonic s), shape score; `seq` is the detection sequence id
+"""
+import os
+import logging
+import numpy as np
+from threading import Thread, Lock, Event
+from src.utils import clock
+
+TELEMETRY, VELOCITY, YAW, SERVO, DETECTION = 1, 2, 3, 4, 5
+KIND_NAMES = {TELEMETRY: 'telemetry', VELOCITY: 'velocity', YAW: 'yaw', SERVO: 'servo', DETECTION: 'detection'}
+
+RECORD_DTYPE = np.dtype([
+    ('time', 'f8'),          # clock.monotonic() seconds
+    ('kind', 'u1'),
+    ('seq', 'u4'),
+    ('values', 'f8', (8,)),
+])
+_PADDING = (0.0,) * 8
+
+
+class FlightRecorder:
+    """
+    Records events into a buffer of `capacity` records and flushes them every
+    `flush_interval` seconds to `path`, which grows by `chunk_records` at a time.
+    Recording an event costs a lock and a row assignment, a few microseconds:
+    the flush only holds that lock to swap in the spare buffer, and copies
+    and grows the file under its own lock. Events recorded while the buffer
+    is full are dropped and counted in `lost`.
+    """
+    def __init__(self, path: str, capacity: int = 1 << 16, chunk_records: int = 1 << 18,
+                 flush_interval: float = 0.5):
+        self.path = path
+        self.capacity = capacity
+        self.chunk_records = chunk_records
+        self.flush_interval = flush_interval
+
+        self._buffer = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self._spare = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self._columns = self._columns_of(self._buffer)
+        self._count = 0          # records in the current buffer
+        self._lock = Lock()      # guards the current buffer
+        self._file_lock = Lock() # guards the file, the map and the spare buffer
+        self.lost = 0
+
+        self._file_records = 0   # capacity of the file, in records
+        self._file_used = 0      # records already written to the file
+        self._map = None
+        open(path, 'wb').close()
+        self._grow(chunk_records)
+
+        self._stop = Event()
+        self._thread = Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        logging.info(f"Flight recorder writing to {path}")
+
+    def record(self, kind: int, values=(), seq: int = 0, timestamp: float = None):
+        """
+        Appends one record; `values` is a tuple of at most 8 numbers.
+        """
+        padded = tuple(values) + _PADDING[len(values):]
+        if timestamp is None:
+            timestamp = clock.monotonic()
+        with self._lock:
+            i = self._count
+            if i >= self.capacity:
+                self.lost += 1
+                return
+            times, kinds, seqs, rows = self._columns
+            times[i] = timestamp
+            kinds[i] = kind
+            seqs[i] = seq
+            rows[i] = padded
+            self._count = i + 1
+
+    def attach_vehicle(self, vehicle):
+        """
+        Records a TELEMETRY sample on every position update from the vehicle.
+        """
+        def on_location(_vehicle, _attr_name, location):
+            if self._stop.is_set():
+                return
+            attitude = vehicle.attitude
+            velocity = vehicle.velocity or (0.0, 0.0, 0.0)
+            self.record(TELEMETRY, (location.lat, location.lon, location.alt or 0.0,
+                                    attitude.roll or 0.0, attitude.pitch or 0.0, attitude.yaw or 0.0,
+                                    velocity[0] or 0.0, velocity[1] or 0.0))
+
+        vehicle.add_attribute_listener('location.global_relative_frame', on_location)
+
+    def flush(self):
+        """
+        Copies all pending records into the memory-mapped file.
+        """
+        with self._file_lock:
+            with self._lock:
+                buffer, count = self._buffer, self._count
+                if count == 0:
+                    return
+                self._buffer, self._spare = self._spare, buffer
+                self._columns = self._columns_of(self._buffer)
+                self._count = 0
+
+            if self._file_used + count > self._file_records:
+                self._grow(max(self.chunk_records, count))
+            offset = self._file_used
+            self._map[offset:offset + count] = buffer[:count]
+            self._file_used += count
+
+    def close(self):
+        """
+        Flushes everything, trims the file to the recorded length and stops the flush thread.
+        """
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.flush()
+        with self._file_lock:
+            self._map.flush()
+            self._map = None
+            with open(self.path, 'r+b') as f:
+                f.truncate(self._file_used * RECORD_DTYPE.itemsize)
+        if self.lost:
+            logging.warning(f"Flight recorder buffer overflowed and lost {self.lost} records.")
+        logging.info(f"Flight recorder closed: {self._file_used} records in {self.path}")
+
+    @staticmethod
+    def _columns_of(buffer):
+        return buffer['time'], buffer['kind'], buffer['seq'], buffer['values']
+
+    def _grow(self, records: int):
+        if self._map is not None:
+            self._map.flush()
+        self._map = None
+        self._file_records += records
+        with open(self.path, 'r+b') as f:
+            f.truncate(self._file_records * RECORD_DTYPE.itemsize)
+        self._map = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r+', shape=(self._file_records,))
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+def load_flight_log(path: str):
+    """
+    Opens a recorded flight log as a read-only memory-mapped structured array (no copy).
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+
+
+def records_of(log, kind: int):
+    """
+    Returns the records of one kind from a loaded log.
+    """
+    return log[log['kind'] == kind]
+
+
+# Process-wide recorder used by the hooks below; None means recording is off
+# and every hook returns immediately.
+_recorder = None
+
+
+def start_recording(path: str, vehicle=None, **kwargs) -> FlightRecorder:
+    global _recorder
+    _recorder = FlightRecorder(path, **kwargs)
+    if vehicle is not None:
+        _recorder.attach_vehicle(vehicle)
+    return _recorder
+
+
+def stop_recording():
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+
+
+def record(kind: int, values=(), seq: int = 0, timestamp: float = None):
+    recorder = _recorder
+    if recorder is not None:
+        recorder.record(kind, values, seq, timestamp)
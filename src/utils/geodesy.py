@@ -0,0 +1,165 @@
+"""
+Vectorized WGS-84 geodesy.
+
+All functions take scalars or NumPy arrays (degrees for latitude/longitude,
+metres for altitude and offsets) and broadcast like NumPy ufuncs, so arrays
+of points can be compared against single points, paired element-wise, or
+against each other as a matrix with `a[:, None]` vs `b[None, :]`.
+Offsets are computed exactly through Earth-centred coordinates and a local
+tangent plane, which keeps them at millimetre level over the few kilometres
+a mission covers.
+"""
+import numpy as np
+
+# WGS-84 ellipsoid
+SEMI_MAJOR_AXIS = 6378137.0
+FLATTENING = 1 / 298.257223563
+ECCENTRICITY_SQ = FLATTENING * (2 - FLATTENING)
+SEMI_MINOR_AXIS = SEMI_MAJOR_AXIS * (1 - FLATTENING)
+
+
+def geodetic_to_ecef(lat, lon, alt=0.0):
+    """
+    Converts latitude/longitude (degrees) and ellipsoidal altitude (m) to ECEF `(x, y, z)` metres.
+    """
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    radius = SEMI_MAJOR_AXIS / np.sqrt(1 - ECCENTRICITY_SQ * sin_lat ** 2)
+    x = (radius + alt) * cos_lat * np.cos(lon)
+    y = (radius + alt) * cos_lat * np.sin(lon)
+    z = (radius * (1 - ECCENTRICITY_SQ) + alt) * sin_lat
+    return x, y, z
+
+
+def ecef_to_geodetic(x, y, z, iterations: int = 3):
+    """
+    Converts ECEF metres to `(lat, lon, alt)` in degrees and metres.
+    A few fixed-point iterations converge to well below a millimetre near the surface.
+    """
+    x, y, z = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(z, dtype=float)
+    lon = np.arctan2(y, x)
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1 - ECCENTRICITY_SQ))
+    for _ in range(iterations):
+        sin_lat = np.sin(lat)
+        radius = SEMI_MAJOR_AXIS / np.sqrt(1 - ECCENTRICITY_SQ * sin_lat ** 2)
+        alt = p / np.cos(lat) - radius
+        lat = np.arctan2(z, p * (1 - ECCENTRICITY_SQ * radius / (radius + alt)))
+
+    sin_lat = np.sin(lat)
+    radius = SEMI_MAJOR_AXIS / np.sqrt(1 - ECCENTRICITY_SQ * sin_lat ** 2)
+    alt = p / np.cos(lat) - radius
+    return np.degrees(lat), np.degrees(lon), alt
+
+
+def _enu_rotation(lat, lon):
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    return np.sin(lat), np.cos(lat), np.sin(lon), np.cos(lon)
+
+
+def enu_offset(lat1, lon1, alt1, lat2, lon2, alt2):
+    """
+    Returns the `(east, north, up)` offset in metres from points 1 to points 2,
+    expressed in the local tangent plane at points 1.
+    """
+    x1, y1, z1 = geodetic_to_ecef(lat1, lon1, alt1)
+    x2, y2, z2 = geodetic_to_ecef(lat2, lon2, alt2)
+    dx, dy, dz = x2 - x1, y2 - y1, z2 - z1
+    sin_lat, cos_lat, sin_lon, cos_lon = _enu_rotation(lat1, lon1)
+    east = -sin_lon * dx + cos_lon * dy
+    north = -sin_lat * cos_lon * dx - sin_lat * sin_lon * dy + cos_lat * dz
+    up = cos_lat * cos_lon * dx + cos_lat * sin_lon * dy + sin_lat * dz
+    return east, north, up
+
+
+def ned_offset(lat1, lon1, alt1, lat2, lon2, alt2):
+    """
+    Returns the `(north, east, down)` offset in metres from points 1 to points 2.
+    """
+    east, north, up = enu_offset(lat1, lon1, alt1, lat2, lon2, alt2)
+    return north, east, -up
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """
+    Returns the horizontal ground distance in metres between points 1 and 2.
+    """
+    east, north, _ = enu_offset(lat1, lon1, 0.0, lat2, lon2, 0.0)
+    return np.hypot(north, east)
+
+
+def bearing(lat1, lon1, lat2, lon2):
+    """
+    Returns the bearing in degrees (0-360, clockwise from North) from points 1 to points 2.
+    """
+    east, north, _ = enu_offset(lat1, lon1, 0.0, lat2, lon2, 0.0)
+    return np.degrees(np.arctan2(east, north)) % 360.0
+
+
+def offset_location(lat, lon, alt, north, east, down=0.0):
+    """
+    Returns the `(lat, lon, alt)` of the point `north`/`east`/`down` metres
+    from the given points, measured in their local tangent plane.
+    """
+    x, y, z = geodetic_to_ecef(lat, lon, alt)
+    sin_lat, cos_lat, sin_lon, cos_lon = _enu_rotation(lat, lon)
+    up = -np.asarray(down, dtype=float)
+    x = x - sin_lon * east - sin_lat * cos_lon * north + cos_lat * cos_lon * up
+    y = y + cos_lon * east - sin_lat * sin_lon * north + cos_lat * sin_lon * up
+    z = z + cos_lat * north + sin_lat * up
+    return ecef_to_geodetic(x, y, z)
+
+
+class LocalFrame:
+    """
+    A local tangent-plane frame anchored at `home`, for converting between
+    geodetic coordinates and North/East/Down (or East/North/Up) metres.
+    """
+    def __init__(self, home_lat: float, home_lon: float, home_alt: float = 0.0):
+        self.home = (home_lat, home_lon, home_alt)
+        self._origin = np.array(geodetic_to_ecef(home_lat, home_lon, home_alt))
+        sin_lat, cos_lat, sin_lon, cos_lon = _enu_rotation(home_lat, home_lon)
+        # Rows are the East, North and Up unit vectors in ECEF
+        self._rotation = np.array([
+            [-sin_lon, cos_lon, 0.0],
+            [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+            [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat],
+        ])
+
+    @classmethod
+    def from_location(cls, location):
+        """
+        Builds a frame anchored at a dronekit location object.
+        """
+        return cls(location.lat, location.lon, location.alt or 0.0)
+
+    def to_enu(self, lat, lon, alt=0.0):
+        """
+        Returns an `(..., 3)` array of East/North/Up metres for the given points.
+        """
+        ecef = np.stack(np.broadcast_arrays(*geodetic_to_ecef(lat, lon, alt)), axis=-1)
+        return (ecef - self._origin) @ self._rotation.T
+
+    def to_ned(self, lat, lon, alt=0.0):
+        """
+        Returns an `(..., 3)` array of North/East/Down metres for the given points.
+        """
+        enu = self.to_enu(lat, lon, alt)
+        return np.stack([enu[..., 1], enu[..., 0], -enu[..., 2]], axis=-1)
+
+    def from_enu(self, enu):
+        """
+        Converts an `(..., 3)` East/North/Up array back to `(lat, lon, alt)` arrays.
+        """
+        ecef = np.asarray(enu, dtype=float) @ self._rotation + self._origin
+        return ecef_to_geodetic(ecef[..., 0], ecef[..., 1], ecef[..., 2])
+
+    def from_ned(self, ned):
+        """
+        Converts an `(..., 3)` North/East/Down array back to `(lat, lon, alt)` arrays.
+        """
+        ned = np.asarray(ned, dtype=float)
+        return self.from_enu(np.stack([ned[..., 1], ned[..., 0], -ned[..., 2]], axis=-1))
@@ -1,7 +1,47 @@
-import time
 import logging
+import threading
+import weakref
 from dronekit import Vehicle
 from pymavlink import mavutil
+from src.utils import clock, flight_recorder, metrics
+
+# Per-thread cache of reusable message objects, see `_template`
+_local = threading.local()
+
+
+def _template(vehicle: Vehicle, name: str, build):
+    """
+    Returns this thread's cached message `name` for `vehicle`, built once
+    with `build()`. Hot-path senders overwrite its fields instead of encoding
+    a new message object for every send; this is safe because `send_mavlink`
+    packs the message into bytes immediately. The cache is per thread, so a
+    message being resent by one thread is never changed by another.
+    """
+    templates = getattr(_local, 'templates', None)
+    if templates is None:
+        templates = _local.templates = weakref.WeakKeyDictionary()
+    cache = templates.setdefault(vehicle, {})
+    message = cache.get(name)
+    if message is None:
+        message = cache[name] = build()
+    return message
+
+
+def command_long(vehicle: Vehicle, command: int, *params):
+    """
+    Returns a COMMAND_LONG message for `command` with up to seven `params`
+    (missing ones are 0), reusing this thread's cached message object.
+    """
+    msg = _template(vehicle, 'COMMAND_LONG', lambda: vehicle.message_factory.command_long_encode(
+        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0))
+    msg.target_system = 0
+    msg.target_component = 0
+    msg.command = command
+    msg.confirmation = 0
+    params = tuple(params) + (0,) * (7 - len(params))
+    (msg.param1, msg.param2, msg.param3, msg.param4,
+     msg.param5, msg.param6, msg.param7) = params
+    return msg
 
 def condition_yaw(vehicle: Vehicle, heading: float, relative: bool = False):
     """
@@ -14,17 +54,39 @@ def condition_yaw(vehicle: Vehicle, heading: float, relative: bool = False):
     else:
         is_relative = 0  # Yaw is an absolute angle
 
-    msg = vehicle.message_factory.command_long_encode(
-        0, 0,  # target system, target component
+    msg = command_long(
+        vehicle,
         mavutil.mavlink.MAV_CMD_CONDITION_YAW,  # command
-        0,  # confirmation
         heading,    # param 1, yaw in degrees
         0,          # param 2, yaw speed deg/s
         1,          # param 3, direction (-1 ccw, 1 cw)
-        is_relative,# param 4, relative offset (1) or absolute angle (0)
-        0, 0, 0)   # params 5-7 not used
+        is_relative)# param 4, relative offset (1) or absolute angle (0)
     
     vehicle.send_mavlink(msg)
+    flight_recorder.record(flight_recorder.YAW, (heading, is_relative))
+
+def velocity_message(vehicle: Vehicle, velocity_x: float, velocity_y: float, velocity_z: float):
+    """
+    Encodes a SET_POSITION_TARGET_LOCAL_NED message with only the velocity
+    fields enabled, in the NED frame relative to the vehicle's heading.
+    Senders write each command they send to the flight recorder.
+    The returned message is this thread's cached template (see `_template`):
+    send it before asking for the next one.
+    """
+    msg = _template(vehicle, 'SET_POSITION_TARGET_LOCAL_NED',
+                    lambda: vehicle.message_factory.set_position_target_local_ned_encode(
+                        0,       # time_boot_ms (not used)
+                        0, 0,    # target system, target component
+                        mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED, # Frame relative to vehicle body
+                        0b0000111111000111, # type_mask (only speeds enabled)
+                        0, 0, 0, # x, y, z positions (not used)
+                        0, 0, 0, # x, y, z velocity in m/s
+                        0, 0, 0, # x, y, z acceleration (not supported yet, ignored)
+                        0, 0))   # yaw, yaw_rate (not used)
+    msg.vx = velocity_x
+    msg.vy = velocity_y
+    msg.vz = velocity_z
+    return msg
 
 def send_local_velocity(vehicle: Vehicle, velocity_x: float, velocity_y: float, velocity_z: float, duration: float):
     """
@@ -35,20 +97,22 @@ def send_local_velocity(vehicle: Vehicle, velocity_x: float, velocity_y: float,
     `velocity_z`: Down velocity in m/s.
     `duration`: How long to send the command.
     """
-    msg = vehicle.message_factory.set_position_target_local_ned_encode(
-        0,       # time_boot_ms (not used)
-        0, 0,    # target system, target component
-        mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED, # Frame relative to vehicle body
-        0b0000111111000111, # type_mask (only speeds enabled)
-        0, 0, 0, # x, y, z positions (not used)
-        velocity_x, velocity_y, velocity_z, # x, y, z velocity in m/s
-        0, 0, 0, # x, y, z acceleration (not supported yet, ignored)
-        0, 0)    # yaw, yaw_rate (not used)
+    msg = velocity_message(vehicle, velocity_x, velocity_y, velocity_z)
+    sent_metric = metrics.counter('velocity_setpoints_sent_total', sender='send_local_velocity')
+    jitter_metric = metrics.histogram('velocity_setpoint_jitter_seconds', sender='send_local_velocity')
     
-    # Send the command for the specified duration
-    for _ in range(int(duration * 100)): # Send at 100Hz
+    # Send the command for the specified duration at 100Hz. Send times are
+    # scheduled from the start time so sleep overshoot does not accumulate.
+    period = 0.01
+    start = clock.monotonic()
+    for i in range(int(duration * 100)):
         vehicle.send_mavlink(msg)
-        time.sleep(0.01)
+        flight_recorder.record(flight_recorder.VELOCITY, (velocity_x, velocity_y, velocity_z))
+        sent_metric.inc()
+        jitter_metric.observe(abs(clock.monotonic() - (start + i * period)))
+        delay = start + (i + 1) * period - clock.monotonic()
+        if delay > 0:
+            clock.sleep(delay)
 
 def set_servo(vehicle: Vehicle, channel: int, pwm_value: int):
     """
@@ -56,13 +120,200 @@ def set_servo(vehicle: Vehicle, channel: int, pwm_value: int):
     `channel`: The servo channel (e.g., 6).
     `pwm_value`: The PWM value.
     """
-    msg = vehicle.message_factory.command_long_encode(
-        0, 0,  # target_system, target_component
+    msg = command_long(
+        vehicle,
         mavutil.mavlink.MAV_CMD_DO_SET_SERVO, # command
-        0,  # confirmation
         channel,
-        pwm_value,
-        0, 0, 0, 0, 0) # params 3-7 not used
+        pwm_value)
 
     vehicle.send_mavlink(msg)
-    logging.info(f"Setting servo {channel} to PWM {pwm_value}")
\ No newline at end of file
+    flight_recorder.record(flight_recorder.SERVO, (channel, pwm_value))
+    logging.info(f"Setting servo {channel} to PWM {pwm_value}")
+
+class LinkManager:
+    """
+    Requests the telemetry the mission reads at the rates it needs, with
+    MAV_CMD_SET_MESSAGE_INTERVAL, and measures the link. For each message
+    type it tracks the achieved receive rate, the age of the newest sample,
+    and how old samples were when the mission read them (see `sample_age`).
+    Across the link it counts sequence numbers lost per sender and reports
+    the depth of dronekit's send queue.
+    `rates`: {message name: Hz}; a rate of 0 leaves the autopilot's default.
+    """
+    def __init__(self, vehicle: Vehicle, rates: dict, rate_filter: float = 0.1):
+        self.vehicle = vehicle
+        self.rates = dict(rates)
+        self.rate_filter = rate_filter
+        self.received = 0
+        self.dropped = 0
+        # name -> [count, last receive time, filtered interval, reads, read age sum, read age max]
+        self._messages = {}
+        self._last_seq = {}
+
+    def start(self):
+        self.vehicle.add_message_listener('*', self._on_message)
+        self.request_rates()
+
+    def stop(self):
+        self.vehicle.remove_message_listener('*', self._on_message)
+
+    def request_rates(self):
+        """
+        Asks the autopilot to stream each configured message at its rate.
+        """
+        for name, rate in self.rates.items():
+            if rate <= 0:
+                continue
+            message_id = getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{name}")
+            self.vehicle.send_mavlink(command_long(
+                self.vehicle,
+                mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
+                message_id,             # param 1, message id
+                int(1e6 / rate)))       # param 2, interval (us)
+        logging.info("Requested telemetry rates: " +
+                     ", ".join(f"{name} {rate} Hz" for name, rate in self.rates.items() if rate > 0))
+
+    def _on_message(self, _vehicle, name, message):
+        if name == 'BAD_DATA':
+            return
+        now = clock.monotonic()
+        self.received += 1
+
+        # MAVLink sequence numbers count every message of a sender modulo 256
+        sender = (message.get_srcSystem(), message.get_srcComponent())
+        seq = message.get_seq()
+        last = self._last_seq.get(sender)
+        if last is not None and seq != last:
+            self.dropped += (seq - last - 1) % 256
+        self._last_seq[sender] = seq
+
+        entry = self._messages.get(name)
+        if entry is None:
+            self._messages[name] = [1, now, None, 0, 0.0, 0.0]
+            return
+        interval = now - entry[1]
+        entry[2] = interval if entry[2] is None else entry[2] + self.rate_filter * (interval - entry[2])
+        entry[0] += 1
+        entry[1] = now
+
+    def age(self, name: str):
+        """
+        Seconds since the newest `name` message arrived, or None if none has.
+        """
+        entry = self._messages.get(name)
+        return None if entry is None else clock.monotonic() - entry[1]
+
+    def rate(self, name: str) -> float:
+        """
+        Achieved receive rate of `name` messages (Hz).
+        """
+        entry = self._messages.get(name)
+        if entry is None or not entry[2]:
+            return 0.0
+        return 1.0 / entry[2]
+
+    def sample_age(self, name: str):
+        """
+        Like `age`, and also counts it as a read, for the read age statistics.
+        """
+        age = self.age(name)
+        if age is not None:
+            entry = self._messages[name]
+            entry[3] += 1
+            entry[4] += age
+            entry[5] = max(entry[5], age)
+        return age
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Messages waiting in dronekit's send queue (0 when there is none).
+        """
+        queue = getattr(getattr(self.vehicle, '_handler', None), 'out_queue', None)
+        return queue.qsize() if queue is not None else 0
+
+    @property
+    def stats(self):
+        """
+        Link totals and, per message type, the requested and achieved rates (Hz),
+        current age and mean/max age when read (s).
+        """
+        messages = {}
+        for name, (count, _, _, reads, age_sum, age_max) in list(self._messages.items()):
+            messages[name] = {
+                'count': count,
+                'requested': self.rates.get(name, 0),
+                'rate': self.rate(name),
+                'age': self.age(name),
+                'read_age_mean': age_sum / reads if reads else None,
+                'read_age_max': age_max if reads else None,
+            }
+        total = self.received + self.dropped
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'loss_percent': 100.0 * self.dropped / total if total else 0.0,
+            'queue_depth': self.queue_depth,
+            'messages': messages,
+        }
+
+    def log_summary(self):
+        stats = self.stats
+        logging.info(f"Link: {stats['received']} messages received, {stats['dropped']} lost "
+                     f"({stats['loss_percent']:.1f}%), send queue {stats['queue_depth']}.")
+        for name in self.rates:
+            message = stats['messages'].get(name)
+            if message is None:
+                logging.warning(f"Link: no {name} received.")
+                continue
+            line = f"Link: {name} {message['rate']:.1f}/{message['requested']} Hz"
+            if message['read_age_mean'] is not None:
+                line += (f", age when read {message['read_age_mean'] * 1000:.0f}ms mean, "
+                         f"{message['read_age_max'] * 1000:.0f}ms max")
+            logging.info(line)
+
+
+# Process-wide link manager; None until `start_link_manager` runs, in which
+# case `sample_age` returns None.
+_link = None
+
+
+def start_link_manager(vehicle: Vehicle, rates: dict) -> LinkManager:
+    global _link
+    _link = LinkManager(vehicle, rates)
+    _link.start()
+    register_link_metrics(_link)
+    return _link
+
+
+def register_link_metrics(link: LinkManager):
+    """
+    Exports the link totals and, per requested message type, the achieved
+    rate and current age, read from `link` at export time.
+    """
+    if not metrics.enabled():
+        return
+    metrics.counter('link_messages_received_total', read=lambda: link.received)
+    metrics.counter('link_messages_dropped_total', read=lambda: link.dropped)
+    metrics.gauge('link_send_queue_depth', read=lambda: link.queue_depth)
+    for name in link.rates:
+        metrics.gauge('link_message_rate_hz', read=lambda name=name: link.rate(name), message=name)
+        metrics.gauge('link_message_age_seconds', read=lambda name=name: link.age(name), message=name)
+
+
+def stop_link_manager():
+    global _link
+    link, _link = _link, None
+    if link is not None:
+        link.stop()
+        link.log_summary()
+
+
+def sample_age(name: str):
+    """
+    Age (s) of the newest `name` message as the mission reads it, or None.
+    """
+    link = _link
+    if link is not None:
+        return link.sample_age(name)
+    return None
@@ -0,0 +1,357 @@
+"""
+Process-wide metrics for the vision, control and link hot paths: counters,
+gauges and histograms, exported periodically to a file that a ground-side
+dashboard can scrape.
+
+Call sites fetch their metric handles once with `counter()`, `gauge()` and
+`histogram()`. Until `start_metrics` runs (METRICS_FILE is None) these return
+`NULL_METRIC`, whose methods do nothing, so disabled instrumentation costs an
+empty method call and records nothing.
+
+Updates are not locked: every metric is meant to be written by one thread,
+and the exporter reads whatever values are current when it runs.
+
+Export formats (`METRICS_FORMAT`):
+    prometheus  text exposition format, e.g. for node_exporter's textfile collector
+    json        one object with the value, rate or distribution of every metric
+"""
+import os
+import json
+import math
+import time
+import logging
+from bisect import bisect_left
+from contextlib import nullcontext
+from threading import Thread, Lock, Event
+
+# Histogram bucket upper bounds: 10 us to about 10 s, doubling
+DURATION_BUCKETS = tuple(1e-5 * 2 ** i for i in range(21))
+
+
+class Counter:
+    """
+    A monotonically increasing count. With `read`, the count is taken from
+    that callable at export time instead.
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, labels: dict, read=None):
+        self.name = name
+        self.labels = labels
+        self.read = read
+        self._value = 0
+
+    def inc(self, amount: float = 1):
+        self._value += amount
+
+    @property
+    def value(self):
+        return self.read() if self.read is not None else self._value
+
+
+class Gauge:
+    """
+    A value that goes up and down. With `read`, the value is taken from that
+    callable at export time instead of being `set()`.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, labels: dict, read=None):
+        self.name = name
+        self.labels = labels
+        self.read = read
+        self._value = None
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self):
+        return self.read() if self.read is not None else self._value
+
+
+class Histogram:
+    """
+    Distribution of observed values over fixed `bounds` (bucket upper bounds,
+    ascending). Observing is a bisect and a few additions.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, labels: dict, bounds=DURATION_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def time(self):
+        """
+        Context manager that observes the wall-clock duration of its block.
+        """
+        return _Timer(self)
+
+    def quantile(self, q: float):
+        """
+        Estimates the `q` quantile by interpolating within its bucket; None if empty.
+        """
+        counts = list(self.counts)
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class NullMetric:
+    """
+    Stand-in handed out while metrics are off; every call is a no-op.
+    """
+    def inc(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def time(self):
+        return nullcontext()
+
+
+NULL_METRIC = NullMetric()
+
+
+class MetricsRegistry:
+    """
+    Holds every metric by name and labels; asking for an existing metric
+    returns the same object.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def counter(self, name: str, read=None, **labels) -> Counter:
+        return self._get(Counter, name, labels, read)
+
+    def gauge(self, name: str, read=None, **labels) -> Gauge:
+        return self._get(Gauge, name, labels, read)
+
+    def histogram(self, name: str, bounds=DURATION_BUCKETS, **labels) -> Histogram:
+        return self._get(Histogram, name, labels, bounds)
+
+    def metrics(self) -> list:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def _get(self, cls, name: str, labels: dict, argument):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, {k: str(v) for k, v in labels.items()}, argument)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+
+def _prometheus_labels(labels: dict, extra: dict = None) -> str:
+    labels = dict(labels, **(extra or {}))
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+def _prometheus_number(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def format_prometheus(metrics: list, _exporter=None) -> str:
+    """
+    Renders `metrics` in the Prometheus text exposition format.
+    """
+    lines = []
+    typed = set()
+    for metric in sorted(metrics, key=lambda m: m.name):
+        if metric.name not in typed:
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            typed.add(metric.name)
+        if metric.kind == 'histogram':
+            cumulative = 0
+            for bound, count in zip(metric.bounds + (math.inf,), list(metric.counts)):
+                cumulative += count
+                labels = _prometheus_labels(metric.labels, {'le': _prometheus_number(bound)})
+                lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+            labels = _prometheus_labels(metric.labels)
+            lines.append(f"{metric.name}_sum{labels} {_prometheus_number(metric.sum)}")
+            lines.append(f"{metric.name}_count{labels} {cumulative}")
+            continue
+        value = metric.value
+        if value is not None:
+            lines.append(f"{metric.name}{_prometheus_labels(metric.labels)} {_prometheus_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def format_json(metrics: list, exporter=None) -> str:
+    """
+    Renders `metrics` as JSON: values for gauges, totals and per-second rates
+    since the previous export for counters, and count, mean, max and
+    p50/p90/p99 for histograms.
+    """
+    now = time.monotonic()
+    entries = []
+    for metric in metrics:
+        entry = {'name': metric.name, 'type': metric.kind, 'labels': metric.labels}
+        if metric.kind == 'histogram':
+            count = metric.count
+            entry.update(count=count, sum=metric.sum, mean=metric.sum / count if count else None,
+                         max=metric.max, p50=metric.quantile(0.5), p90=metric.quantile(0.9),
+                         p99=metric.quantile(0.99))
+        else:
+            entry['value'] = metric.value
+        if metric.kind == 'counter' and exporter is not None:
+            entry['rate'] = exporter.rate(metric, entry['value'], now)
+        entries.append(entry)
+    return json.dumps({'time': time.time(), 'metrics': entries})
+
+
+EXPORT_FORMATS = {
+    'prometheus': format_prometheus,
+    'json': format_json,
+}
+
+
+class MetricsExporter:
+    """
+    Writes the registry to `path` every `interval` seconds from a background
+    thread. Each export replaces the file atomically, so a scraper never
+    reads a partial file.
+    """
+    def __init__(self, registry: MetricsRegistry, path: str, fmt: str = 'prometheus', interval: float = 1.0):
+        if fmt not in EXPORT_FORMATS:
+            logging.error(f"Unknown metrics format: {fmt}")
+            raise ValueError(f"Unknown metrics format: {fmt}")
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._format = EXPORT_FORMATS[fmt]
+        self._previous = {}
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info(f"Exporting metrics to {self.path} every {self.interval}s.")
+
+    def stop(self):
+        """
+        Stops the export thread and writes a final export. A failed export is
+        only logged, so it cannot mask an error in the caller's teardown.
+        """
+        self._stop.set()
+        self._thread.join(timeout=self.interval + 1.0)
+        try:
+            self.export()
+        except Exception as e:
+            logging.warning(f"Final metrics export failed: {e}")
+
+    def export(self):
+        text = self._format(self.registry.metrics(), self)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(text)
+        os.replace(temporary, self.path)
+
+    def rate(self, metric, value, now: float):
+        """
+        Per-second increase of counter `metric` since the previous export.
+        """
+        previous = self._previous.get(id(metric))
+        self._previous[id(metric)] = (value, now)
+        if previous is None or now <= previous[1]:
+            return None
+        return (value - previous[0]) / (now - previous[1])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                logging.warning(f"Metrics export failed: {e}")
+
+
+# Process-wide registry and exporter; None until `start_metrics` runs, in
+# which case the metric functions below hand out NULL_METRIC.
+_registry = None
+_exporter = None
+
+
+def start_metrics(path: str, fmt: str = 'prometheus', interval: float = 1.0) -> MetricsRegistry:
+    global _registry, _exporter
+    registry = MetricsRegistry()
+    _exporter = MetricsExporter(registry, path, fmt, interval)
+    _registry = registry
+    _exporter.start()
+    return registry
+
+
+def stop_metrics():
+    global _registry, _exporter
+    exporter, _exporter = _exporter, None
+    _registry = None
+    if exporter is not None:
+        exporter.stop()
+
+
+def enabled() -> bool:
+    return _registry is not None
+
+
+def counter(name: str, read=None, **labels):
+    registry = _registry
+    return registry.counter(name, read, **labels) if registry is not None else NULL_METRIC
+
+
+def gauge(name: str, read=None, **labels):
+    registry = _registry
+    return registry.gauge(name, read, **labels) if registry is not None else NULL_METRIC
+
+
+def histogram(name: str, bounds=DURATION_BUCKETS, **labels):
+    registry = _registry
+    return registry.histogram(name, bounds, **labels) if registry is not None else NULL_METRIC
@@ -0,0 +1,125 @@
+import logging
+from threading import Thread, Lock, Event
+from dronekit import Vehicle
+from src.utils import clock, flight_recorder, metrics
+from src.utils.mavlink_helpers import velocity_message
+
+
+class SetpointStreamer:
+    """
+    Streams the current body-frame velocity setpoint to the vehicle from a
+    background thread at a fixed, drift-corrected rate.
+
+    `update(vx, vy, vz)` only swaps the setpoint and returns immediately.
+    If no update arrives within `watchdog_timeout` seconds the streamer falls
+    back to zero velocity, so a stalled caller never leaves the vehicle drifting.
+    Can be used as a context manager; leaving the block sends a zero setpoint and stops the thread.
+    """
+    def __init__(self, vehicle: Vehicle, rate_hz: float = 50.0, watchdog_timeout: float = 0.5):
+        self.vehicle = vehicle
+        self.period = 1.0 / rate_hz
+        self.watchdog_timeout = watchdog_timeout
+
+        self._lock = Lock()
+        self._stop = Event()
+        self._velocity = (0.0, 0.0, 0.0)
+        self._last_update = clock.monotonic()
+        self._thread = Thread(target=self._run, daemon=True)
+
+        self.sent = 0
+        self.watchdog_trips = 0
+        self.jitter_mean = 0.0
+        self.jitter_max = 0.0
+        self._started_at = None
+        self._sent_metric = metrics.counter('velocity_setpoints_sent_total', sender='streamer')
+        self._jitter_metric = metrics.histogram('velocity_setpoint_jitter_seconds', sender='streamer')
+        self._watchdog_metric = metrics.counter('setpoint_watchdog_trips_total')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self._started_at = clock.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        """
+        Sends a final zero setpoint and stops the streaming thread.
+        """
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self.vehicle.send_mavlink(velocity_message(self.vehicle, 0, 0, 0))
+        flight_recorder.record(flight_recorder.VELOCITY, (0.0, 0.0, 0.0))
+        logging.info(f"Setpoint streamer stopped: {self.stats}")
+
+    def update(self, velocity_x: float, velocity_y: float, velocity_z: float):
+        """
+        Replaces the streamed setpoint (NED body frame, m/s) and feeds the watchdog.
+        """
+        with self._lock:
+            self._velocity = (velocity_x, velocity_y, velocity_z)
+            self._last_update = clock.monotonic()
+
+    @property
+    def stats(self):
+        """
+        Messages sent, achieved send rate (Hz), mean/max send jitter (s) and watchdog trips.
+        """
+        elapsed = clock.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'sent': self.sent,
+            'rate': self.sent / elapsed if elapsed > 0 else 0.0,
+            'jitter_mean': self.jitter_mean,
+            'jitter_max': self.jitter_max,
+            'watchdog_trips': self.watchdog_trips,
+        }
+
+    def _run(self):
+        sent_velocity = None
+        msg = None
+        watchdog_tripped = False
+        next_send = clock.monotonic()
+
+        while not self._stop.is_set():
+            now = clock.monotonic()
+            with self._lock:
+                velocity = self._velocity
+                stale = now - self._last_update > self.watchdog_timeout
+
+            if stale:
+                if not watchdog_tripped:
+                    logging.warning("Setpoint watchdog: no velocity update, commanding zero velocity.")
+                    self.watchdog_trips += 1
+                    self._watchdog_metric.inc()
+                    watchdog_tripped = True
+                velocity = (0.0, 0.0, 0.0)
+            else:
+                watchdog_tripped = False
+
+            # Only re-encode the message when the setpoint changes
+            if velocity != sent_velocity:
+                msg = velocity_message(self.vehicle, *velocity)
+                sent_velocity = velocity
+
+            self.vehicle.send_mavlink(msg)
+            flight_recorder.record(flight_recorder.VELOCITY, velocity)
+            self.sent += 1
+            self._sent_metric.inc()
+
+            jitter = abs(now - next_send)
+            self._jitter_metric.observe(jitter)
+            self.jitter_mean += (jitter - self.jitter_mean) / self.sent
+            self.jitter_max = max(self.jitter_max, jitter)
+
+            # Schedule from the previous deadline so sleep overshoot does not
+            # accumulate; resynchronise if we fell more than a period behind.
+            next_send += self.period
+            delay = next_send - clock.monotonic()
+            if delay < -self.period:
+                next_send = clock.monotonic()
+            elif delay > 0:
+                self._stop.wait(clock.to_real(delay))
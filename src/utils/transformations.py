@@ -1,25 +1,28 @@
-import math
 from dronekit import LocationGlobal
+from src.utils import geodesy
 
 def get_location_metres(original_location, dNorth, dEast):
     """
     Returns a LocationGlobal object containing the latitude/longitude `dNorth`
     and `dEast` metres from the specified `original_location`.
     """
-    earth_radius = 6378137.0 
-    dLat = dNorth / earth_radius
-    dLon = dEast / (earth_radius * math.cos(math.pi * original_location.lat / 180))
-
-    newlat = original_location.lat + (dLat * 180 / math.pi)
-    newlon = original_location.lon + (dLon * 180 / math.pi)
+    newlat, newlon, _ = geodesy.offset_location(original_location.lat, original_location.lon, 0.0, dNorth, dEast)
     
-    return LocationGlobal(newlat, newlon, original_location.alt)
+    return LocationGlobal(float(newlat), float(newlon), original_location.alt)
+
+
+def get_offset_metres(original_location, location):
+    """
+    Returns the `(dNorth, dEast)` offset in metres from `original_location` to
+    `location`; the inverse of `get_location_metres`.
+    """
+    dNorth, dEast, _ = geodesy.ned_offset(original_location.lat, original_location.lon, 0.0,
+                                          location.lat, location.lon, 0.0)
+    return float(dNorth), float(dEast)
 
 
 def get_distance_metres(location1, location2):
     """
     Returns the ground distance in metres between two LocationGlobal objects.
     """
-    dlat = location2.lat - location1.lat
-    dlong = location2.lon - location1.lon
-    return math.sqrt((dlat * dlat) + (dlong * dlong)) * 1.113195e5
\ No newline at end of file
+    return float(geodesy.distance(location1.lat, location1.lon, location2.lat, location2.lon))
@@ -1 +1 @@
-from .target_detector import TargetDetector
\ No newline at end of file
+from .target_detector import TargetDetector, create_detector
\ No newline at end of file
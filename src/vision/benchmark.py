@@ -0,0 +1,185 @@
+"""
+Offline benchmark for the red-target detector.
+
+Replays a recorded video, a directory of images or synthetic frames through
+`TargetDetector._process_frame` without threads or a camera, and reports
+per-stage latency (cvtColor and inRange, or lookup; blur; morphology;
+findContours and moments, or components; shape score), end-to-end FPS and
+p50/p99 latency, and detection accuracy against ground truth.
+
+Examples (run from the project root):
+    python -m src.vision.benchmark --source synthetic --frames 500
+    python -m src.vision.benchmark --source flight.mp4 --labels flight.csv --resolutions 640x480,320x240
+    python -m src.vision.benchmark --source synthetic --min-areas 400,1400,3000
+    python -m src.vision.benchmark --source synthetic --distractors 6 --min-scores 0,0.8
+    python -m src.vision.benchmark --source synthetic --blob-methods contours,components
+    python -m src.vision.benchmark --source synthetic --color-classifiers hsv,lut --verify-lut
+    python -m src.vision.benchmark --source synthetic --modes search,align_coarse,align_fine
+"""
+import argparse
+import logging
+import time
+from threading import Event
+from types import SimpleNamespace
+
+import numpy as np
+
+import src.config as config
+from src.vision.target_detector import TargetDetector
+from src.vision.frame_sources import open_frame_source, ResizeSource, SyntheticSource
+from src.vision.stage_timer import StageTimer
+from src.vision.color_lut import verify_table
+
+
+def config_with(**overrides):
+    """
+    Returns a copy of the configuration with some parameters overridden.
+    """
+    values = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def run_benchmark(source, cfg, frames: int, tolerance: float, mode: str = 'align_fine') -> dict:
+    """
+    Runs `frames` frames from `source` through a detector built with `cfg`, in
+    operating `mode` (its processing rate limit does not apply here).
+    Ground truth is read from `source.ground_truth` for frames where
+    `source.has_ground_truth` is set; other frames are timed but not scored.
+    """
+    detector = TargetDetector(cfg, Event(), source=source)
+    # The detector reads a frame to size itself; start scoring from the first one
+    if hasattr(source, 'rewind'):
+        source.rewind()
+    detector.set_mode(mode)
+    detector.stage_timer = timer = StageTimer()
+
+    latencies = []
+    errors = []
+    counts = {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0, 'unlabelled': 0}
+
+    for _ in range(frames):
+        ret, frame = source.read()
+        if not ret:
+            break
+
+        start = time.perf_counter()
+        detector._process_frame(frame)
+        latencies.append(time.perf_counter() - start)
+
+        detection = detector.latest_detection
+        if not getattr(source, 'has_ground_truth', False):
+            counts['unlabelled'] += 1
+            continue
+
+        truth = source.ground_truth
+        if truth is None:
+            counts['fp' if detection['found'] else 'tn'] += 1
+        elif not detection['found']:
+            counts['fn'] += 1
+        else:
+            error = np.hypot(detection['cx'] - truth[0], detection['cy'] - truth[1])
+            if error <= tolerance:
+                counts['tp'] += 1
+                errors.append(error)
+            else:
+                counts['fp'] += 1
+                counts['fn'] += 1
+
+    latencies = np.asarray(latencies)
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / latencies.sum() if len(latencies) else 0.0,
+        'p50': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        'p99': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        'stages': timer.summary(),
+        'counts': counts,
+        'mean_error': float(np.mean(errors)) if errors else float('nan'),
+    }
+
+
+def print_report(label: str, result: dict):
+    counts = result['counts']
+    print(f"\n=== {label} ===")
+    print(f"Frames: {result['frames']}  FPS: {result['fps']:.1f}  "
+          f"p50: {result['p50'] * 1e3:.2f}ms  p99: {result['p99'] * 1e3:.2f}ms")
+    for stage, stats in result['stages'].items():
+        print(f"  {stage:<13} mean {stats['mean'] * 1e3:7.3f}ms  "
+              f"p50 {stats['p50'] * 1e3:7.3f}ms  p99 {stats['p99'] * 1e3:7.3f}ms")
+
+    labelled = result['frames'] - counts['unlabelled']
+    if labelled:
+        precision = counts['tp'] / max(1, counts['tp'] + counts['fp'])
+        recall = counts['tp'] / max(1, counts['tp'] + counts['fn'])
+        print(f"Accuracy over {labelled} labelled frames: precision {precision:.3f}, "
+              f"recall {recall:.3f}, mean centroid error {result['mean_error']:.2f}px "
+              f"(tp={counts['tp']} fp={counts['fp']} fn={counts['fn']} tn={counts['tn']})")
+    else:
+        print("No ground truth available; accuracy not scored.")
+
+
+def parse_resolution(text: str):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark for the target detector.')
+    parser.add_argument('--source', default='synthetic',
+                        help="'synthetic', a video file, an image directory or a camera index.")
+    parser.add_argument('--labels', default=None, help="CSV ground truth with frame,cx,cy rows.")
+    parser.add_argument('--frames', type=int, default=300, help="Number of frames to process per run.")
+    parser.add_argument('--resolutions', default=None,
+                        help="Comma-separated WxH list to compare, e.g. 640x480,320x240.")
+    parser.add_argument('--min-areas', default=None,
+                        help="Comma-separated MIN_CONTOUR_AREA values to compare.")
+    parser.add_argument('--min-scores', default=None,
+                        help="Comma-separated MIN_SHAPE_SCORE values to compare (0 accepts any blob).")
+    parser.add_argument('--blob-methods', default=None,
+                        help="Comma-separated BLOB_METHOD values to compare: contours,components.")
+    parser.add_argument('--color-classifiers', default=None,
+                        help="Comma-separated COLOR_CLASSIFIER values to compare: hsv,lut.")
+    parser.add_argument('--verify-lut', action='store_true',
+                        help="Check that the lookup table classifies all 2^24 colours like cvtColor + inRange.")
+    parser.add_argument('--modes', default='align_fine',
+                        help="Comma-separated detector modes to compare (align_fine runs at full resolution).")
+    parser.add_argument('--distractors', type=int, default=0,
+                        help="Red non-disc shapes to add to synthetic frames.")
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help="Maximum centroid error (px) for a detection to count as correct.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    resolutions = [parse_resolution(r) for r in args.resolutions.split(',')] if args.resolutions else [None]
+    min_areas = [int(a) for a in args.min_areas.split(',')] if args.min_areas else [config.MIN_CONTOUR_AREA]
+
+    min_scores = [float(s) for s in args.min_scores.split(',')] if args.min_scores else [config.MIN_SHAPE_SCORE]
+    methods = args.blob_methods.split(',') if args.blob_methods else [config.BLOB_METHOD]
+    classifiers = args.color_classifiers.split(',') if args.color_classifiers else [config.COLOR_CLASSIFIER]
+
+    if args.verify_lut:
+        mismatches = verify_table(config)
+        print(f"Lookup table vs cvtColor + inRange: {mismatches} of {1 << 24} colours differ.")
+
+    runs = [(r, a, s, m, c, d) for r in resolutions for a in min_areas for s in min_scores for m in methods
+            for c in classifiers for d in args.modes.split(',')]
+    for resolution, min_area, min_score, method, classifier, mode in runs:
+        if args.source == 'synthetic':
+            source = SyntheticSource(distractors=args.distractors)
+        else:
+            source = open_frame_source(args.source, loop=True, labels=args.labels)
+        label = f"{args.source} MIN_CONTOUR_AREA={min_area} MIN_SHAPE_SCORE={min_score} BLOB_METHOD={method} COLOR_CLASSIFIER={classifier} mode={mode}"
+        if resolution:
+            source = ResizeSource(source, *resolution)
+            label += f" {resolution[0]}x{resolution[1]}"
+
+        cfg = config_with(MIN_CONTOUR_AREA=min_area, MIN_SHAPE_SCORE=min_score, BLOB_METHOD=method,
+                          COLOR_CLASSIFIER=classifier)
+        result = run_benchmark(source, cfg, args.frames, args.tolerance, mode)
+        source.release()
+        print_report(label, result)
+
+
+if __name__ == "__main__":
+    main()
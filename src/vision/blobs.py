@@ -0,0 +1,165 @@
+import cv2
+import math
+import numpy as np
+from src.vision.stage_timer import NULL_STAGE_TIMER
+
+# Fill ratio of a disc inside its bounding box
+DISC_FILL = math.pi / 4
+
+
+class Candidate:
+    """
+    A blob of the target mask: centroid and bounding box in frame
+    coordinates, area in pixels, and the shape score in [0, 1].
+    """
+    __slots__ = ('cx', 'cy', 'x', 'y', 'w', 'h', 'area', 'score')
+
+    def __init__(self, cx, cy, x, y, w, h, area, score):
+        self.cx = cx
+        self.cy = cy
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.area = area
+        self.score = score
+
+    @property
+    def bbox(self):
+        return self.x, self.y, self.w, self.h
+
+
+def segment_fill(chord, depth):
+    """
+    Fill ratio of the part of a disc cut off by a straight edge, inside its
+    `chord` x `depth` bounding box: pi/4 from half the disc up, rising
+    towards 2/3 for thin slivers. Works element-wise on NumPy arrays.
+    """
+    chord = np.maximum(chord, 1)
+    depth = np.maximum(depth, 1)
+    # From half the disc up the chord is the diameter
+    radius = np.where(2 * depth >= chord, chord / 2, (chord ** 2 / 4 + depth ** 2) / (2 * depth))
+    depth = np.minimum(depth, 2 * radius)
+    below = radius - depth
+    area = (radius ** 2 * np.arccos(np.clip(below / radius, -1.0, 1.0)) -
+            below * np.sqrt(np.maximum(2 * radius * depth - depth ** 2, 0.0)))
+    return area / (chord * depth)
+
+
+def shape_score(area, width, height, clipped_x=False, clipped_y=False):
+    """
+    Scores how disc-like blobs are from their area and bounding box alone:
+    the aspect ratio of the box (1 for a disc, also under mild perspective)
+    times how close the fill ratio is to a disc's pi/4. Squares score about
+    0.73, long strips and sparse or L-shaped blobs much lower.
+
+    A blob cut by the left or right edge of the image (`clipped_x`) or by its
+    top or bottom (`clipped_y`) is scored as the visible part of a disc: its
+    unclipped side is the chord, the fill is compared with `segment_fill`,
+    and a box fuller than that scores 0 once full, as a rectangle at the edge
+    would. Cut on both axes, the aspect ratio is not scored.
+    Works element-wise on NumPy arrays.
+    """
+    width = np.maximum(width, 1)
+    height = np.maximum(height, 1)
+    fill = area / (width * height)
+    clipped_x, clipped_y = np.asarray(clipped_x), np.asarray(clipped_y)
+
+    aspect = np.minimum(width, height) / np.maximum(width, height)
+    expected = np.full(np.shape(fill), DISC_FILL)
+    # A cut disc may be shallower than its chord but never deeper
+    only_x = clipped_x & ~clipped_y
+    only_y = clipped_y & ~clipped_x
+    aspect = np.where(only_x, np.minimum(1.0, height / width), aspect)
+    aspect = np.where(only_y, np.minimum(1.0, width / height), aspect)
+    aspect = np.where(clipped_x & clipped_y, 1.0, aspect)
+    expected = np.where(only_x, segment_fill(height, width), expected)
+    expected = np.where(only_y, segment_fill(width, height), expected)
+
+    deviation = np.abs(fill - expected) / expected
+    # A rectangle cut by the edge fills its box and would pass for a deeply cut
+    # disc, so on cut blobs overfilling scores 0 by the time the box is full
+    overfill = (fill - expected) / (1.0 - expected)
+    deviation = np.where((clipped_x | clipped_y) & (fill > expected), overfill, deviation)
+    fill_score = np.clip(1.0 - deviation, 0.0, 1.0)
+    return aspect * fill_score
+
+
+def _component_blobs(mask, min_area, labels):
+    """
+    Blob statistics from a single `connectedComponentsWithStats` pass
+    (pixel areas). Returns `(stats rows [x, y, w, h, area], centroids)`.
+    """
+    if labels is None:
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8, ltype=cv2.CV_16U)
+    else:
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(mask, labels, connectivity=8, ltype=cv2.CV_16U)
+    # Label 0 is the background
+    stats = stats[1:]
+    keep = stats[:, cv2.CC_STAT_AREA] > min_area
+    return stats[keep].astype(float), centroids[1:][keep]
+
+
+def _contour_blobs(mask, min_area, timer):
+    """
+    Blob statistics from the outer contours only (polygon areas, as
+    `cv2.contourArea`). Blobs whose bounding box cannot hold `min_area`
+    pixels are skipped before their moments are computed.
+    """
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    timer.mark('findContours')
+    rows, centroids = [], []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h <= min_area:
+            continue
+        moments = cv2.moments(contour)
+        area = moments['m00']
+        if area <= min_area:
+            continue
+        rows.append((x, y, w, h, area))
+        centroids.append((moments['m10'] / area, moments['m01'] / area))
+    return np.array(rows, dtype=float).reshape(-1, 5), np.array(centroids, dtype=float).reshape(-1, 2)
+
+
+def find_candidates(mask, min_area: float, min_score: float = 0.0, offset=(0, 0),
+                    method: str = 'contours', labels=None, timer=NULL_STAGE_TIMER):
+    """
+    Returns the blobs of a binary `mask` with more than `min_area` pixels and
+    a shape score of at least `min_score`, best score first.
+
+    `method` selects how the blob statistics (area, bounding box, centroid)
+    are gathered in one pass: 'contours' traces only the blob borders, which
+    is cheapest on sparse masks; 'components' labels every pixel with
+    `cv2.connectedComponentsWithStats` (`labels` may be a preallocated uint16
+    array of the mask's shape). `offset` is the mask's origin in the frame.
+    Blobs touching the mask's border are scored as discs cut by it (see
+    `shape_score`).
+
+    Marks the 'components', or 'findContours' and 'moments', stages on
+    `timer`, then 'shape score'.
+    """
+    if method == 'components':
+        stats, centroids = _component_blobs(mask, min_area, labels)
+        timer.mark('components')
+    else:
+        stats, centroids = _contour_blobs(mask, min_area, timer)
+        timer.mark('moments')
+    if len(stats) == 0:
+        timer.mark('shape score')
+        return []
+
+    x, y, w, h = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3]
+    clipped_x = (x <= 0) | (x + w >= mask.shape[1])
+    clipped_y = (y <= 0) | (y + h >= mask.shape[0])
+    scores = shape_score(stats[:, 4], w, h, clipped_x, clipped_y)
+    ox, oy = offset
+    candidates = []
+    for i in np.argsort(-scores, kind='stable'):
+        if scores[i] < min_score:
+            break
+        x, y, w, h, area = stats[i]
+        candidates.append(Candidate(int(round(centroids[i, 0])) + ox, int(round(centroids[i, 1])) + oy,
+                                    int(x) + ox, int(y) + oy, int(w), int(h), float(area), float(scores[i])))
+    timer.mark('shape score')
+    return candidates
@@ -0,0 +1,152 @@
+import cv2
+import logging
+import numpy as np
+from src.vision.stage_timer import NULL_STAGE_TIMER
+
+MAX_HUE = 179
+
+
+def hsv_ranges(config):
+    """
+    Returns the configured target colour ranges as a list of non-wrapping
+    `(lower, upper)` HSV tuples: `LOWER_HSV_BOUND`/`UPPER_HSV_BOUND` plus any
+    `EXTRA_HSV_RANGES`. A range whose lower hue exceeds its upper hue wraps
+    through 0 and is split in two.
+    """
+    ranges = [(config.LOWER_HSV_BOUND, config.UPPER_HSV_BOUND)] + list(getattr(config, 'EXTRA_HSV_RANGES', []))
+    result = []
+    for lower, upper in ranges:
+        lower = tuple(int(v) for v in lower)
+        upper = tuple(int(v) for v in upper)
+        if lower[0] > upper[0]:
+            result.append((lower, (MAX_HUE, upper[1], upper[2])))
+            result.append(((0, lower[1], lower[2]), upper))
+        else:
+            result.append((lower, upper))
+    return result
+
+
+class HSVClassifier:
+    """
+    Classifies pixels per frame: `cvtColor` to HSV, then one `inRange` per
+    colour range, OR-ed together.
+    """
+    def __init__(self, config):
+        self.ranges = hsv_ranges(config)
+
+    def classify(self, bgr, mask, scratch, timer=NULL_STAGE_TIMER):
+        """
+        Writes the 0/255 target mask of `bgr` into `mask`. `scratch` holds
+        same-sized 'hsv' and 'range_mask' buffers. Marks the 'cvtColor' and
+        'inRange' stages on `timer`.
+        """
+        hsv = scratch['hsv']
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV, dst=hsv)
+        timer.mark('cvtColor')
+        lower, upper = self.ranges[0]
+        cv2.inRange(hsv, lower, upper, dst=mask)
+        for lower, upper in self.ranges[1:]:
+            cv2.inRange(hsv, lower, upper, dst=scratch['range_mask'])
+            cv2.bitwise_or(mask, scratch['range_mask'], dst=mask)
+        timer.mark('inRange')
+
+
+class LUTClassifier:
+    """
+    Classifies pixels with one table lookup each. The 16 MB table holds the
+    0/255 class of every 24-bit BGR colour and is built once, at startup,
+    with the same `cvtColor`/`inRange` as `HSVClassifier`, so both give
+    identical masks for any number of colour ranges.
+
+    Per frame, the pixels are copied into a BGRA buffer whose alpha stays 0,
+    so each pixel read as a little-endian uint32 is its own table index.
+    """
+    CHUNK_ROWS = 1024  # Colours are converted 1024 x 1024 at a time to bound peak memory
+
+    def __init__(self, config):
+        self.ranges = hsv_ranges(config)
+        self.table = build_table(self.ranges, self.CHUNK_ROWS)
+
+    def classify(self, bgr, mask, scratch, timer=NULL_STAGE_TIMER):
+        """
+        Writes the 0/255 target mask of `bgr` into `mask`. `scratch` holds a
+        same-sized 'bgra' buffer whose alpha channel is zero. Marks the
+        'lookup' stage on `timer`.
+        """
+        bgra = scratch['bgra']
+        cv2.mixChannels([bgr], [bgra], [0, 0, 1, 1, 2, 2])
+        indices = bgra.view(np.uint32)[..., 0]
+        np.take(self.table, indices, out=mask, mode='wrap')
+        timer.mark('lookup')
+
+
+def build_table(ranges, chunk_rows: int = 1024):
+    """
+    Returns a flat uint8 table of 2^24 entries, indexed by `b | g << 8 | r << 16`,
+    that is 255 where the colour falls in any of the HSV `ranges`.
+    """
+    table = np.empty(1 << 24, dtype=np.uint8)
+    codes = np.arange(chunk_rows * 4096, dtype=np.uint32)
+    colours = np.empty((chunk_rows, 4096, 3), dtype=np.uint8)
+    hsv = np.empty_like(colours)
+    range_mask = np.empty((chunk_rows, 4096), dtype=np.uint8)
+    for start in range(0, 1 << 24, len(codes)):
+        index = codes + start
+        colours[..., 0] = (index & 0xFF).reshape(chunk_rows, 4096)
+        colours[..., 1] = ((index >> 8) & 0xFF).reshape(chunk_rows, 4096)
+        colours[..., 2] = (index >> 16).reshape(chunk_rows, 4096)
+        cv2.cvtColor(colours, cv2.COLOR_BGR2HSV, dst=hsv)
+
+        chunk = table[start:start + len(codes)].reshape(chunk_rows, 4096)
+        lower, upper = ranges[0]
+        cv2.inRange(hsv, lower, upper, dst=chunk)
+        for lower, upper in ranges[1:]:
+            cv2.inRange(hsv, lower, upper, dst=range_mask)
+            cv2.bitwise_or(chunk, range_mask, dst=chunk)
+    return table
+
+
+def verify_table(config, chunk_rows: int = 256) -> int:
+    """
+    Classifies every 24-bit colour with both classifiers and returns the
+    number of colours on which their masks differ (0 when equivalent).
+    """
+    lut = LUTClassifier(config)
+    hsv = HSVClassifier(config)
+    codes = np.arange(chunk_rows * 4096, dtype=np.uint32)
+    colours = np.empty((chunk_rows, 4096, 3), dtype=np.uint8)
+    scratch = {
+        'hsv': np.empty_like(colours),
+        'range_mask': np.empty((chunk_rows, 4096), dtype=np.uint8),
+        'bgra': np.zeros((chunk_rows, 4096, 4), dtype=np.uint8),
+    }
+    expected = np.empty((chunk_rows, 4096), dtype=np.uint8)
+    actual = np.empty_like(expected)
+
+    mismatches = 0
+    for start in range(0, 1 << 24, len(codes)):
+        index = codes + start
+        colours[..., 0] = (index & 0xFF).reshape(chunk_rows, 4096)
+        colours[..., 1] = ((index >> 8) & 0xFF).reshape(chunk_rows, 4096)
+        colours[..., 2] = (index >> 16).reshape(chunk_rows, 4096)
+        hsv.classify(colours, expected, scratch)
+        lut.classify(colours, actual, scratch)
+        mismatches += int(np.count_nonzero(expected != actual))
+    return mismatches
+
+
+COLOR_CLASSIFIERS = {
+    'hsv': HSVClassifier,
+    'lut': LUTClassifier,
+}
+
+
+def create_color_classifier(config):
+    """
+    Builds the colour classifier selected by `config.COLOR_CLASSIFIER`.
+    """
+    name = config.COLOR_CLASSIFIER
+    if name not in COLOR_CLASSIFIERS:
+        logging.error(f"Unknown colour classifier: {name}")
+        raise ValueError(f"Unknown colour classifier: {name}")
+    return COLOR_CLASSIFIERS[name](config)
@@ -0,0 +1,161 @@
+import numpy as np
+from threading import Condition
+from src.utils import clock
+
+
+class FrameRingBuffer:
+    """
+    A small ring of preallocated frame buffers shared between the capture
+    thread and the processing thread.
+
+    The capture side keeps overwriting the oldest free slot, the processing
+    side always takes the newest committed frame. Frames that are replaced
+    before anyone read them are counted as dropped. `reader_waiting` tells the
+    capture side whether the reader is blocked waiting for a new frame.
+    """
+    def __init__(self, size: int, shape, dtype=np.uint8):
+        if size < 3:
+            raise ValueError("FrameRingBuffer needs at least 3 slots.")
+
+        self.size = size
+        self.shape = tuple(shape)
+        self._slots = [np.zeros(self.shape, dtype=dtype) for _ in range(size)]
+        self._timestamps = [0.0] * size
+        self._seqs = [0] * size
+
+        self._cond = Condition()
+        self._latest = None     # slot holding the newest committed frame
+        self._reading = None    # slot currently owned by the reader
+        self._write_index = -1
+        self._seq = 0
+        self._last_read_seq = 0
+        self._waiting = 0       # readers blocked in acquire_read
+
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+    def acquire_write(self):
+        """
+        Returns `(index, buffer)` for the next slot the writer may fill.
+        The slot is never the one being read nor the newest committed frame.
+        """
+        with self._cond:
+            for offset in range(1, self.size + 1):
+                index = (self._write_index + offset) % self.size
+                if index != self._reading and index != self._latest:
+                    self._write_index = index
+                    return index, self._slots[index]
+        raise RuntimeError("No free slot in frame ring buffer.")
+
+    def commit(self, index: int, timestamp: float = None):
+        """
+        Publishes the slot filled by the writer as the newest frame.
+        `timestamp`: monotonic capture time, defaults to now.
+        """
+        with self._cond:
+            if self._latest is not None and self._seqs[self._latest] > self._last_read_seq:
+                self.frames_dropped += 1
+
+            self._seq += 1
+            self._seqs[index] = self._seq
+            self._timestamps[index] = clock.monotonic() if timestamp is None else timestamp
+            self._latest = index
+            self.frames_written += 1
+            self._cond.notify_all()
+
+    def acquire_read(self, timeout: float = None):
+        """
+        Waits for a frame newer than the last one read and takes ownership of it.
+        Returns `(buffer, seq, timestamp)` or None if the timeout expired.
+        The caller must call `release_read()` once it is done with the buffer.
+        """
+        with self._cond:
+            if self._seq <= self._last_read_seq:
+                self._waiting += 1
+                self._cond.notify_all()
+                try:
+                    ready = self._cond.wait_for(lambda: self._seq > self._last_read_seq, timeout)
+                finally:
+                    self._waiting -= 1
+                if not ready:
+                    return None
+
+            index = self._latest
+            self._reading = index
+            self._last_read_seq = self._seqs[index]
+            return self._slots[index], self._seqs[index], self._timestamps[index]
+
+    @property
+    def reader_waiting(self) -> bool:
+        return self._waiting > 0 and self._seq <= self._last_read_seq
+
+    def wait_for_reader(self, timeout: float = None) -> bool:
+        """
+        Blocks until a reader is waiting in `acquire_read` and no unread frame
+        is there to satisfy it. Returns False if the timeout expired first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self.reader_waiting, timeout)
+
+    def release_read(self):
+        with self._cond:
+            self._reading = None
+
+    def discard(self):
+        """
+        Marks every frame committed so far as read, so the next `acquire_read`
+        waits for a frame captured from now on. Discarded frames are not
+        counted as dropped.
+        """
+        with self._cond:
+            self._last_read_seq = self._seq
+
+
+class PipelineBuffers:
+    """
+    Scratch images for the detection pipeline, allocated once per resolution
+    and reused for every frame through OpenCV `dst=` outputs.
+    """
+    NAMES = ('hsv', 'mask', 'range_mask', 'blurred', 'eroded', 'dilated')
+
+    def __init__(self):
+        self._sets = {}
+        self.allocations = 0
+
+    def get(self, height: int, width: int) -> dict:
+        """
+        Returns the buffer set for a `height` x `width` image, allocating it on first use.
+        """
+        key = (height, width)
+        buffers = self._sets.get(key)
+        if buffers is None:
+            buffers = {name: np.empty((height, width), dtype=np.uint8) for name in self.NAMES}
+            buffers['hsv'] = np.empty((height, width, 3), dtype=np.uint8)
+            buffers['frame'] = np.empty((height, width, 3), dtype=np.uint8)
+            buffers['labels'] = np.empty((height, width), dtype=np.uint16)
+            # Alpha must stay zero: LUTClassifier reads each BGRA pixel as a table index
+            buffers['bgra'] = np.zeros((height, width, 4), dtype=np.uint8)
+            self._sets[key] = buffers
+            self.allocations += 1
+        return buffers
+
+
+def peak_transient_bytes(func, repeats: int = 50) -> int:
+    """
+    Calls `func` `repeats` times (after one warm-up call) and returns the peak
+    memory allocated beyond the starting point, in bytes. A zero-allocation
+    frame pipeline stays well below the size of a single mask image.
+    """
+    import tracemalloc
+
+    func()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(repeats):
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
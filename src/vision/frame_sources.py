@@ -0,0 +1,260 @@
+import os
+import csv
+import cv2
+import numpy as np
+import logging
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class ImageDirectorySource:
+    """
+    Reads the images of a directory in file name order, with the same
+    `read()` / `isOpened()` / `release()` interface as `cv2.VideoCapture`.
+    With `labels`, `has_ground_truth` tells whether the last frame has a
+    label, and `ground_truth` holds it.
+    """
+    def __init__(self, directory: str, loop: bool = False, labels: str = None):
+        self.paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.loop = loop
+        self.index = 0
+        self.labels = load_labels(labels) if labels else None
+        self.has_ground_truth = False
+        self.ground_truth = None
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def rewind(self):
+        """
+        Restarts from the first image.
+        """
+        self.index = 0
+        self.has_ground_truth = False
+        self.ground_truth = None
+
+    def read(self, image=None):
+        if self.index >= len(self.paths):
+            if not self.loop or not self.paths:
+                return False, None
+            self.index = 0
+
+        frame = cv2.imread(self.paths[self.index])
+        if self.labels is not None:
+            self.has_ground_truth = self.index in self.labels
+            self.ground_truth = self.labels.get(self.index)
+        self.index += 1
+        if frame is None:
+            return False, None
+        return _into(frame, image)
+
+    def release(self):
+        self.paths = []
+
+
+class VideoFileSource:
+    """
+    Reads a recorded video file, optionally looping and with per-frame ground truth labels.
+    `has_ground_truth` tells whether the last frame has a label.
+    """
+    def __init__(self, path: str, loop: bool = False, labels: str = None):
+        self.path = path
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+        self.index = 0
+        self.labels = load_labels(labels) if labels else None
+        self.has_ground_truth = False
+        self.ground_truth = None
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def rewind(self):
+        """
+        Restarts from the first frame.
+        """
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self.index = 0
+        self.has_ground_truth = False
+        self.ground_truth = None
+
+    def read(self, image=None):
+        ret, frame = self.capture.read(image)
+        if not ret and self.loop and self.index > 0:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.index = 0
+            ret, frame = self.capture.read(image)
+
+        if ret and self.labels is not None:
+            self.has_ground_truth = self.index in self.labels
+            self.ground_truth = self.labels.get(self.index)
+        self.index += 1
+        return ret, frame
+
+    def release(self):
+        self.capture.release()
+
+
+class SyntheticSource:
+    """
+    Generates frames with a red disc at a known position on a noisy
+    background. The disc follows a slow Lissajous path and is left out of a
+    fraction of the frames, so both misses and false positives can be scored.
+    `distractors` adds that many static red non-disc shapes (strips, squares
+    and L-shapes, like roofs or clothing) in the same colour.
+    `ground_truth` holds the disc centre `(cx, cy)` of the last frame, or None.
+    """
+    def __init__(self, width: int = 640, height: int = 480, radius: int = 40,
+                 hsv_color=(170, 220, 220), empty_ratio: float = 0.1, seed: int = 0,
+                 distractors: int = 0):
+        self.width = width
+        self.height = height
+        self.radius = radius
+        self.empty_ratio = empty_ratio
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+        self.has_ground_truth = True
+        self.ground_truth = None
+
+        hsv = np.uint8([[hsv_color]])
+        self.color = tuple(int(c) for c in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0])
+        # Grey, low-saturation noise so only the disc falls inside the red HSV band
+        gray = self.rng.integers(40, 110, size=(height, width, 1), dtype=np.uint8)
+        self.background = np.repeat(gray, 3, axis=2)
+        for i in range(distractors):
+            self._draw_distractor(i % 3)
+        self._frame = np.empty_like(self.background)
+        self._rng_state = self.rng.bit_generator.state
+
+    def _draw_distractor(self, kind: int):
+        size = 2 * self.radius
+        x = int(self.rng.integers(0, self.width - 2 * size))
+        y = int(self.rng.integers(0, self.height - 2 * size))
+        if kind == 0:
+            # Long strip, e.g. a roof edge
+            cv2.rectangle(self.background, (x, y), (x + 2 * size, y + size // 3), self.color, -1)
+        elif kind == 1:
+            cv2.rectangle(self.background, (x, y), (x + size, y + size), self.color, -1)
+        else:
+            cv2.rectangle(self.background, (x, y), (x + size, y + size // 3), self.color, -1)
+            cv2.rectangle(self.background, (x, y), (x + size // 3, y + size), self.color, -1)
+
+    def isOpened(self):
+        return True
+
+    def rewind(self):
+        """
+        Restarts the sequence, so the same frames and ground truth follow again.
+        """
+        self.rng.bit_generator.state = self._rng_state
+        self.index = 0
+        self.ground_truth = None
+
+    def target_position(self, index: int):
+        """
+        Returns the disc centre for frame `index`.
+        """
+        margin = self.radius + 2
+        t = index / 60.0
+        cx = self.width / 2 + (self.width / 2 - margin) * np.sin(1.3 * t)
+        cy = self.height / 2 + (self.height / 2 - margin) * np.sin(0.7 * t + 0.5)
+        return int(round(cx)), int(round(cy))
+
+    def read(self, image=None):
+        np.copyto(self._frame, self.background)
+        if self.rng.random() < self.empty_ratio:
+            self.ground_truth = None
+        else:
+            self.ground_truth = self.target_position(self.index)
+            cv2.circle(self._frame, self.ground_truth, self.radius, self.color, -1)
+        self.index += 1
+        return _into(self._frame, image)
+
+    def release(self):
+        pass
+
+
+class ResizeSource:
+    """
+    Wraps another source and resizes every frame to `width` x `height`,
+    scaling its ground truth to match.
+    """
+    def __init__(self, source, width: int, height: int):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.has_ground_truth = getattr(source, 'has_ground_truth', False)
+        self.ground_truth = None
+        self._frame = np.empty((height, width, 3), dtype=np.uint8)
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def rewind(self):
+        self.source.rewind()
+        self.ground_truth = None
+
+    def read(self, image=None):
+        ret, frame = self.source.read()
+        if not ret:
+            return False, None
+
+        self.has_ground_truth = getattr(self.source, 'has_ground_truth', False)
+        truth = getattr(self.source, 'ground_truth', None)
+        if truth is not None:
+            sx = self.width / frame.shape[1]
+            sy = self.height / frame.shape[0]
+            truth = (int(round(truth[0] * sx)), int(round(truth[1] * sy)))
+        self.ground_truth = truth
+
+        cv2.resize(frame, (self.width, self.height), dst=self._frame, interpolation=cv2.INTER_AREA)
+        return _into(self._frame, image)
+
+    def release(self):
+        self.source.release()
+
+
+def load_labels(path: str) -> dict:
+    """
+    Loads ground truth from a CSV file with `frame,cx,cy` rows.
+    Frames with empty `cx`/`cy` are labelled as having no target.
+    """
+    labels = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['cx'] and row['cy']:
+                labels[int(row['frame'])] = (int(float(row['cx'])), int(float(row['cy'])))
+            else:
+                labels[int(row['frame'])] = None
+    return labels
+
+
+def open_frame_source(spec, loop: bool = False, labels: str = None):
+    """
+    Opens a frame source from a specification string: a camera index,
+    'synthetic', a directory of images or a video file.
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return cv2.VideoCapture(int(spec))
+    if spec == 'synthetic':
+        return SyntheticSource()
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, loop=loop, labels=labels)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, loop=loop, labels=labels)
+
+    logging.error(f"Unknown frame source: {spec}")
+    raise IOError(f"Unknown frame source: {spec}")
+
+
+def _into(frame, image):
+    """
+    Copies `frame` into the caller's buffer when one of the same shape is given,
+    mirroring how `cv2.VideoCapture.read(image)` reuses its output array.
+    """
+    if image is not None and image.shape == frame.shape:
+        np.copyto(image, frame)
+        return True, image
+    return True, frame.copy()
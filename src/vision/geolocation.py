@@ -0,0 +1,275 @@
+import math
+import logging
+from bisect import bisect_left
+from collections import deque
+from threading import Lock
+import numpy as np
+from dronekit import Vehicle, LocationGlobalRelative
+from src.utils import clock
+from src.utils.transformations import get_location_metres, get_offset_metres
+
+
+def rotation_matrix(roll: float, pitch: float, yaw: float):
+    """
+    Returns the body-to-NED rotation matrix for ZYX Euler angles in radians.
+    """
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return np.array([
+        [cp * cy, sr * sp * cy - cr * sy, cr * sp * cy + sr * sy],
+        [cp * sy, sr * sp * sy + cr * cy, cr * sp * sy - sr * cy],
+        [-sp, sr * cp, cr * cp],
+    ])
+
+
+def _interpolate(samples, timestamp: float, wrap: int = None):
+    """
+    Linearly interpolates `(time, value, ...)` samples at `timestamp`, holding
+    the first or last sample outside their span. Field `wrap` is an angle in
+    radians and is interpolated the short way round.
+    """
+    i = bisect_left(samples, (timestamp,))
+    if i == 0:
+        return samples[0][1:]
+    if i == len(samples):
+        return samples[-1][1:]
+    before, after = samples[i - 1], samples[i]
+    fraction = (timestamp - before[0]) / (after[0] - before[0])
+    values = []
+    for field in range(1, len(before)):
+        delta = after[field] - before[field]
+        if field == wrap:
+            delta = (delta + math.pi) % (2 * math.pi) - math.pi
+        values.append(before[field] + fraction * delta)
+    return tuple(values)
+
+
+class PoseHistory:
+    """
+    The vehicle attitude and position over the last `duration` seconds,
+    stamped with `clock.monotonic()` as each update arrives, so a frame can be
+    projected with the pose at its capture time rather than the latest one.
+    Use as a context manager to register and remove the attribute listeners.
+    """
+    def __init__(self, vehicle: Vehicle, duration: float = 2.0):
+        self.vehicle = vehicle
+        self.duration = duration
+        self._attitudes = deque()  # (time, roll, pitch, yaw)
+        self._positions = deque()  # (time, lat, lon, alt)
+        self._lock = Lock()
+
+    def __enter__(self):
+        self.vehicle.add_attribute_listener('attitude', self._on_attitude)
+        self.vehicle.add_attribute_listener('location.global_relative_frame', self._on_position)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.vehicle.remove_attribute_listener('attitude', self._on_attitude)
+        self.vehicle.remove_attribute_listener('location.global_relative_frame', self._on_position)
+
+    def _on_attitude(self, _vehicle, _name, attitude):
+        self._append(self._attitudes, (clock.monotonic(), attitude.roll, attitude.pitch, attitude.yaw))
+
+    def _on_position(self, _vehicle, _name, location):
+        if location.lat is None or location.alt is None:
+            return
+        self._append(self._positions, (clock.monotonic(), location.lat, location.lon, location.alt))
+
+    def _append(self, samples, sample):
+        with self._lock:
+            samples.append(sample)
+            while sample[0] - samples[0][0] > self.duration:
+                samples.popleft()
+
+    def at(self, timestamp: float):
+        """
+        Returns `(roll, pitch, yaw, lat, lon, alt)` interpolated at
+        `timestamp`, or None until both attitude and position have arrived.
+        """
+        with self._lock:
+            if not self._attitudes or not self._positions:
+                return None
+            attitudes, positions = list(self._attitudes), list(self._positions)
+        return _interpolate(attitudes, timestamp, wrap=3) + _interpolate(positions, timestamp)
+
+
+class TargetGeolocator:
+    """
+    Projects a target pixel onto flat ground using a pinhole camera model,
+    the camera mount, the vehicle attitude and its altitude above home.
+
+    The camera looks straight down with the top of the image towards the nose
+    and the right of the image towards the right wing; `CAMERA_MOUNT_*`
+    angles describe any deviation from that.
+
+    With `poses`, a `PoseHistory`, pixels are projected with the pose at the
+    frame's capture time; otherwise with the vehicle's current pose.
+    """
+    def __init__(self, config, frame_width: int, frame_height: int, poses: PoseHistory = None):
+        self.config = config
+        self.poses = poses
+        self.cx = frame_width / 2
+        self.cy = frame_height / 2
+        self.fx = self.cx / math.tan(math.radians(config.CAMERA_HFOV) / 2)
+        self.fy = self.cy / math.tan(math.radians(config.CAMERA_VFOV) / 2)
+        self.mount = rotation_matrix(math.radians(config.CAMERA_MOUNT_ROLL),
+                                     math.radians(config.CAMERA_MOUNT_PITCH),
+                                     math.radians(config.CAMERA_MOUNT_YAW))
+
+    def ground_offset(self, px: float, py: float, roll: float, pitch: float, yaw: float, altitude: float):
+        """
+        Returns the `(dNorth, dEast, range)` from the vehicle to the ground point
+        seen at pixel `(px, py)`, or None if the ray does not hit the ground.
+        """
+        # Ray in the body frame (forward, right, down) before mount correction
+        ray = np.array([-(py - self.cy) / self.fy, (px - self.cx) / self.fx, 1.0])
+        ray = rotation_matrix(roll, pitch, yaw) @ (self.mount @ ray)
+        if ray[2] <= 1e-6 or altitude <= 0:
+            return None
+
+        scale = altitude / ray[2]
+        return ray[0] * scale, ray[1] * scale, float(np.linalg.norm(ray) * scale)
+
+    def locate(self, vehicle: Vehicle, px: float, py: float, captured_at: float = None):
+        """
+        Returns `(location, covariance)` for the target seen at pixel `(px, py)`
+        in a frame captured at `captured_at` (`clock.monotonic()` time):
+        a LocationGlobalRelative on the ground and the 2x2 North/East
+        covariance (m^2) of the projection, excluding GPS error.
+        Returns None if the pixel cannot be projected.
+        """
+        pose = None
+        if self.poses is not None and captured_at is not None:
+            pose = self.poses.at(captured_at)
+        if pose is not None:
+            roll, pitch, yaw, lat, lon, alt = pose
+            position = LocationGlobalRelative(lat, lon, alt)
+        else:
+            attitude = vehicle.attitude
+            roll, pitch, yaw = attitude.roll, attitude.pitch, attitude.yaw
+            position = vehicle.location.global_relative_frame
+        offset = self.ground_offset(px, py, roll, pitch, yaw, position.alt)
+        if offset is None:
+            return None
+
+        d_north, d_east, slant_range = offset
+        # Angular error from pixel noise and attitude noise grows with range
+        angle_sigma = (self.config.GEOLOCATION_PIXEL_SIGMA / self.fx +
+                       math.radians(self.config.GEOLOCATION_ATTITUDE_SIGMA))
+        sigma = slant_range * angle_sigma
+        covariance = np.eye(2) * sigma ** 2
+
+        location = get_location_metres(position, d_north, d_east)
+        return LocationGlobalRelative(location.lat, location.lon, 0), covariance
+
+
+class TargetEstimate:
+    """
+    Fuses every ground sighting of the target into a running estimate.
+    Sightings are combined in a local North/East frame anchored at the first
+    one, weighted by their inverse covariance.
+
+    Sightings are held back until `seed` of them agree, each within `gate`
+    standard deviations of the newest, so one early false positive cannot
+    set the mean; those that agree seed the estimate and the others are
+    rejected. After that, sightings further than `gate` standard deviations
+    from the current estimate are rejected.
+    """
+    def __init__(self, gps_sigma: float = 1.0, gate: float = 3.0, seed: int = 3):
+        self.gps_sigma = gps_sigma
+        self.gate = gate
+        self.seed = seed
+        self.anchor = None
+        self.count = 0
+        self.rejected = 0
+        self._pending = []  # (offset, covariance) until the estimate is seeded
+        self._information = np.zeros((2, 2))
+        self._weighted_sum = np.zeros(2)
+
+    def add(self, location, covariance) -> bool:
+        """
+        Adds a sighting; returns False if it was rejected as an outlier or is
+        held back until enough sightings agree.
+        """
+        if self.anchor is None:
+            self.anchor = location
+
+        z = np.array(get_offset_metres(self.anchor, location))
+        if self.count == 0:
+            self._pending.append((z, covariance))
+            agreeing = self._agreeing(len(self._pending) - 1)
+            if len(agreeing) < self.seed:
+                return False
+            self._seed_from(agreeing)
+            return True
+
+        innovation = z - self._mean()
+        innovation_cov = covariance + np.linalg.inv(self._information)
+        if self._distance(innovation, innovation_cov) > self.gate:
+            self.rejected += 1
+            return False
+        self._fuse(z, covariance)
+        return True
+
+    def settle(self):
+        """
+        Seeds the estimate from the largest group of held-back sightings that
+        agree, when fewer than `seed` ever did (earliest group on a tie).
+        """
+        if self.count == 0 and self._pending:
+            groups = [self._agreeing(i) for i in range(len(self._pending))]
+            self._seed_from(max(groups, key=len))
+
+    def _agreeing(self, index: int):
+        """
+        Indices of the held-back sightings within the gate of sighting `index`,
+        itself included.
+        """
+        z, covariance = self._pending[index]
+        return [i for i, (other, other_cov) in enumerate(self._pending)
+                if self._distance(other - z, covariance + other_cov) <= self.gate]
+
+    def _seed_from(self, indices):
+        for i in indices:
+            self._fuse(*self._pending[i])
+        self.rejected += len(self._pending) - len(indices)
+        self._pending = []
+
+    def _fuse(self, z, covariance):
+        information = np.linalg.inv(covariance)
+        self._information += information
+        self._weighted_sum += information @ z
+        self.count += 1
+
+    @staticmethod
+    def _distance(innovation, covariance) -> float:
+        return math.sqrt(innovation @ np.linalg.solve(covariance, innovation))
+
+    def _mean(self):
+        return np.linalg.solve(self._information, self._weighted_sum)
+
+    @property
+    def covariance(self):
+        """
+        North/East covariance of the fused estimate in m^2, including the
+        GPS error that is common to all sightings and does not average out.
+        """
+        if self.count == 0:
+            return None
+        return np.linalg.inv(self._information) + np.eye(2) * self.gps_sigma ** 2
+
+    def location(self, altitude: float):
+        """
+        Returns the fused target position as a LocationGlobalRelative at `altitude`.
+        """
+        if self.count == 0:
+            return None
+        d_north, d_east = self._mean()
+        location = get_location_metres(self.anchor, d_north, d_east)
+        return LocationGlobalRelative(location.lat, location.lon, altitude)
+
+    def log_summary(self):
+        sigma = math.sqrt(np.trace(self.covariance) / 2)
+        logging.info(f"Target estimate fused from {self.count} sightings "
+                     f"({self.rejected} rejected), 1-sigma {sigma:.2f}m.")
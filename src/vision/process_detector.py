@@ -0,0 +1,377 @@
+import os
+import cv2
+import uuid
+import logging
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from threading import Thread, Event, Lock
+from types import SimpleNamespace
+
+from src.vision.target_detector import TargetDetector, MODE_STAT_NAMES, summarize_mode_stats
+from src.vision.frame_sources import open_frame_source
+from src.utils import clock, flight_recorder
+
+# Layout of the shared float64 state block. The worker writes the detection
+# and stats slots under the detection lock and the shared frame under the frame
+# lock; the parent reads them under the same locks. Slots 0 and 19 are unused.
+FOUND, CX, CY, QUADRANT = 1, 2, 3, 4
+CAPTURED, DROPPED, PROCESSED, LATENCY, AVG_LATENCY, TRACKING, BUFFER_ALLOCATIONS = 5, 6, 7, 8, 9, 10, 11
+SCORE = 12
+MODE, MODE_SINCE, FPS = 13, 14, 15
+DISPLAY_FEED = 16
+FRAME_HEIGHT, FRAME_WIDTH = 17, 18
+WORKER_ERROR = 20
+DETECTION_SEQ, DETECTION_TIMESTAMP = 21, 22
+# Per-mode counters, a MAX_MODES x len(MODE_STAT_NAMES) table
+MODE_STATS, MAX_MODES = 32, 8
+# The last DETECTION_LOG_SIZE detections, one row per seq, which the parent
+# drains into its flight recorder
+DETECTION_LOG = MODE_STATS + MAX_MODES * len(MODE_STAT_NAMES)
+DETECTION_LOG_SIZE = 64
+LOG_FOUND, LOG_CX, LOG_CY, LOG_TIMESTAMP, LOG_SCORE, LOG_PUBLISHED = range(6)
+DETECTION_LOG_FIELDS = 6
+STATE_SIZE = DETECTION_LOG + DETECTION_LOG_SIZE * DETECTION_LOG_FIELDS
+
+# How often a reader waiting for a lock checks that the worker is still alive (s)
+LOCK_POLL_INTERVAL = 0.1
+
+STAT_NAMES = ('captured', 'dropped', 'processed', 'latency', 'avg_latency', 'tracking', 'buffer_allocations')
+
+
+class ProcessTargetDetector:
+    """
+    Runs camera capture and `_process_frame` in a separate worker process so
+    vision gets its own core and its own interpreter lock.
+    Detection results and the latest processed frame are exchanged through
+    `multiprocessing.shared_memory` blocks guarded by shared locks, so nothing is
+    pickled per frame. Exposes the same `latest_detection`, `center_x`,
+    `center_y`, `display_feed`, `set_mode()`, `mode_stats` and `start()`
+    interface as `TargetDetector`. The parent's views of the shared blocks
+    are only touched under `_view_lock`, which shutdown takes to swap them
+    for copies before releasing the blocks.
+    `source`: optional frame source specification (camera index, video file,
+    image directory or 'synthetic'); defaults to the configured camera.
+    """
+    def __init__(self, config, stop_event: Event, source=None, startup_timeout: float = 30.0):
+        self.config = config
+        self.stop_event = stop_event
+        self.modes = tuple(config.DETECTOR_MODES)
+        if len(self.modes) > MAX_MODES:
+            raise ValueError(f"At most {MAX_MODES} detector modes are supported.")
+
+        ctx = mp.get_context('spawn')
+        self._state_shm = shared_memory.SharedMemory(create=True, size=STATE_SIZE * 8)
+        self._state = np.ndarray((STATE_SIZE,), dtype=np.float64, buffer=self._state_shm.buf)
+        self._state[:] = 0
+        self._state[MODE] = self.modes.index(config.DETECTOR_INITIAL_MODE)
+        self._frame_shm = None
+        self._frame = None
+        self._view_lock = Lock()
+
+        self._worker_stop = ctx.Event()
+        self._ready = ctx.Event()
+        self._attached = ctx.Event()
+        self._go = ctx.Event()
+        self._mode_changed = ctx.Event()
+        self._detection_ready = ctx.Condition()
+        self._frame_lock = ctx.Lock()
+
+        config_values = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+        source_spec = source if source is not None else config.CAMERA_INDEX
+        frame_name = f"td_frame_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(config_values, source_spec, self._state_shm.name, frame_name,
+                  self._worker_stop, self._ready, self._attached, self._go, self._detection_ready,
+                  self._mode_changed, self._frame_lock, clock.get_clock()),
+            daemon=True)
+        self.process.start()
+
+        if not self._ready.wait(startup_timeout) or self._state[WORKER_ERROR]:
+            self._shutdown()
+            logging.error("Could not open camera in detection worker.")
+            raise IOError("Could not open camera.")
+
+        self.frame_height = int(self._state[FRAME_HEIGHT])
+        self.frame_width = int(self._state[FRAME_WIDTH])
+        self.center_x = self.frame_width // 2
+        self.center_y = self.frame_height // 2
+
+        self._frame_shm = shared_memory.SharedMemory(name=frame_name, create=True,
+                                                     size=self.frame_height * self.frame_width * 3)
+        self._frame = np.ndarray((self.frame_height, self.frame_width, 3), dtype=np.uint8,
+                                 buffer=self._frame_shm.buf)
+        self._attached.set()
+
+        self.thread = Thread(target=self._watch_stop, daemon=True)
+        self.recorder_thread = Thread(target=self._record_detections, daemon=True)
+        logging.info(f"ProcessTargetDetector initialized (worker pid {self.process.pid}).")
+
+    @property
+    def latest_detection(self):
+        values = self._read(0, DETECTION_TIMESTAMP + 1)
+        return {'found': bool(values[FOUND]), 'cx': int(values[CX]), 'cy': int(values[CY]),
+                'quadrant': int(values[QUADRANT]), 'score': float(values[SCORE]),
+                'seq': int(values[DETECTION_SEQ]), 'timestamp': float(values[DETECTION_TIMESTAMP])}
+
+    def wait_for_detection(self, after_seq: int, timeout: float = None):
+        """
+        Blocks until the worker has published a detection newer than `after_seq`
+        and returns it. Returns None if the timeout expires first.
+        """
+        if not self._acquire(self._detection_ready):
+            return None
+        try:
+            if not self._detection_ready.wait_for(lambda: self._value(DETECTION_SEQ) > after_seq,
+                                                 clock.to_real(timeout)):
+                return None
+        finally:
+            self._detection_ready.release()
+        return self.latest_detection
+
+    @property
+    def stats(self):
+        values = self._read(CAPTURED, FPS + 1)
+        stats = dict(zip(STAT_NAMES, values.tolist()))
+        stats['tracking'] = bool(stats['tracking'])
+        stats['fps'] = float(values[FPS - CAPTURED])
+        return stats
+
+    @property
+    def display_feed(self):
+        return bool(self._value(DISPLAY_FEED))
+
+    @display_feed.setter
+    def display_feed(self, value):
+        with self._view_lock:
+            self._state[DISPLAY_FEED] = 1.0 if value else 0.0
+
+    @property
+    def mode(self) -> str:
+        return self.modes[int(self._value(MODE))]
+
+    def set_mode(self, name: str):
+        """
+        Switches the worker's operating mode; it is applied before the next frame.
+        """
+        if name not in self.modes:
+            raise ValueError(f"Unknown detector mode: {name}")
+        if name != self.mode:
+            with self._view_lock:
+                self._state[MODE] = self.modes.index(name)
+            self._mode_changed.set()
+            logging.info(f"Detector mode: {name}.")
+
+    @property
+    def mode_stats(self) -> dict:
+        with self._view_lock:
+            table = self._state[MODE_STATS:MODE_STATS + len(self.modes) * len(MODE_STAT_NAMES)].copy()
+            since = self._state[MODE_SINCE]
+        return summarize_mode_stats(self.modes, table.reshape(len(self.modes), -1), self.mode, since)
+
+    def latest_frame(self):
+        """
+        Returns a copy of the most recently processed frame.
+        """
+        return self._read(0, None, lock=self._frame_lock, data='frame')
+
+    def start(self):
+        self._go.set()
+        self.thread.start()
+        self.recorder_thread.start()
+        logging.info("Target detection worker started.")
+
+    def _read(self, start, stop, lock=None, data: str = None):
+        """
+        Copies `data[start:stop]` (`'state'` or `'frame'`; the state block by
+        default) under `lock` (the detection lock by default), which the worker
+        holds while writing it.
+        """
+        lock = self._detection_ready if lock is None else lock
+        locked = self._acquire(lock)
+        try:
+            with self._view_lock:
+                source = self._frame if data == 'frame' else self._state
+                return source[start:stop].copy()
+        finally:
+            if locked:
+                lock.release()
+
+    def _value(self, index: int) -> float:
+        with self._view_lock:
+            return float(self._state[index])
+
+    def _acquire(self, lock) -> bool:
+        """
+        Acquires a lock shared with the worker. Returns False instead once the
+        worker has died, which may have left the lock held for good; nothing
+        writes the shared blocks after that.
+        """
+        while not lock.acquire(timeout=LOCK_POLL_INTERVAL):
+            if not self.process.is_alive():
+                logging.warning("Detection worker died holding a shared lock.")
+                return False
+        return True
+
+    def _record_detections(self):
+        """
+        Writes every detection the worker publishes to the flight recorder
+        once, stamped with its publication time, as the thread backend does.
+        """
+        last_seq = 0
+        while not self.stop_event.is_set():
+            if not self._acquire(self._detection_ready):
+                return
+            try:
+                self._detection_ready.wait_for(lambda: self._value(DETECTION_SEQ) > last_seq, 0.5)
+                with self._view_lock:
+                    seq = int(self._state[DETECTION_SEQ])
+                    log = self._state[DETECTION_LOG:].reshape(DETECTION_LOG_SIZE, -1).copy()
+            finally:
+                self._detection_ready.release()
+
+            if seq - last_seq > DETECTION_LOG_SIZE:
+                logging.warning(f"Flight recorder missed {seq - last_seq - DETECTION_LOG_SIZE} detections.")
+            for detection_seq in range(max(last_seq + 1, seq - DETECTION_LOG_SIZE + 1), seq + 1):
+                row = log[detection_seq % DETECTION_LOG_SIZE]
+                flight_recorder.record(flight_recorder.DETECTION,
+                                       (row[LOG_FOUND], row[LOG_CX], row[LOG_CY], row[LOG_TIMESTAMP],
+                                        row[LOG_SCORE]), seq=detection_seq, timestamp=row[LOG_PUBLISHED])
+            last_seq = seq
+
+    def _watch_stop(self):
+        self.stop_event.wait()
+        self._shutdown()
+        logging.info("Target detection worker stopped and shared memory released.")
+
+    def _shutdown(self):
+        self._worker_stop.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+
+        # Keep the last state readable after the shared blocks are released
+        with self._view_lock:
+            self._state = self._state.copy()
+            if self._frame is not None:
+                self._frame = self._frame.copy()
+
+        for shm in (self._frame_shm, self._state_shm):
+            if shm is None:
+                continue
+            try:
+                shm.close()
+            except BufferError as e:
+                logging.warning(f"Shared memory block {shm.name} still in use: {e}")
+            finally:
+                shm.unlink()
+        self._frame_shm = None
+        self._state_shm = None
+
+
+class _SharedMemoryDetector(TargetDetector):
+    """
+    Worker-side detector that publishes results and frames into shared memory
+    instead of its own locked dict.
+    """
+    def __init__(self, config, stop_event, source, state, detection_ready, mode_changed, frame_lock):
+        self._state = state
+        self._shared_frame = None
+        self._frame_lock = frame_lock
+        super().__init__(config, stop_event, source=source)
+        self._detection_ready = detection_ready
+        # Set by the parent's set_mode(), so a paused worker wakes up at once
+        self._mode_changed = mode_changed
+        # Count mode statistics straight into the shared block
+        size = len(self.modes) * len(MODE_STAT_NAMES)
+        self._mode_stats = state[MODE_STATS:MODE_STATS + size].reshape(len(self.modes), -1)
+
+    @property
+    def display_feed(self):
+        return bool(self._state[DISPLAY_FEED])
+
+    @display_feed.setter
+    def display_feed(self, value):
+        self._state[DISPLAY_FEED] = 1.0 if value else 0.0
+
+    def _poll_mode(self):
+        name = list(self.modes)[int(self._state[MODE])]
+        if name != self.mode:
+            self.set_mode(name)
+
+    def _apply_pending_mode(self):
+        super()._apply_pending_mode()
+        self._state[MODE_SINCE] = self._mode_since
+
+    def _process_frame(self, frame, captured_at: float = None):
+        frame = super()._process_frame(frame, captured_at)
+        if self._shared_frame is not None:
+            with self._frame_lock:
+                if frame.shape == self._shared_frame.shape:
+                    np.copyto(self._shared_frame, frame)
+                else:
+                    cv2.resize(frame, (self.frame_width, self.frame_height), dst=self._shared_frame)
+        return frame
+
+    def _publish_detection(self, detection_result):
+        state = self._state
+        stats = self.stats
+        published = clock.monotonic()
+        with self._detection_ready:
+            state[FOUND] = detection_result['found']
+            state[CX] = detection_result['cx']
+            state[CY] = detection_result['cy']
+            state[QUADRANT] = detection_result['quadrant']
+            state[SCORE] = detection_result['score']
+            state[DETECTION_TIMESTAMP] = detection_result['timestamp']
+            for index, name in enumerate(STAT_NAMES, start=CAPTURED):
+                state[index] = stats[name]
+            state[FPS] = stats['fps']
+            state[DETECTION_SEQ] += 1
+            row = DETECTION_LOG + int(state[DETECTION_SEQ]) % DETECTION_LOG_SIZE * DETECTION_LOG_FIELDS
+            state[row:row + DETECTION_LOG_FIELDS] = (
+                detection_result['found'], detection_result['cx'], detection_result['cy'],
+                detection_result['timestamp'], detection_result['score'], published)
+            self._detection_ready.notify_all()
+
+
+def _worker_main(config_values, source_spec, state_name, frame_name, stop_event, ready, attached, go,
+                 detection_ready, mode_changed, frame_lock, parent_clock):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [vision] %(message)s')
+    # Capture and detection timestamps must be on the parent's clock; a pickled
+    # ScaledClock keeps its epoch, and the monotonic clock is system-wide.
+    clock.set_clock(parent_clock)
+    config = SimpleNamespace(**config_values)
+
+    # Spawned workers share the parent's resource tracker, so attaching here
+    # does not hand ownership of the blocks to this process.
+    state_shm = shared_memory.SharedMemory(name=state_name)
+    state = np.ndarray((STATE_SIZE,), dtype=np.float64, buffer=state_shm.buf)
+
+    try:
+        detector = _SharedMemoryDetector(config, stop_event, open_frame_source(source_spec), state,
+                                         detection_ready, mode_changed, frame_lock)
+    except Exception as e:
+        logging.error(f"Detection worker failed to start: {e}")
+        state[WORKER_ERROR] = 1
+        ready.set()
+        return
+
+    state[FRAME_HEIGHT] = detector.frame_height
+    state[FRAME_WIDTH] = detector.frame_width
+    ready.set()
+
+    while not (attached.wait(0.5) and go.wait(0.5)):
+        if stop_event.is_set():
+            detector.camera.release()
+            return
+
+    frame_shm = shared_memory.SharedMemory(name=frame_name)
+    detector._shared_frame = np.ndarray((detector.frame_height, detector.frame_width, 3),
+                                        dtype=np.uint8, buffer=frame_shm.buf)
+
+    # The shared blocks stay mapped until the worker exits; the parent unlinks them.
+    detector.capture_thread.start()
+    detector.run()
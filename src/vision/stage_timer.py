@@ -0,0 +1,71 @@
+import time
+import numpy as np
+from collections import defaultdict
+from src.utils import metrics
+
+
+class StageTimer:
+    """
+    Records the time spent in each named stage of the detection pipeline.
+    `start()` opens a frame, every `mark(stage)` closes the stage that just ran.
+    """
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.samples[stage].append(now - self._last)
+        self._last = now
+
+    def summary(self) -> dict:
+        """
+        Returns `{stage: {'mean': s, 'p50': s, 'p99': s}}` in seconds.
+        """
+        result = {}
+        for stage, values in self.samples.items():
+            values = np.asarray(values)
+            result[stage] = {
+                'mean': float(values.mean()),
+                'p50': float(np.percentile(values, 50)),
+                'p99': float(np.percentile(values, 99)),
+            }
+        return result
+
+
+class NullStageTimer:
+    """
+    Stand-in used when stage timing is off; every call is a no-op.
+    """
+    def start(self):
+        pass
+
+    def mark(self, stage: str):
+        pass
+
+
+NULL_STAGE_TIMER = NullStageTimer()
+
+
+class MetricsStageTimer:
+    """
+    Feeds the time of each stage into the `detector_stage_seconds` histogram
+    of the process-wide metrics, labelled by stage.
+    """
+    def __init__(self):
+        self._histograms = {}
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = metrics.histogram('detector_stage_seconds', stage=stage)
+        histogram.observe(now - self._last)
+        self._last = now
@@ -1,18 +1,100 @@
 import cv2
-import imutils
 import numpy as np
 import logging
 import time
-from threading import Thread, Event, Lock
+from threading import Thread, Event, Lock, Condition
+from types import SimpleNamespace
+from src.vision.frame_buffer import FrameRingBuffer, PipelineBuffers
+from src.vision.stage_timer import NullStageTimer, MetricsStageTimer
+from src.vision.blobs import find_candidates
+from src.vision.color_lut import create_color_classifier
+from src.utils import clock, flight_recorder, metrics
+
+# Per-mode counters, one row per mode in config.DETECTOR_MODES order. Time in
+# mode and CPU are real seconds, so CPU shares stay meaningful on a scaled
+# clock; latencies are on the process clock, like `stats`.
+MODE_STAT_NAMES = ('seconds', 'frames', 'cpu', 'capture_cpu', 'latency_sum', 'latency_max')
+
+
+def resolve_modes(config, frame_width: int, frame_height: int) -> dict:
+    """
+    Resolves `config.DETECTOR_MODES` for a camera of `frame_width` x `frame_height`:
+    processing size, rate and the pipeline settings (the configuration with the
+    mode's overrides, and pixel sizes scaled to the processing resolution).
+    """
+    defaults = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    modes = {}
+    for index, (name, spec) in enumerate(config.DETECTOR_MODES.items()):
+        spec = dict(spec)
+        scale = spec.pop('scale', 1.0)
+        rate_hz = spec.pop('rate_hz', None)
+        values = dict(defaults, **spec)
+        values['MIN_CONTOUR_AREA'] = values['MIN_CONTOUR_AREA'] * scale ** 2
+        values['ROI_MIN_SIZE'] = int(round(values['ROI_MIN_SIZE'] * scale))
+        values['ROI_EDGE_MARGIN'] = int(round(values['ROI_EDGE_MARGIN'] * scale))
+        modes[name] = SimpleNamespace(name=name, index=index, scale=scale, rate_hz=rate_hz,
+                                      width=max(1, int(round(frame_width * scale))),
+                                      height=max(1, int(round(frame_height * scale))),
+                                      settings=SimpleNamespace(**values))
+    return modes
+
+
+def summarize_mode_stats(modes, table, current: str = None, since: float = None) -> dict:
+    """
+    Turns the per-mode counter `table` into `{mode: {'seconds', 'frames', 'fps',
+    'cpu_percent', 'capture_cpu_percent', 'avg_latency', 'max_latency'}}`.
+    Mode times are on `src.utils.clock`, and CPU percentages are of one core
+    over the real time that corresponds to; the mode `current` has been
+    active since `clock.monotonic()` time `since`.
+    """
+    summary = {}
+    for name, row in zip(modes, np.asarray(table)):
+        stats = dict(zip(MODE_STAT_NAMES, row.tolist()))
+        seconds = stats['seconds']
+        if name == current and since is not None:
+            seconds += clock.monotonic() - since
+        frames = int(stats['frames'])
+        real_seconds = clock.to_real(seconds)
+        summary[name] = {
+            'seconds': seconds,
+            'frames': frames,
+            'fps': frames / seconds if seconds > 0 else 0.0,
+            'cpu_percent': 100.0 * stats['cpu'] / real_seconds if seconds > 0 else 0.0,
+            'capture_cpu_percent': 100.0 * stats['capture_cpu'] / real_seconds if seconds > 0 else 0.0,
+            'avg_latency': stats['latency_sum'] / frames if frames else 0.0,
+            'max_latency': stats['latency_max'],
+        }
+    return summary
+
+
+def log_mode_stats(summary: dict):
+    for name, stats in summary.items():
+        if stats['seconds'] <= 0:
+            continue
+        logging.info(f"Detector mode {name}: {stats['seconds']:.1f}s, {stats['frames']} frames "
+                     f"({stats['fps']:.1f} FPS), CPU {stats['cpu_percent']:.0f}% processing + "
+                     f"{stats['capture_cpu_percent']:.0f}% capture, latency avg "
+                     f"{stats['avg_latency'] * 1000:.1f}ms max {stats['max_latency'] * 1000:.1f}ms")
+
 
 class TargetDetector:
     """
     A class to handle real-time target detection using a camera.
-    It runs in a separate thread and makes the latest detection result
-    available through a thread-safe property.
+    A capture thread decodes a camera frame into a small ring buffer whenever
+    the processing thread asks for one, and otherwise only grabs, so the
+    camera is drained without competing with processing. The latest detection result is available through a
+    thread-safe property.
+    `source`: optional frame source with a `cv2.VideoCapture`-like interface
+    (see `src.vision.frame_sources`); defaults to the configured camera.
+
+    The detector runs in one of the operating modes of `DETECTOR_MODES`,
+    selected with `set_mode()`. A mode sets the processing resolution (frames
+    are downscaled in the pipeline, so the camera is never reopened), the
+    processing rate, and pipeline settings. Detections are always reported in
+    camera pixels.
     """
-    def __init__(self, config, stop_event: Event):
-        self.camera = cv2.VideoCapture(config.CAMERA_INDEX)
+    def __init__(self, config, stop_event: Event, source=None):
+        self.camera = source if source is not None else cv2.VideoCapture(config.CAMERA_INDEX)
         if not self.camera.isOpened():
             logging.error("Could not open camera.")
             raise IOError("Could not open camera.")
@@ -22,16 +104,46 @@ class TargetDetector:
         self.display_feed = False
         
         self._lock = Lock()
-        self._latest_detection = {'found': False, 'cx': 0, 'cy': 0, 'quadrant': 0}
+        self._detection_ready = Condition(self._lock)
+        self._detection_seq = 0
+        self._latest_detection = {'found': False, 'cx': 0, 'cy': 0, 'quadrant': 0, 'score': 0.0, 'seq': 0, 'timestamp': 0.0}
 
         self.frame_height, self.frame_width = self.get_frame_dimensions()
         self.center_x = self.frame_width // 2
         self.center_y = self.frame_height // 2
+
+        # ROI tracking state: (x0, y0, x1, y1) window around the last centroid
+        self._roi = None
+        self._roi_size = config.ROI_MIN_SIZE
+        self._roi_misses = 0
+
+        # Headless pipeline: reused scratch images, cached kernel and bounds
+        self._buffers = PipelineBuffers()
+        self.modes = resolve_modes(config, self.frame_width, self.frame_height)
+        for mode in self.modes.values():
+            self._buffers.get(mode.height, mode.width)
+        self._mode_stats = np.zeros((len(self.modes), len(MODE_STAT_NAMES)))
+        self._mode_changed = Event()
+        self._mode = None
+        self._pending_mode = None
+        self._mode_since = clock.monotonic()
+        self.set_mode(config.DETECTOR_INITIAL_MODE)
+        self._apply_pending_mode()
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._classifier = create_color_classifier(config)
+        self.stage_timer = MetricsStageTimer() if metrics.enabled() else NullStageTimer()
+        self._latency_metric = metrics.histogram('detector_latency_seconds')
+
+        self._frames = FrameRingBuffer(config.FRAME_BUFFER_SIZE, (self.frame_height, self.frame_width, 3))
+        self.frames_processed = 0
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
         
-        self.fps_start_time = time.time()
+        self.fps_start_time = clock.monotonic()
         self.fps_frame_count = 0
         self.fps = 0
 
+        self.capture_thread = Thread(target=self._capture_loop, daemon=True)
         self.thread = Thread(target=self.run, daemon=True)
         logging.info("TargetDetector initialized.")
 
@@ -40,6 +152,86 @@ class TargetDetector:
         with self._lock:
             return self._latest_detection.copy()
 
+    def wait_for_detection(self, after_seq: int, timeout: float = None):
+        """
+        Blocks until a detection newer than `after_seq` has been published and returns it.
+        Returns None if the timeout expires first.
+        """
+        with self._detection_ready:
+            if not self._detection_ready.wait_for(lambda: self._detection_seq > after_seq, clock.to_real(timeout)):
+                return None
+            return self._latest_detection.copy()
+
+    @property
+    def mode(self) -> str:
+        pending = self._pending_mode
+        return (pending or self._mode).name
+
+    def set_mode(self, name: str):
+        """
+        Switches the operating mode. The processing thread picks the new mode
+        up before its next frame; scratch buffers for every mode are allocated
+        up front, so a switch costs no allocation and no camera access.
+        """
+        if name not in self.modes:
+            raise ValueError(f"Unknown detector mode: {name}")
+        mode = self.modes[name]
+        if mode is (self._pending_mode or self._mode):
+            return
+        self._pending_mode = mode
+        self._mode_changed.set()
+        if mode.rate_hz == 0:
+            rate = "paused"
+        else:
+            rate = f"{mode.rate_hz} Hz" if mode.rate_hz else "every frame"
+        logging.info(f"Detector mode: {name} ({mode.width}x{mode.height}, {rate}).")
+
+    def _apply_pending_mode(self):
+        """
+        Makes the pending mode current. Called from the processing thread, so
+        the tracking window is never reset in the middle of a frame.
+        """
+        mode = self._pending_mode
+        if mode is None:
+            return
+        self._pending_mode = None
+        now = clock.monotonic()
+        if self._mode is not None:
+            self._mode_stats[self._mode.index, 0] += now - self._mode_since
+            # The newest frame in the ring may be from before the pause; never
+            # process it as current.
+            if self._mode.rate_hz == 0:
+                self._frames.discard()
+        self._mode_since = now
+        self._mode = mode
+        self._roi = None
+        self._roi_size = mode.settings.ROI_MIN_SIZE
+        self._roi_misses = 0
+
+    @property
+    def mode_stats(self) -> dict:
+        """
+        Time, frames, CPU use and latency per operating mode (see `summarize_mode_stats`).
+        """
+        return summarize_mode_stats(self.modes, self._mode_stats, self._mode.name, self._mode_since)
+
+    @property
+    def stats(self):
+        """
+        Frame pipeline counters: captured, dropped and processed frames and the
+        capture-to-result latency in seconds (last and moving average).
+        """
+        return {
+            'captured': self._frames.frames_written,
+            'dropped': self._frames.frames_dropped,
+            'processed': self.frames_processed,
+            'latency': self.last_latency,
+            'avg_latency': self.avg_latency,
+            'fps': self.fps,
+            'tracking': self._roi is not None,
+            'buffer_allocations': self._buffers.allocations,
+        }
+
     def get_frame_dimensions(self):
         ret, frame = self.camera.read()
         if not ret:
@@ -48,68 +240,300 @@ class TargetDetector:
         return frame.shape[:2]
 
     def start(self):
+        self.capture_thread.start()
         self.thread.start()
-        logging.info("Target detection thread started.")
+        logging.info("Target detection threads started.")
 
-    def run(self):
-        logging.info("Detection loop running...")
+    def _capture_loop(self):
+        """
+        Feeds the ring buffer with frames the processing thread asks for.
+        Frames are only decoded while the processing thread is waiting for one,
+        so capture never runs faster than the mode's `rate_hz` or the pipeline
+        itself. Cameras that can `grab` keep draining the driver queue in
+        between, so the decoded frame is always the newest one; other sources
+        block until the next frame is wanted.
+        """
+        grab = getattr(self.camera, 'grab', None)
+        retrieve = getattr(self.camera, 'retrieve', None)
+        grabs = grab is not None and retrieve is not None
         while not self.stop_event.is_set():
-            ret, frame = self.camera.read()
+            if not grabs and not self._frames.wait_for_reader(timeout=0.5):
+                continue
+
+            cpu_start = time.thread_time()
+            mode = self._mode
+            if grabs:
+                ret = grab()
+                timestamp = clock.monotonic()
+                if ret and self._frames.reader_waiting:
+                    index, buffer = self._frames.acquire_write()
+                    ret, frame = retrieve(buffer)
+                elif ret:
+                    self._mode_stats[mode.index, 3] += time.thread_time() - cpu_start
+                    continue
+            else:
+                index, buffer = self._frames.acquire_write()
+                ret, frame = self.camera.read(buffer)
+                timestamp = clock.monotonic()
+            self._mode_stats[mode.index, 3] += time.thread_time() - cpu_start
             if not ret:
                 logging.warning("Failed to grab frame.")
                 continue
 
+            if frame is not buffer:
+                if frame.shape != buffer.shape:
+                    logging.warning(f"Unexpected frame size {frame.shape}, dropping frame.")
+                    continue
+                np.copyto(buffer, frame)
+
+            self._frames.commit(index, timestamp)
+
+    def run(self):
+        logging.info("Detection loop running...")
+        next_due = 0.0
+        while not self.stop_event.is_set():
+            self._poll_mode()
+            self._apply_pending_mode()
+            mode = self._mode
+            if mode.rate_hz is not None:
+                delay = 0.5 if mode.rate_hz == 0 else next_due - clock.monotonic()
+                if delay > 0:
+                    self._mode_changed.wait(clock.to_real(min(delay, 0.5)))
+                    self._mode_changed.clear()
+                    continue
+                next_due = clock.monotonic() + 1.0 / mode.rate_hz
+
+            latest = self._frames.acquire_read(timeout=0.5)
+            if latest is None:
+                continue
+            frame, _, captured_at = latest
+            cpu_start = time.thread_time()
+
             self.fps_frame_count += 1
-            elapsed_time = time.time() - self.fps_start_time
+            elapsed_time = clock.monotonic() - self.fps_start_time
             if elapsed_time > 1.0:
                 self.fps = self.fps_frame_count / elapsed_time
                 self.fps_frame_count = 0
-                self.fps_start_time = time.time()
+                self.fps_start_time = clock.monotonic()
+
+            processed_frame = self._process_frame(frame, captured_at)
 
-            processed_frame = self._process_frame(frame)
+            self.last_latency = clock.monotonic() - captured_at
+            self.avg_latency += 0.1 * (self.last_latency - self.avg_latency)
+            self.frames_processed += 1
+            self._latency_metric.observe(self.last_latency)
+            row = self._mode_stats[mode.index]
+            row[1] += 1
+            row[2] += time.thread_time() - cpu_start
+            row[4] += self.last_latency
+            row[5] = max(row[5], self.last_latency)
 
-            if self.display_feed:
+            if self._viewer_attached():
                 cv2.imshow("Processed Feed", processed_frame)
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     self.stop_event.set()
 
+            self._frames.release_read()
+
+        self.capture_thread.join(timeout=1.0)
         self.camera.release()
         cv2.destroyAllWindows()
         logging.info("Target detection thread stopped and resources released.")
 
-    def _process_frame(self, frame):
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        mask = cv2.inRange(hsv, self.config.LOWER_HSV_BOUND, self.config.UPPER_HSV_BOUND)
+    def _poll_mode(self):
+        """
+        Hook for subclasses whose mode is switched from outside the process.
+        """
+
+    def _viewer_attached(self):
+        return self.display_feed and self.config.DISPLAY_FEED_ENABLED
+
+    def _search_window(self):
+        """
+        Returns the (x0, y0, x1, y1) region to search: the tracking window while
+        the target is being tracked, otherwise the full frame.
+        """
+        if self._roi is None:
+            return 0, 0, self._mode.width, self._mode.height
+        return self._roi
+
+    def _update_tracking_window(self, bbox, cx, cy):
+        """
+        Recenters the tracking window on the new centroid. The window grows
+        when the target's bounding box `(x, y, w, h)` gets close to its edge
+        and never drops below ROI_MIN_SIZE.
+        """
+        self._roi_misses = 0
+        mode = self._mode
+        settings = mode.settings
+        if not settings.ROI_TRACKING:
+            return
+
+        x, y, w, h = bbox
+        size = max(settings.ROI_MIN_SIZE, int(settings.ROI_SCALE * max(w, h)))
+
+        if self._roi is not None:
+            x0, y0, x1, y1 = self._roi
+            margin = settings.ROI_EDGE_MARGIN
+            # Window sides clipped by the frame border cannot lose the target
+            near_edge = ((x0 > 0 and x - x0 < margin) or
+                         (y0 > 0 and y - y0 < margin) or
+                         (x1 < mode.width and x1 - (x + w) < margin) or
+                         (y1 < mode.height and y1 - (y + h) < margin))
+            if near_edge:
+                size = max(size, int(self._roi_size * settings.ROI_GROWTH))
+
+        size = min(size, max(mode.width, mode.height))
+        self._roi_size = size
+
+        half = size // 2
+        x0 = max(0, cx - half)
+        y0 = max(0, cy - half)
+        x1 = min(mode.width, cx + half)
+        y1 = min(mode.height, cy + half)
+        if x1 - x0 >= mode.width and y1 - y0 >= mode.height:
+            self._roi = None
+        else:
+            self._roi = (x0, y0, x1, y1)
+
+    def _register_miss(self):
+        """
+        Grows the tracking window after a miss and falls back to a full-frame
+        search after ROI_MAX_MISSES consecutive misses.
+        """
+        if self._roi is None:
+            return
+
+        mode = self._mode
+        settings = mode.settings
+        self._roi_misses += 1
+        if self._roi_misses >= settings.ROI_MAX_MISSES:
+            logging.info("Target lost in tracking window, returning to full-frame search.")
+            self._roi = None
+            self._roi_misses = 0
+            return
+
+        x0, y0, x1, y1 = self._roi
+        cx, cy = (x0 + x1) // 2, (y0 + y1) // 2
+        half = int(self._roi_size * settings.ROI_GROWTH) // 2
+        self._roi_size = half * 2
+        self._roi = (max(0, cx - half), max(0, cy - half),
+                     min(mode.width, cx + half), min(mode.height, cy + half))
+
+    def _process_frame(self, frame, captured_at: float = None):
+        """
+        Detects the target in `frame` and publishes the result stamped with
+        `captured_at` (monotonic capture time, defaults to now). All intermediate
+        images are views into preallocated buffers; the frame is only annotated
+        when the live feed is displayed. Returns the processed frame, at the
+        current mode's resolution.
+        """
+        self._apply_pending_mode()
+        mode = self._mode
+        settings = mode.settings
+        annotate = self._viewer_attached()
+        timer = self.stage_timer
+        timer.start()
+
+        buffers = self._buffers.get(mode.height, mode.width)
+        if frame.shape[:2] != (mode.height, mode.width):
+            frame = cv2.resize(frame, (mode.width, mode.height), dst=buffers['frame'], interpolation=cv2.INTER_AREA)
+            timer.mark('resize')
+
+        x0, y0, x1, y1 = self._search_window()
+        roi = frame[y0:y1, x0:x1]
+        scratch = {name: buffers[name][y0:y1, x0:x1] for name in ('hsv', 'range_mask', 'bgra')}
+        mask = buffers['mask'][y0:y1, x0:x1]
+        blurred = buffers['blurred'][y0:y1, x0:x1]
+        eroded = buffers['eroded'][y0:y1, x0:x1]
+        dilated = buffers['dilated'][y0:y1, x0:x1]
+
+        # Marks 'cvtColor' and 'inRange', or 'lookup'
+        self._classifier.classify(roi, mask, scratch, timer)
         
-        mask = cv2.GaussianBlur(mask, (5, 5), 0)
-        mask = cv2.erode(mask, None, iterations=2)
-        mask = cv2.dilate(mask, None, iterations=2)
+        cv2.GaussianBlur(mask, (5, 5), 0, dst=blurred)
+        timer.mark('blur')
+        cv2.erode(blurred, self._kernel, dst=eroded, iterations=2)
+        cv2.dilate(eroded, self._kernel, dst=dilated, iterations=2)
+        mask = dilated
+        timer.mark('morphology')
 
-        contours = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        contours = imutils.grab_contours(contours)
+        # One pass gives area, bounding box and centroid of every blob
+        candidates = find_candidates(mask, settings.MIN_CONTOUR_AREA, settings.MIN_SHAPE_SCORE,
+                                     offset=(x0, y0), method=settings.BLOB_METHOD,
+                                     labels=buffers['labels'][y0:y1, x0:x1], timer=timer)
         
-        detection_result = {'found': False, 'cx': 0, 'cy': 0, 'quadrant': 0}
-
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-            area = cv2.contourArea(largest_contour)
-
-            if area > self.config.MIN_CONTOUR_AREA:
-                M = cv2.moments(largest_contour)
-                cx = int(M["m10"] / M["m00"])
-                cy = int(M["m01"] / M["m00"])
-
-                detection_result['found'] = True
-                detection_result['cx'] = cx
-                detection_result['cy'] = cy
-                
-                cv2.drawContours(frame, [largest_contour], -1, (0, 255, 0), 2)
+        detection_result = {'found': False, 'cx': 0, 'cy': 0, 'quadrant': 0, 'score': 0.0,
+                            'timestamp': clock.monotonic() if captured_at is None else captured_at}
+
+        if candidates:
+            target = candidates[0]
+            cx, cy = target.cx, target.cy
+
+            detection_result['found'] = True
+            detection_result['cx'] = int(round(cx / mode.scale))
+            detection_result['cy'] = int(round(cy / mode.scale))
+            detection_result['score'] = target.score
+
+            self._update_tracking_window(target.bbox, cx, cy)
+
+            if annotate:
+                for other in candidates[1:]:
+                    cv2.rectangle(frame, (other.x, other.y), (other.x + other.w, other.y + other.h), (0, 165, 255), 1)
+                cv2.rectangle(frame, (target.x, target.y), (target.x + target.w, target.y + target.h), (0, 255, 0), 2)
                 cv2.circle(frame, (cx, cy), 7, (255, 255, 255), -1)
-                cv2.putText(frame, f"Target: ({cx}, {cy})", (cx + 10, cy + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                cv2.putText(frame, f"Target: ({cx}, {cy}) score {target.score:.2f}", (cx + 10, cy + 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+        if not detection_result['found']:
+            self._register_miss()
+
+        if annotate:
+            if (x1 - x0, y1 - y0) != (mode.width, mode.height):
+                cv2.rectangle(frame, (x0, y0), (x1 - 1, y1 - 1), (255, 0, 0), 1)
+            cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
         
-        cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        self._publish_detection(detection_result)
         
-        with self._lock:
+        return frame
+
+    def _publish_detection(self, detection_result):
+        with self._detection_ready:
+            self._detection_seq += 1
+            detection_result['seq'] = self._detection_seq
             self._latest_detection = detection_result
-        
-        return frame
\ No newline at end of file
+            self._detection_ready.notify_all()
+        flight_recorder.record(flight_recorder.DETECTION,
+                               (detection_result['found'], detection_result['cx'], detection_result['cy'],
+                                detection_result['timestamp'], detection_result['score']),
+                               seq=detection_result['seq'])
+
+
+def create_detector(config, stop_event: Event, source=None):
+    """
+    Builds the detector backend selected by `config.DETECTOR_BACKEND`:
+    'thread' runs in this process, 'process' runs capture and processing
+    in a worker process (`source` must then be a source specification).
+    """
+    if config.DETECTOR_BACKEND == 'process':
+        from src.vision.process_detector import ProcessTargetDetector
+        detector = ProcessTargetDetector(config, stop_event, source=source)
+    else:
+        detector = TargetDetector(config, stop_event, source=source)
+    register_detector_metrics(detector)
+    return detector
+
+
+def register_detector_metrics(detector):
+    """
+    Exports the detector's frame counters, processing rate and tracking state
+    as metrics read from `detector.stats` (either backend) at export time.
+    """
+    if not metrics.enabled():
+        return
+    for name in ('captured', 'dropped', 'processed'):
+        metrics.counter(f'detector_frames_{name}_total', read=lambda name=name: detector.stats[name])
+    metrics.gauge('detector_fps', read=lambda: detector.stats['fps'])
+    metrics.gauge('detector_tracking', read=lambda: int(detector.stats['tracking']))
+    for name in detector.config.DETECTOR_MODES:
+        metrics.gauge('detector_mode', read=lambda name=name: int(detector.mode == name), mode=name)
@@ -0,0 +1,134 @@
+import logging
+import numpy as np
+
+
+class KalmanFilter2D:
+    """
+    Constant-velocity Kalman filter on an image point. The state is
+    `[x, y, vx, vy]` in pixels and pixels/s; the process noise is white
+    acceleration of `process_noise` px/s^2 and each measurement has
+    `measurement_noise` px of error per axis.
+    """
+    H = np.array([[1.0, 0.0, 0.0, 0.0],
+                  [0.0, 1.0, 0.0, 0.0]])
+
+    def __init__(self, process_noise: float, measurement_noise: float, initial_velocity_std: float = 100.0):
+        self.process_noise = process_noise
+        self.R = np.eye(2) * measurement_noise ** 2
+        self.initial_velocity_std = initial_velocity_std
+        self.x = np.zeros(4)
+        self.P = np.eye(4)
+
+    def initialize(self, cx: float, cy: float):
+        self.x = np.array([cx, cy, 0.0, 0.0])
+        self.P = np.diag([self.R[0, 0], self.R[1, 1],
+                          self.initial_velocity_std ** 2, self.initial_velocity_std ** 2])
+
+    def predict(self, dt: float):
+        if dt <= 0:
+            return
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        # Discrete white-noise acceleration model
+        q = self.process_noise ** 2
+        Q1 = np.array([[dt ** 4 / 4, dt ** 3 / 2],
+                       [dt ** 3 / 2, dt ** 2]]) * q
+        Q = np.zeros((4, 4))
+        Q[np.ix_([0, 2], [0, 2])] = Q1
+        Q[np.ix_([1, 3], [1, 3])] = Q1
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+
+    def innovation(self, cx: float, cy: float):
+        """
+        Returns the innovation of a measurement and its covariance.
+        """
+        y = np.array([cx, cy]) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        return y, S
+
+    def mahalanobis2(self, cx: float, cy: float) -> float:
+        y, S = self.innovation(cx, cy)
+        return float(y @ np.linalg.solve(S, y))
+
+    def correct(self, cx: float, cy: float):
+        y, S = self.innovation(cx, cy)
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(4) - K @ self.H) @ self.P
+
+
+class TargetTracker:
+    """
+    Tracking layer over the detector's output. Feed it every detection with
+    `update()`; it returns a track dict with the filtered centroid, the
+    centroid velocity and a confidence in [0, 1].
+
+    Detections whose Mahalanobis distance from the prediction exceeds
+    `TRACKER_GATE` are rejected as outliers; after `TRACKER_MAX_REJECTS`
+    consecutive rejections the filter is re-initialised on the new position.
+    Missed and rejected frames are bridged by prediction for up to
+    `TRACKER_COAST_TIME` seconds, with the confidence decaying linearly to 0,
+    before the target is reported lost.
+    """
+    def __init__(self, config):
+        self.coast_time = config.TRACKER_COAST_TIME
+        self.gate = config.TRACKER_GATE
+        self.max_rejects = config.TRACKER_MAX_REJECTS
+        self.filter = KalmanFilter2D(config.TRACKER_PROCESS_NOISE, config.TRACKER_MEASUREMENT_NOISE)
+        self.reset()
+
+    def reset(self):
+        self.active = False
+        self.rejects = 0
+        self.last_measured = None
+        self.last_timestamp = None
+
+    def update(self, detection: dict) -> dict:
+        """
+        Advances the track to `detection['timestamp']` and returns it: `found`
+        (False once the target is lost), `cx`/`cy`, `vx`/`vy` (px/s),
+        `confidence`, `predicted` (True while coasting), `timestamp` and `seq`.
+        """
+        timestamp = detection['timestamp']
+        if self.active:
+            self.filter.predict(timestamp - self.last_timestamp)
+        self.last_timestamp = timestamp
+
+        if detection['found']:
+            cx, cy = detection['cx'], detection['cy']
+            if not self.active:
+                self.filter.initialize(cx, cy)
+                self._measured(timestamp)
+                logging.debug(f"Track started at ({cx},{cy}).")
+            elif self.filter.mahalanobis2(cx, cy) <= self.gate:
+                self.filter.correct(cx, cy)
+                self._measured(timestamp)
+            else:
+                self.rejects += 1
+                if self.rejects >= self.max_rejects:
+                    logging.info(f"Re-initialising track at ({cx},{cy}) after {self.rejects} gated detections.")
+                    self.filter.initialize(cx, cy)
+                    self._measured(timestamp)
+                else:
+                    logging.debug(f"Gated outlier detection at ({cx},{cy}).")
+
+        if self.active and timestamp - self.last_measured > self.coast_time:
+            logging.info(f"Track lost after coasting {timestamp - self.last_measured:.2f}s.")
+            self.active = False
+        return self._track(detection)
+
+    def _measured(self, timestamp: float):
+        self.active = True
+        self.rejects = 0
+        self.last_measured = timestamp
+
+    def _track(self, detection: dict) -> dict:
+        track = {'found': self.active, 'cx': 0.0, 'cy': 0.0, 'vx': 0.0, 'vy': 0.0, 'confidence': 0.0,
+                 'predicted': False, 'timestamp': detection['timestamp'], 'seq': detection.get('seq', 0)}
+        if self.active:
+            coasted = detection['timestamp'] - self.last_measured
+            x, y, vx, vy = self.filter.x
+            track.update(cx=float(x), cy=float(y), vx=float(vx), vy=float(vy), predicted=coasted > 0,
+                         confidence=max(0.0, 1.0 - coasted / self.coast_time) if self.coast_time > 0 else 1.0)
+        return track